@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+
+ATLAS_PADDING = 1 # Transparent pixels between sprites, so scaled drawing never bleeds into a neighbour
+MAX_ATLAS_SIZE = 16384
+
+class MaxRectsPacker:
+    """
+    Packs rectangles into a fixed-size bin with the MaxRects algorithm: the free space is kept as a
+    list of maximal free rectangles, and each new rectangle goes into the free rectangle where it
+    leaves the shortest leftover side (Best Short Side Fit).
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.free_rects = [(0, 0, width, height)] # (x, y, width, height)
+
+    def insert(self, width, height):
+        """Places a rectangle and returns its (x, y), or None if it does not fit anywhere."""
+        best = None
+        for free_x, free_y, free_w, free_h in self.free_rects:
+            if width <= free_w and height <= free_h:
+                leftover = (min(free_w - width, free_h - height), max(free_w - width, free_h - height))
+                if best is None or leftover < best[0]:
+                    best = (leftover, free_x, free_y)
+        if best is None:
+            return None
+
+        placed = (best[1], best[2], width, height)
+        kept, parts = [], []
+        for free_rect in self.free_rects:
+            split = _split_free_rect(free_rect, placed)
+            if split == [free_rect]:
+                kept.append(free_rect)
+            else:
+                parts.extend(split)
+        # The untouched free rectangles were already maximal, so only the new parts can be redundant
+        parts = list(dict.fromkeys(parts))
+        self.free_rects = kept + [
+            part for i, part in enumerate(parts)
+            if not any(_contains(other, part) for other in kept)
+            and not any(i != j and _contains(other, part) for j, other in enumerate(parts))
+        ]
+        return placed[:2]
+
+def _split_free_rect(free_rect, placed):
+    """Returns the maximal parts of `free_rect` left uncovered by the `placed` rectangle."""
+    free_x, free_y, free_w, free_h = free_rect
+    x, y, w, h = placed
+    if x >= free_x + free_w or x + w <= free_x or y >= free_y + free_h or y + h <= free_y:
+        return [free_rect]
+
+    parts = []
+    if x > free_x:
+        parts.append((free_x, free_y, x - free_x, free_h))
+    if x + w < free_x + free_w:
+        parts.append((x + w, free_y, free_x + free_w - (x + w), free_h))
+    if y > free_y:
+        parts.append((free_x, free_y, free_w, y - free_y))
+    if y + h < free_y + free_h:
+        parts.append((free_x, y + h, free_w, free_y + free_h - (y + h)))
+    return parts
+
+def _contains(outer, inner):
+    """Returns True if the `inner` rectangle lies entirely inside the `outer` one."""
+    return (outer[0] <= inner[0] and outer[1] <= inner[1]
+            and outer[0] + outer[2] >= inner[0] + inner[2] and outer[1] + outer[3] >= inner[1] + inner[3])
+
+def pack_rectangles(sizes, padding=ATLAS_PADDING):
+    """
+    Packs (width, height) sizes into the smallest power-of-two atlas that holds them all.
+    Returns (atlas_width, atlas_height, positions) with one (x, y) per size, in the given order.
+    """
+    if not sizes:
+        return 0, 0, []
+    padded = [(width + padding, height + padding) for width, height in sizes]
+    # Placing the tallest rectangles first leaves the fewest awkward gaps
+    order = sorted(range(len(padded)), key=lambda index: (padded[index][1], padded[index][0]), reverse=True)
+
+    # Try every power-of-two size from the largest rectangle up, smallest area (then squarest) first
+    side = 1
+    while side < max(max(size) for size in padded):
+        side *= 2
+    sides = []
+    while side <= MAX_ATLAS_SIZE:
+        sides.append(side)
+        side *= 2
+    total_area = sum(width * height for width, height in padded)
+    candidates = sorted(
+        ((width, height) for width in sides for height in sides if width * height >= total_area),
+        key=lambda size: (size[0] * size[1], max(size))
+    )
+
+    for atlas_width, atlas_height in candidates:
+        packer = MaxRectsPacker(atlas_width, atlas_height)
+        positions = [None] * len(padded)
+        for index in order:
+            positions[index] = packer.insert(*padded[index])
+            if positions[index] is None:
+                break
+        else:
+            return atlas_width, atlas_height, positions
+    raise ValueError(f"{len(sizes)} sprites do not fit in a {MAX_ATLAS_SIZE}x{MAX_ATLAS_SIZE} atlas.")
+
+def write_sprite_atlas(tile_sprites, tile_width, atlas_path, manifest_path):
+    """
+    Packs the tile art into one atlas image and writes a JSON manifest next to it.
+
+    `tile_sprites` lists (tile_id, sprite) pairs, where each sprite is the RGBA image drawn centered in
+    the tile's `tile_width` square on the board. Sprites with identical pixels are stored once, and
+    each is trimmed to its visible pixels. The manifest maps every tile ID to its sprite's rectangle
+    in the atlas plus the offset of that rectangle inside the tile square, so a client can draw the
+    tile exactly as it appears on the board.
+    """
+    from PIL import Image
+
+    sprites = {} # Content hash -> (trimmed sprite, offset_x, offset_y)
+    tile_sprite_keys = {}
+    for tile_id, sprite in tile_sprites:
+        key = hashlib.sha256(sprite.tobytes() + repr(sprite.size).encode('utf-8')).hexdigest()
+        if key not in sprites:
+            visible_box = sprite.getchannel('A').getbbox() or (0, 0, 1, 1)
+            sprites[key] = (
+                sprite.crop(visible_box),
+                (tile_width - sprite.width) // 2 + visible_box[0],
+                (tile_width - sprite.height) // 2 + visible_box[1],
+            )
+        tile_sprite_keys[tile_id] = key
+
+    keys = list(sprites)
+    atlas_width, atlas_height, positions = pack_rectangles([sprites[key][0].size for key in keys])
+    atlas = Image.new('RGBA', (max(atlas_width, 1), max(atlas_height, 1)), (0, 0, 0, 0))
+    rects = {}
+    for key, (x, y) in zip(keys, positions):
+        sprite, offset_x, offset_y = sprites[key]
+        atlas.paste(sprite, (x, y))
+        rects[key] = {'x': x, 'y': y, 'w': sprite.width, 'h': sprite.height, 'offsetX': offset_x, 'offsetY': offset_y}
+    atlas.save(atlas_path, optimize=True)
+
+    manifest = {
+        'image': os.path.basename(atlas_path),
+        'size': {'w': atlas.width, 'h': atlas.height},
+        'tileWidth': tile_width,
+        'tiles': {tile_id: rects[key] for tile_id, key in tile_sprite_keys.items()},
+    }
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    logging.info(
+        f"Sprite atlas saved as {atlas_path} ({atlas.width}x{atlas.height}, {len(keys)} distinct sprites "
+        f"for {len(tile_sprite_keys)} tiles)"
+    )
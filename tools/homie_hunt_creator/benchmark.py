@@ -0,0 +1,355 @@
+"""
+Benchmarks the creator and converter pipelines on synthetic boards of several sizes.
+
+Each scale runs in its own process, so peak memory is measured per scale. Images are served by a
+small fake wiki on localhost, and every stage is timed for wall time, CPU time (including worker
+processes) and peak RSS. Results are written as JSON, and can be compared against an earlier run
+to flag regressions:
+
+    python benchmark.py -o baseline.json
+    python benchmark.py --baseline baseline.json
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+try:
+    import resource
+except ImportError: # Not available on Windows
+    resource = None
+
+# Scale name -> (sections, tiles per section)
+SCALES = {
+    'tiny': (5, 6),
+    'small': (25, 8),
+    'medium': (100, 8),
+    'large': (500, 8),
+}
+POINT_MULTIPLIERS = [1, 0.5, 0.25] # Three instances per tile, one for bonus tiles
+REGRESSION_THRESHOLD = 0.2 # Flag a stage that got more than 20% slower or bigger than the baseline
+MIN_REGRESSION_SECONDS = 0.05 # Ignore smaller slowdowns, which are mostly noise
+MIN_REGRESSION_MB = 10 # Ignore smaller memory increases
+DEFAULT_RESULTS_PATH = "benchmark_results.json"
+EXIT_OK = 0
+EXIT_REGRESSION = 1 # At least one stage regressed against the baseline
+
+# Word lists for the synthetic boss and item names; small enough that names and prefixes repeat
+BOSS_WORDS = ["General", "Commander", "Kree'arra", "Zilyana", "Vorkath", "Zulrah", "Corporeal", "Beast",
+              "Nightmare", "Phosani", "Sarachnis", "Cerberus", "Kraken", "Thermonuclear", "Smoke", "Devil"]
+ITEM_WORDS = ["Armadyl", "Bandos", "Dragon", "Abyssal", "Ancient", "Twisted", "Elder", "Primordial"]
+ITEM_KINDS = ["chestplate", "chainskirt", "platebody", "tassets", "boots", "helm", "whip", "shard", "hilt", "pet"]
+
+def setup_logging(level=logging.WARNING):
+    """Sets up logging; only warnings by default, so the creator's per-tile logging is not measured."""
+    logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def make_csv_rows(section_count, tiles_per_section, seed=0):
+    """Returns the rows of a synthetic drop sheet in the format csv_to_json.py reads."""
+    rng = random.Random(seed)
+    rows = []
+    for section_index in range(section_count):
+        rows.append([f"{rng.choice(BOSS_WORDS)} {rng.choice(BOSS_WORDS)} {section_index % 7 + 1}", "", ""])
+        for tile_index in range(tiles_per_section):
+            if tile_index == tiles_per_section - 1:
+                name = f"{rows[-1 - tile_index][0]} Collection Log" # A bonus tile
+            else:
+                name = f"{rng.choice(ITEM_WORDS)} {rng.choice(ITEM_KINDS)}"
+            rows.append([name, str(rng.choice([10, 20, 50, 100, 500])), ""])
+        rows.append(["", "", ""])
+    return rows
+
+def make_image(title, size=(120, 90)):
+    """Returns PNG bytes of a simple shape whose colour and proportions are derived from `title`."""
+    from PIL import Image, ImageDraw
+
+    rng = random.Random(title)
+    image = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    fill = (rng.randrange(256), rng.randrange(256), rng.randrange(256), 255)
+    inset = rng.randrange(2, 20)
+    draw.ellipse([inset, inset, size[0] - inset, size[1] - inset], fill=fill)
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def canonical_title(title):
+    """Normalizes a title the way MediaWiki does: underscores become spaces and the first letter is capitalized."""
+    title = title.replace('_', ' ').strip()
+    return title[:1].upper() + title[1:]
+
+class FakeWikiHandler(BaseHTTPRequestHandler):
+    """Answers the MediaWiki pageimages queries the creator sends, and serves a generated image per page."""
+
+    images = {}
+    images_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', content_type=None, etag=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        if etag:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/api.php':
+            titles = parse_qs(url.query).get('titles', [''])[0].split('|')
+            normalized, pages = [], {}
+            for index, title in enumerate(titles):
+                canonical = canonical_title(title)
+                if canonical != title:
+                    normalized.append({'from': title, 'to': canonical})
+                pages[str(index + 1)] = {
+                    'pageid': index + 1, 'ns': 0, 'title': canonical,
+                    'thumbnail': {'source': f"http://{self.headers['Host']}/images/{quote(canonical)}.png", 'width': 120, 'height': 90},
+                }
+            query = {'pages': pages}
+            if normalized:
+                query['normalized'] = normalized
+            self._send(200, json.dumps({'batchcomplete': '', 'query': query}).encode('utf-8'), 'application/json')
+        elif url.path.startswith('/images/'):
+            title = unquote(url.path[len('/images/'):-len('.png')])
+            with self.images_lock:
+                content = self.images.get(title)
+                if content is None:
+                    content = self.images[title] = make_image(title)
+            etag = f'"{hash(content) & 0xffffffff:08x}"'
+            if self.headers.get('If-None-Match') == etag:
+                self._send(304, etag=etag)
+            else:
+                self._send(200, content, 'image/png', etag)
+        else:
+            self._send(404)
+
+def start_fake_wiki():
+    """Starts the fake wiki on a free localhost port. Returns (server, api_url)."""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeWikiHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api.php"
+
+def _reset_peak_rss():
+    """Resets the process's peak RSS where the OS allows it (Linux), so each stage gets its own peak."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def _peak_rss_mb():
+    """Returns the peak RSS of this process in MB, or None if it cannot be measured here."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024 # Bytes on macOS, KB elsewhere
+
+def _cpu_seconds():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+@contextmanager
+def measure(stages, name):
+    """Times the enclosed block as stage `name` and adds its wall time, CPU time and peak RSS to `stages`."""
+    _reset_peak_rss()
+    start_wall, start_cpu = time.perf_counter(), _cpu_seconds()
+    yield
+    peak_rss = _peak_rss_mb()
+    stages[name] = {
+        'wall_s': round(time.perf_counter() - start_wall, 4),
+        'cpu_s': round(_cpu_seconds() - start_cpu, 4),
+        'peak_rss_mb': None if peak_rss is None else round(peak_rss, 1),
+    }
+    logging.info(f"{name}: {stages[name]}")
+
+def run_scale(scale, work_dir):
+    """Runs every stage of one scale in this process and returns its results."""
+    import csv_to_json
+    import homie_hunt_creator as creator
+    from image_cache import DerivedImageCache, ImageCache
+    from image_sources import open_image_source
+
+    section_count, tiles_per_section = SCALES[scale]
+    csv_path = os.path.join(work_dir, f"{scale}.csv")
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(make_csv_rows(section_count, tiles_per_section))
+
+    server, api_url = start_fake_wiki()
+    stages = {}
+    try:
+        with measure(stages, 'csv_read'):
+            with open(csv_path, newline='', encoding='utf-8-sig') as f:
+                lines = list(csv.reader(f))
+        with measure(stages, 'csv_prefixes'):
+            used_prefixes = set()
+            for row in lines:
+                if row and row[0]:
+                    csv_to_json.generate_prefix(row[0], used_prefixes, is_item_name=bool(row[1]))
+        with measure(stages, 'csv_parse'):
+            sections = csv_to_json.parse_csv_to_sections(lines, POINT_MULTIPLIERS, True)
+
+        config_data = csv_to_json.get_default_config(f"Benchmark {scale}")
+        config_data['sections'] = sections
+        config = config_data['config']
+        config['wikiApiUrl'] = api_url
+        config['fetchRateLimit'] = 0 # Measure the pipeline, not the politeness delay
+        # Draw the wiki's images up front, so the fetch stages do not include the fake server's work
+        for title in creator.collect_wiki_titles(config_data):
+            canonical = canonical_title(title)
+            FakeWikiHandler.images.setdefault(canonical, make_image(canonical))
+
+        cache_dir = os.path.join(work_dir, "cache")
+        cache = ImageCache(cache_dir)
+        derived_cache = DerivedImageCache(cache_dir)
+        fetch_workers = config.get('fetchWorkers', creator.FETCH_WORKERS)
+        try:
+            for stage in ('fetch_cold', 'fetch_warm'):
+                with open_image_source('wiki', config, cache, fetch_workers) as image_source:
+                    with measure(stages, stage):
+                        all_tile_data_for_csv, image_layout_data = creator.process_sections(config_data, image_source, fetch_workers)
+            with measure(stages, 'render'):
+                creator.generate_board_image(config, image_layout_data, all_tile_data_for_csv, os.path.join(work_dir, "board.png"), derived_cache)
+            with measure(stages, 'tiles_csv'):
+                creator.generate_tiles_csv(all_tile_data_for_csv, os.path.join(work_dir, "tiles.csv"))
+        finally:
+            cache.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {
+        'sections': len(sections),
+        'tiles': sum(len(section['tiles']) for section in sections),
+        'tile_instances': len(all_tile_data_for_csv),
+        'distinct_titles': len(creator.collect_wiki_titles(config_data)),
+        'stages': stages,
+    }
+
+def run_scale_in_subprocess(scale):
+    """Runs one scale in a fresh Python process and returns its results."""
+    work_dir = tempfile.mkdtemp(prefix=f"hhc-bench-{scale}-")
+    try:
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-scale', scale, '--work-dir', work_dir],
+            stdout=subprocess.PIPE, check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return json.loads(completed.stdout)
+
+def merge_repeats(runs):
+    """Combines repeated runs of a scale, keeping the best (lowest) value of every metric."""
+    merged = dict(runs[0], stages={})
+    for stage in runs[0]['stages']:
+        merged['stages'][stage] = {}
+        for metric in runs[0]['stages'][stage]:
+            values = [run['stages'][stage][metric] for run in runs if run['stages'][stage][metric] is not None]
+            merged['stages'][stage][metric] = min(values) if values else None
+    return merged
+
+def compare_results(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compares every stage in `results` with the same stage in `baseline`.
+    Returns (report lines, number of regressions).
+    """
+    lines = [f"{'Scale':<8}{'Stage':<14}{'Metric':<13}{'Baseline':>11}{'Current':>11}{'Change':>9}"]
+    regressions = 0
+    for scale, scale_results in results['scales'].items():
+        baseline_stages = baseline.get('scales', {}).get(scale, {}).get('stages', {})
+        for stage, metrics in scale_results['stages'].items():
+            for metric, minimum_change in (('wall_s', MIN_REGRESSION_SECONDS), ('cpu_s', MIN_REGRESSION_SECONDS), ('peak_rss_mb', MIN_REGRESSION_MB)):
+                old, new = baseline_stages.get(stage, {}).get(metric), metrics.get(metric)
+                if old is None or new is None:
+                    continue
+                change = (new - old) / old if old else 0.0
+                regressed = change > threshold and new - old > minimum_change
+                regressions += regressed
+                lines.append(
+                    f"{scale:<8}{stage:<14}{metric:<13}{old:>11.3f}{new:>11.3f}{change:>+9.0%}"
+                    + ("  REGRESSION" if regressed else "")
+                )
+    return lines, regressions
+
+def parse_args(argv=None):
+    """Parses the command-line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmarks the board creator and CSV converter on synthetic boards.")
+    parser.add_argument('--scales', nargs='+', choices=list(SCALES), default=list(SCALES), help="Scales to run (default: all).")
+    parser.add_argument('--repeat', type=int, default=1, help="Run each scale this many times and keep the best result (default: 1).")
+    parser.add_argument('-o', '--output', default=DEFAULT_RESULTS_PATH, help=f"File the results are written to (default: {DEFAULT_RESULTS_PATH}).")
+    parser.add_argument('--baseline', help="Results of an earlier run to compare against; exits with 1 if any stage regressed.")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help=f"Relative slowdown that counts as a regression (default: {REGRESSION_THRESHOLD}).")
+    parser.add_argument('--verbose', action='store_true', help="Show the stage timings as they are measured.")
+    parser.add_argument('--run-scale', help=argparse.SUPPRESS) # Used for the per-scale subprocesses
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Runs the benchmarks. Returns the process exit code."""
+    args = parse_args(argv)
+    setup_logging(logging.INFO if args.verbose else logging.WARNING)
+
+    if args.run_scale:
+        # In a per-scale subprocess: the results go to stdout, so keep the creator's logging quiet
+        logging.getLogger().setLevel(logging.WARNING)
+        json.dump(run_scale(args.run_scale, args.work_dir), sys.stdout)
+        return EXIT_OK
+
+    from PIL import __version__ as pillow_version
+
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pillow': pillow_version,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'scales': {},
+    }
+    for scale in args.scales:
+        logging.warning(f"Running the '{scale}' benchmark ({SCALES[scale][0]} sections)...")
+        results['scales'][scale] = merge_repeats([run_scale_in_subprocess(scale) for _ in range(max(args.repeat, 1))])
+        for stage, metrics in results['scales'][scale]['stages'].items():
+            print(f"{scale:<8}{stage:<14}{metrics['wall_s']:>9.3f}s wall{metrics['cpu_s']:>9.3f}s CPU{metrics['peak_rss_mb'] or 0:>9.1f} MB")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        lines, regressions = compare_results(results, baseline, args.threshold)
+        print("\n".join(lines))
+        if regressions:
+            print(f"{regressions} metric(s) regressed by more than {args.threshold:.0%}.")
+            return EXIT_REGRESSION
+        print("No regressions.")
+    return EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
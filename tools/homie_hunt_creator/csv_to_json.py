@@ -1,12 +1,29 @@
+import argparse
 import csv
+import glob
 import json
 import logging
+import os
+import queue
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import tkinter as tk
-from tkinter import filedialog, messagebox
+
+from progress import BuildCancelled, BuildProgress, format_progress
+
+# tkinter is imported inside the GUI code, so the command line works on machines without it.
 
 # --- Configuration ---
 OUTPUT_DIR = Path('output')
+# Point multipliers used when none are given.
+DEFAULT_POINT_MULTIPLIERS = "[1, 0.5, 0.25, 0.1, 0.05]"
+EXIT_OK = 0
+EXIT_FAILURE = 1 # At least one CSV could not be converted
+BATCH_WORKERS = os.cpu_count() or 1 # Worker processes used to convert several CSVs at once
+GUI_POLL_INTERVAL_MS = 100 # How often the window checks for progress from the conversion thread
 # Words to ignore when generating item/boss prefixes.
 IGNORE_WORDS = {'of', 'the', 'a', 'an', 'and'}
 # Item-specific prefixes to strip from words within a tile's name.
@@ -17,9 +34,25 @@ MAX_PREFIX_WORDS = 2
 # Keywords to identify a bonus tile. If a tile's name contains any of these, it will only have one point instance.
 BONUS_TILE_KEYWORDS = ["All Uniques", "Collection Log", "complete"]
 
-def setup_logging():
+# Matchers built once from the lists above; both are applied to lowercased text, and "(?!)" never matches.
+# Longer prefixes are tried first, so "platebody" would win over "plate".
+ITEM_PREFIX_PATTERN = re.compile("|".join(re.escape(prefix.lower()) for prefix in sorted(ITEM_PREFIXES_TO_IGNORE, key=len, reverse=True)) or "(?!)")
+BONUS_TILE_PATTERN = re.compile("|".join(re.escape(keyword.lower()) for keyword in BONUS_TILE_KEYWORDS) or "(?!)")
+
+class PrefixSet(set):
+    """
+    A set of used prefixes that also remembers, for each base prefix, the lowest numbered suffix that
+    might still be free. generate_prefix resumes from there instead of counting up from 1 every time,
+    which gives the same prefixes: a suffix that was taken once stays taken.
+    """
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.next_suffix = {}
+
+def setup_logging(level=logging.INFO):
     """Sets up basic logging to the console."""
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def get_default_config(project_title="My Homie Hunt"):
     """Returns a default config object for the Homie Hunt Creator."""
@@ -83,14 +116,10 @@ def generate_prefix(name: str, used_prefixes: set, is_item_name: bool = False) -
     # If it's an item, process each word to strip known prefixes.
     if is_item_name:
         processed_words = []
-        # Sort prefixes by length (desc) to match longer ones first (e.g., "platebody" before "plate").
-        sorted_item_prefixes = sorted(ITEM_PREFIXES_TO_IGNORE, key=len, reverse=True)
         for word in words:
-            word_lower = word.lower()
-            for prefix in sorted_item_prefixes:
-                if word_lower.startswith(prefix):
-                    word = word[len(prefix):] # Strip the prefix
-                    break # Move to the next word
+            match = ITEM_PREFIX_PATTERN.match(word.lower())
+            if match:
+                word = word[match.end():] # Strip the prefix
             if word: # Only add the word if it's not empty after stripping
                 processed_words.append(word)
         words = processed_words
@@ -115,42 +144,48 @@ def generate_prefix(name: str, used_prefixes: set, is_item_name: bool = False) -
             base_prefix = "_".join(prefix_parts)
 
     # Ensure uniqueness
+    next_suffix = used_prefixes.next_suffix if isinstance(used_prefixes, PrefixSet) else {}
     final_prefix = base_prefix
     counter = 1
-    while final_prefix in used_prefixes:
+    if final_prefix in used_prefixes:
+        counter = next_suffix.get(base_prefix, 1)
         final_prefix = f"{base_prefix}_{counter}"
-        counter += 1
-    
+        while final_prefix in used_prefixes:
+            counter += 1
+            final_prefix = f"{base_prefix}_{counter}"
+        next_suffix[base_prefix] = counter + 1
+
     used_prefixes.add(final_prefix)
     return final_prefix
 
-def parse_csv_to_sections(lines: list[list[str]], point_multipliers: list[float], auto_name_tiles: bool) -> list[dict]:
-    """Processes CSV rows into a list of sections for the Homie Hunt format."""
-    sections = []
+def iter_csv_sections(rows, point_multipliers: list[float], auto_name_tiles: bool):
+    """
+    Processes CSV rows into sections for the Homie Hunt format, yielding each section once its last
+    tile has been read. `rows` may be any iterable, such as a csv.reader, and is consumed lazily.
+    """
     current_section = None
-    used_section_prefixes = set() # Track prefixes for sections to ensure uniqueness
+    used_section_prefixes = PrefixSet() # Track prefixes for sections to ensure uniqueness
+    used_tile_prefixes = None # Tile prefixes of the current section, which only need to be unique within it
 
-    for i, row in enumerate(lines):
+    for row in rows:
         if not any(row):  # Skip empty rows
             continue
 
         col_a = row[0].strip() if len(row) > 0 else ""
         col_b = row[1].strip() if len(row) > 1 else ""
-        other_cols = [cell.strip() for cell in row[1:]]
 
         # --- Identify a new section (boss) ---
         # A new section has a name in column A and all other columns are empty.
-        if col_a and not any(other_cols):
+        if col_a and not any(cell.strip() for cell in row[1:]):
             if current_section:
-                sections.append(current_section)
+                yield current_section
 
             section_prefix = generate_prefix(col_a, used_section_prefixes, is_item_name=False)
+            used_tile_prefixes = PrefixSet()
             current_section = {
                 "title": col_a,
                 "wiki": col_a,  # Assume wiki page is same as title
                 "tiles": [],
-                "_prefix": section_prefix, # Internal key for prefix
-                "_used_tile_prefixes": set() # Internal set for tile uniqueness within this section
             }
             logging.info(f"Found new section: '{col_a}' -> Prefix: '{section_prefix}'")
             continue
@@ -162,16 +197,16 @@ def parse_csv_to_sections(lines: list[list[str]], point_multipliers: list[float]
             points_array = [round(base_points * m) for m in point_multipliers]
 
             # Check if the tile is a "bonus" tile based on its name
-            is_bonus = any(keyword.lower() in col_a.lower() for keyword in BONUS_TILE_KEYWORDS)
+            is_bonus = BONUS_TILE_PATTERN.search(col_a.lower()) is not None
             if is_bonus and points_array:
                 # Bonus tiles only get the first (highest) point value.
                 points_array = points_array[:1]
-                logging.info(f"  - Detected BONUS tile: '{col_a}'. Points adjusted to: {points_array}")
+                logging.debug(f"  - Detected BONUS tile: '{col_a}'. Points adjusted to: {points_array}")
 
             # Generate a smart, unique tileID for the item
             if auto_name_tiles:
-                tile_prefix = generate_prefix(col_a, current_section["_used_tile_prefixes"], is_item_name=True)
-                tile_id = f"{current_section['_prefix']}-{tile_prefix}"
+                tile_prefix = generate_prefix(col_a, used_tile_prefixes, is_item_name=True)
+                tile_id = f"{section_prefix}-{tile_prefix}"
             else:
                 tile_id = ""
 
@@ -183,27 +218,250 @@ def parse_csv_to_sections(lines: list[list[str]], point_multipliers: list[float]
                 "points": points_array
             }
             current_section["tiles"].append(tile_def)
-            logging.info(f"  - Added tile: '{col_a}' -> ID: '{tile_id if tile_id else '<Not Generated>'}'")
+            logging.debug(f"  - Added tile: '{col_a}' -> ID: '{tile_id if tile_id else '<Not Generated>'}'")
 
-    # Add the last processed section
+    # Yield the last processed section
     if current_section:
-        sections.append(current_section)
+        yield current_section
+
+def parse_csv_to_sections(lines: list[list[str]], point_multipliers: list[float], auto_name_tiles: bool) -> list[dict]:
+    """Processes CSV rows into a list of sections for the Homie Hunt format."""
+    return list(iter_csv_sections(lines, point_multipliers, auto_name_tiles))
 
-    # Clean up internal keys before returning
+def write_config_json(json_file, output_data: dict, sections) -> int:
+    """
+    Writes `output_data` with `sections` as its "sections" list to an open text file, one section at a
+    time, so the whole board never has to be held in memory. The text is exactly what
+    json.dump(..., indent=2) writes for the complete dict. Returns the number of sections written.
+    """
+    header = {key: value for key, value in output_data.items() if key != 'sections'}
+    header_json = json.dumps(header, indent=2)
+    # Reopen the header object and append the sections list as its last key
+    json_file.write(header_json[:-2] + ',\n  "sections": [' if header else '{\n  "sections": [')
+    count = 0
     for section in sections:
-        section.pop('_prefix', None)
-        section.pop('_used_tile_prefixes', None)
+        json_file.write(',\n    ' if count else '\n    ')
+        json_file.write(json.dumps(section, indent=2).replace('\n', '\n    '))
+        count += 1
+    json_file.write('\n  ]\n}' if count else ']\n}')
+    return count
+
+def unique_output_path(output_dir: Path, project_title: str, reserved=()) -> Path:
+    """Returns `output_dir`/`project_title`.json, numbered if that file (or a `reserved` path) already exists."""
+    output_path = output_dir / f"{project_title}.json"
+    counter = 1
+    while output_path.exists() or output_path in reserved:
+        output_path = output_dir / f"{project_title}_{counter}.json"
+        counter += 1
+    return output_path
 
-    return sections
+def write_config_file(output_path: Path, project_title: str, sections) -> int:
+    """
+    Writes a config with the default settings and `sections` to `output_path`. A file left half
+    written by an error is removed. Returns the number of sections written.
+    """
+    try:
+        with open(output_path, 'w', encoding='utf-8') as json_file:
+            return write_config_json(json_file, get_default_config(project_title), sections)
+    except BaseException:
+        output_path.unlink(missing_ok=True)
+        raise
+
+def log_conversion(output_path: Path, section_count: int):
+    logging.info("=" * 50)
+    logging.info(f"Conversion successful! ({section_count} sections)")
+    logging.info(f"Output saved to: {output_path}")
+    logging.info("=" * 50)
+
+def read_csv_sections(input_csv_path: Path, point_multipliers: list[float], auto_name_tiles: bool) -> list[dict]:
+    """Returns the sections of one CSV file. Raises FileNotFoundError if the CSV does not exist."""
+    # Use 'utf-8-sig' to handle potential Byte Order Mark (BOM)
+    with open(input_csv_path, mode='r', newline='', encoding='utf-8-sig') as csv_file:
+        return list(iter_csv_sections(csv.reader(csv_file), point_multipliers, auto_name_tiles))
+
+def track_lines(lines, total_bytes, progress: BuildProgress):
+    """Passes `lines` through, reporting to `progress` how many bytes of the file have been read."""
+    progress.set_total('csv_bytes', total_bytes)
+    for line in lines:
+        progress.advance('csv_bytes', len(line.encode('utf-8')))
+        yield line
+
+def convert_csv(input_csv_path: Path, point_multipliers: list[float], auto_name_tiles: bool, output_dir: Path = OUTPUT_DIR, output_path: Path = None,
+                progress: BuildProgress = None) -> Path:
+    """
+    Converts one CSV file into a Homie Hunt config JSON in `output_dir`, named after the CSV (or
+    written to `output_path` if given). The CSV is read and the JSON written a section at a time, so
+    large sheets are never held in memory whole. With `progress`, the bytes read are reported to it,
+    and cancelling it stops the conversion with BuildCancelled, without leaving a JSON file behind.
+    Returns the path of the written file. Raises FileNotFoundError if the CSV does not exist.
+    """
+    project_title = input_csv_path.stem
+
+    # Use 'utf-8-sig' to handle potential Byte Order Mark (BOM)
+    with open(input_csv_path, mode='r', newline='', encoding='utf-8-sig') as csv_file:
+        # Determine output filename
+        if output_path is None:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            output_path = unique_output_path(output_dir, project_title)
+
+        # Write the output file as the rows are read
+        lines = track_lines(csv_file, input_csv_path.stat().st_size, progress) if progress else csv_file
+        sections = iter_csv_sections(csv.reader(lines), point_multipliers, auto_name_tiles)
+        section_count = write_config_file(output_path, project_title, sections)
+
+    log_conversion(output_path, section_count)
+    return output_path
+
+def share_section_prefixes(sections: list[dict], used_section_prefixes: PrefixSet):
+    """
+    Re-assigns the section prefixes of one file's sections from a namespace shared with other files,
+    and rewrites their tile IDs to match. Every file's sections were given prefixes as if it were the
+    only file, so the same prefixes are generated again to find what each tile ID starts with.
+    """
+    local_prefixes = PrefixSet()
+    for section in sections:
+        local_prefix = generate_prefix(section['title'], local_prefixes, is_item_name=False)
+        shared_prefix = generate_prefix(section['title'], used_section_prefixes, is_item_name=False)
+        if shared_prefix == local_prefix:
+            continue
+        logging.debug(f"Section '{section['title']}' prefix '{local_prefix}' -> '{shared_prefix}' in the shared namespace")
+        for tile in section['tiles']:
+            if tile['tileID']:
+                tile['tileID'] = shared_prefix + tile['tileID'][len(local_prefix):]
+
+def expand_csv_inputs(inputs) -> list[Path]:
+    """
+    Turns CSV files, directories (every .csv directly inside) and glob patterns into a sorted list of
+    distinct CSV paths. Patterns are expanded here as well, since not every shell does it. A pattern or
+    directory that matches nothing is logged and skipped; a plain file name is kept so that a missing
+    file is reported as such.
+    """
+    paths = set()
+    for entry in inputs:
+        path = Path(entry)
+        if path.is_dir():
+            matches = [match for match in path.glob('*') if match.suffix.lower() == '.csv']
+        elif glob.has_magic(entry):
+            matches = [Path(match) for match in glob.glob(entry)]
+        else:
+            matches = [path]
+        if not matches:
+            logging.warning(f"No CSV files match '{entry}'.")
+        paths.update(matches)
+    return sorted(paths)
+
+def _init_batch_worker(log_level):
+    """Sets up logging in each batch worker process."""
+    setup_logging(log_level)
+
+def _run_batch(function, jobs, max_workers):
+    """
+    Calls `function` with the arguments of every job, in a pool of `max_workers` processes when there
+    is more than one job. Yields (result, error) for each job in job order, whatever order they finish in.
+    """
+    if max_workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            try:
+                yield function(*job), None
+            except Exception as e:
+                yield None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(jobs)), initializer=_init_batch_worker, initargs=(logging.getLogger().level,)) as executor:
+        futures = [executor.submit(function, *job) for job in jobs]
+        for future in futures:
+            try:
+                yield future.result(), None
+            except Exception as e:
+                yield None, e
+
+def _log_batch_error(csv_file, error):
+    if isinstance(error, FileNotFoundError):
+        logging.error(f"The file '{csv_file}' was not found.")
+    else:
+        logging.error(f"An unexpected error occurred converting '{csv_file}': {error}", exc_info=error)
+
+def convert_batch(csv_files: list[Path], point_multipliers: list[float], auto_name_tiles: bool, output_dir: Path = OUTPUT_DIR,
+                  max_workers: int = BATCH_WORKERS, merge_title: str = None, shared_prefixes: bool = False):
+    """
+    Converts several CSV files at once in a pool of `max_workers` processes.
+
+    Without `merge_title`, every CSV gets its own config JSON, as with convert_csv. With
+    `merge_title`, all the sections go into one config of that name, in file order. Merging (or
+    `shared_prefixes`) gives every section a prefix from one namespace, so tile IDs are unique across
+    all the files. Prefixes are assigned in file order after all the files are read, so the output
+    does not depend on which worker finishes first.
+
+    Returns (output paths, number of CSVs that failed). A merged config is only written if every CSV
+    converted.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    failures = 0
+
+    if not merge_title and not shared_prefixes:
+        # Each worker writes its own file; names are reserved up front so CSVs with the same name don't race
+        output_paths = []
+        for csv_file in csv_files:
+            output_paths.append(unique_output_path(output_dir, csv_file.stem, output_paths))
+        jobs = [(csv_file, point_multipliers, auto_name_tiles, output_dir, output_path) for csv_file, output_path in zip(csv_files, output_paths)]
+        written = []
+        for csv_file, (output_path, error) in zip(csv_files, _run_batch(convert_csv, jobs, max_workers)):
+            if error:
+                _log_batch_error(csv_file, error)
+                failures += 1
+            else:
+                written.append(output_path)
+        return written, failures
+
+    jobs = [(csv_file, point_multipliers, auto_name_tiles) for csv_file in csv_files]
+    used_section_prefixes = PrefixSet()
+    file_sections = []
+    for csv_file, (sections, error) in zip(csv_files, _run_batch(read_csv_sections, jobs, max_workers)):
+        if error:
+            _log_batch_error(csv_file, error)
+            failures += 1
+            continue
+        share_section_prefixes(sections, used_section_prefixes)
+        file_sections.append((csv_file, sections))
+
+    written = []
+    if merge_title:
+        if failures:
+            logging.error(f"Not writing the merged config '{merge_title}' because {failures} file(s) failed to convert.")
+            return written, failures
+        output_path = unique_output_path(output_dir, merge_title)
+        all_sections = [section for _, sections in file_sections for section in sections]
+        log_conversion(output_path, write_config_file(output_path, merge_title, all_sections))
+        written.append(output_path)
+        return written, failures
+
+    for csv_file, sections in file_sections:
+        output_path = unique_output_path(output_dir, csv_file.stem)
+        log_conversion(output_path, write_config_file(output_path, csv_file.stem, sections))
+        written.append(output_path)
+    return written, failures
 
 class ConverterApp:
+    """
+    The Tk window. Conversions run on a background thread, which posts progress and its result to a
+    queue that the window polls, so the window stays responsive and a conversion can be cancelled.
+    """
+
     def __init__(self, root):
+        import tkinter as tk
+        from tkinter import ttk
+
         self.root = root
         self.root.title("CSV to Homie Hunt JSON Converter")
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.file_path_var = tk.StringVar()
-        self.points_var = tk.StringVar(value="[1, 0.5, 0.25, 0.1, 0.05]")
+        self.points_var = tk.StringVar(value=DEFAULT_POINT_MULTIPLIERS)
         self.auto_name_tiles_var = tk.BooleanVar(value=True)
+        self.status_var = tk.StringVar(value="Ready.")
+        self.events = queue.Queue() # Messages from the conversion thread
+        self.progress = None # BuildProgress of the running conversion
+        self.close_when_done = False
 
         # File selection
         tk.Label(root, text="Input CSV File:").grid(row=0, column=0, padx=10, pady=5, sticky="w")
@@ -217,10 +475,20 @@ class ConverterApp:
         # Auto-naming toggle
         tk.Checkbutton(root, text="Automatically generate Tile IDs", variable=self.auto_name_tiles_var).grid(row=2, column=1, padx=10, pady=5, sticky="w")
 
-        # Convert button
-        tk.Button(root, text="Convert", command=self.convert).grid(row=3, column=1, padx=10, pady=20)
+        # Convert and cancel buttons
+        self.convert_button = tk.Button(root, text="Convert", command=self.convert)
+        self.convert_button.grid(row=3, column=1, padx=10, pady=(20, 5))
+        self.cancel_button = tk.Button(root, text="Cancel", command=self.cancel, state=tk.DISABLED)
+        self.cancel_button.grid(row=3, column=2, padx=10, pady=(20, 5))
+
+        # Progress
+        self.progress_bar = ttk.Progressbar(root, mode='determinate', maximum=1.0)
+        self.progress_bar.grid(row=4, column=0, columnspan=3, padx=10, pady=5, sticky="ew")
+        tk.Label(root, textvariable=self.status_var, anchor="w").grid(row=5, column=0, columnspan=3, padx=10, pady=(0, 10), sticky="ew")
 
     def browse_file(self):
+        from tkinter import filedialog
+
         file_path = filedialog.askopenfilename(
             title="Select the CSV file to parse",
             filetypes=[("CSV files", "*.csv")]
@@ -229,13 +497,15 @@ class ConverterApp:
             self.file_path_var.set(file_path)
 
     def convert(self):
+        import tkinter as tk
+        from tkinter import messagebox
+
         input_csv_path_str = self.file_path_var.get()
         if not input_csv_path_str:
             messagebox.showerror("Error", "Please select an input CSV file.")
             return
 
         input_csv_path = Path(input_csv_path_str)
-        project_title = input_csv_path.stem
 
         multipliers_str = self.points_var.get()
         point_multipliers = parse_point_multipliers(multipliers_str)
@@ -245,44 +515,141 @@ class ConverterApp:
 
         auto_name_tiles = self.auto_name_tiles_var.get()
 
+        self.progress = BuildProgress(on_event=lambda event: self.events.put(('progress', event)))
+        self.convert_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.progress_bar['value'] = 0
+        self.status_var.set("Starting...")
+        threading.Thread(
+            target=self._convert_in_background,
+            args=(input_csv_path, point_multipliers, auto_name_tiles, self.progress),
+            daemon=True
+        ).start()
+        self.root.after(GUI_POLL_INTERVAL_MS, self._poll_events)
+
+    def _convert_in_background(self, input_csv_path, point_multipliers, auto_name_tiles, progress):
+        """Runs on the conversion thread. Never touches the widgets; everything goes through `events`."""
         try:
-            # Use 'utf-8-sig' to handle potential Byte Order Mark (BOM)
-            with open(input_csv_path, mode='r', newline='', encoding='utf-8-sig') as csv_file:
-                lines = list(csv.reader(csv_file))
-
-            # Create the base JSON structure
-            output_data = get_default_config(project_title)
-            output_data['sections'] = parse_csv_to_sections(lines, point_multipliers, auto_name_tiles)
-
-            # Determine output filename
-            OUTPUT_DIR.mkdir(exist_ok=True)
-            output_path = OUTPUT_DIR / f"{project_title}.json"
-            counter = 1
-            while output_path.exists():
-                output_path = OUTPUT_DIR / f"{project_title}_{counter}.json"
-                counter += 1
-
-            # Write the output file
-            with open(output_path, 'w', encoding='utf-8') as json_file:
-                json.dump(output_data, json_file, indent=2)
-
-            logging.info("=" * 50)
-            logging.info("Conversion successful!")
-            logging.info(f"Output saved to: {output_path}")
-            logging.info("=" * 50)
-            messagebox.showinfo("Success", f"Conversion successful!\n\nOutput saved to:\n{output_path}")
-
+            output_path = convert_csv(input_csv_path, point_multipliers, auto_name_tiles, progress=progress)
+            self.events.put(('done', output_path))
+        except BuildCancelled:
+            logging.warning("Conversion cancelled.")
+            self.events.put(('cancelled', None))
         except FileNotFoundError:
             logging.error(f"The file '{input_csv_path}' was not found.")
-            messagebox.showerror("Error", f"File not found:\n{input_csv_path}")
+            self.events.put(('error', f"File not found:\n{input_csv_path}"))
         except Exception as e:
             logging.exception(f"An unexpected error occurred: {e}")
-            messagebox.showerror("Error", f"An unexpected error occurred:\n{e}")
+            self.events.put(('error', f"An unexpected error occurred:\n{e}"))
+
+    def _poll_events(self):
+        """Shows the conversion thread's progress, and its result once it has finished."""
+        import tkinter as tk
+        from tkinter import messagebox
+
+        while True:
+            try:
+                kind, value = self.events.get_nowait()
+            except queue.Empty:
+                self.root.after(GUI_POLL_INTERVAL_MS, self._poll_events)
+                return
+            if kind == 'progress':
+                if value['total']:
+                    self.progress_bar['value'] = min(value['done'] / value['total'], 1.0)
+                self.status_var.set(format_progress(value))
+                continue
+            break
+
+        # The conversion has finished
+        self.progress = None
+        self.convert_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        if self.close_when_done:
+            self.root.destroy()
+            return
+        if kind == 'done':
+            self.progress_bar['value'] = 1.0
+            self.status_var.set(f"Done: {value}")
+            messagebox.showinfo("Success", f"Conversion successful!\n\nOutput saved to:\n{value}")
+        elif kind == 'cancelled':
+            self.progress_bar['value'] = 0
+            self.status_var.set("Cancelled.")
+        else:
+            self.status_var.set("Failed.")
+            messagebox.showerror("Error", value)
+
+    def cancel(self):
+        """Asks the running conversion to stop."""
+        import tkinter as tk
+
+        if self.progress:
+            self.progress.cancel()
+            self.cancel_button.config(state=tk.DISABLED)
+            self.status_var.set("Cancelling...")
+
+    def on_close(self):
+        """Closes the window, cancelling a running conversion and waiting for it to stop first."""
+        if self.progress:
+            self.close_when_done = True
+            self.cancel()
+        else:
+            self.root.destroy()
+
+def run_gui():
+    """Opens the Tk window."""
+    import tkinter as tk
 
-if __name__ == '__main__':
-    setup_logging()
     logging.info("Starting CSV to Homie Hunt JSON Converter...")
     root = tk.Tk()
     app = ConverterApp(root)
     root.mainloop()
-    logging.info("Application closed.")
\ No newline at end of file
+    logging.info("Application closed.")
+
+def parse_args(argv=None):
+    """Parses the command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Converts boss/drop CSV sheets into Homie Hunt config JSON files. "
+                    "Run without any CSV files to open the GUI."
+    )
+    parser.add_argument('csv_files', nargs='*', help="CSV file(s), directories of CSV files or glob patterns to convert.")
+    parser.add_argument('-o', '--output-dir', type=Path, default=OUTPUT_DIR, help=f"Directory the JSON files are written to (default: {OUTPUT_DIR}).")
+    parser.add_argument('--points', default=DEFAULT_POINT_MULTIPLIERS, help=f"Point multipliers for each tile's instances (default: '{DEFAULT_POINT_MULTIPLIERS}').")
+    parser.add_argument('--no-auto-ids', action='store_true', help="Do not generate tile IDs automatically.")
+    parser.add_argument('-j', '--jobs', type=int, default=BATCH_WORKERS, help=f"Number of CSV files converted at once, in separate processes (default: {BATCH_WORKERS}).")
+    parser.add_argument('--merge', metavar='TITLE', help="Merge all the CSV files into one config, TITLE.json, with tile IDs unique across all of them.")
+    parser.add_argument('--shared-prefixes', action='store_true', help="Keep one config per CSV, but make tile IDs unique across all of them.")
+    return parser.parse_args(argv)
+
+def run_cli(args) -> int:
+    """Converts every CSV given on the command line. Returns the exit code."""
+    point_multipliers = parse_point_multipliers(args.points)
+    if not point_multipliers:
+        return EXIT_FAILURE
+
+    csv_files = expand_csv_inputs(args.csv_files)
+    if not csv_files:
+        logging.error("No CSV files to convert.")
+        return EXIT_FAILURE
+
+    start = time.perf_counter()
+    written, failures = convert_batch(csv_files, point_multipliers, not args.no_auto_ids, args.output_dir,
+                                      max(args.jobs, 1), args.merge, args.shared_prefixes)
+    if len(csv_files) > 1:
+        logging.info(f"Converted {len(csv_files) - failures} of {len(csv_files)} CSV file(s) into {len(written)} config(s) in {time.perf_counter() - start:.1f}s.")
+
+    if failures:
+        logging.error(f"{failures} of {len(csv_files)} file(s) failed to convert.")
+        return EXIT_FAILURE
+    return EXIT_OK
+
+def main(argv=None) -> int:
+    """Main execution function. Returns the process exit code."""
+    args = parse_args(argv)
+    setup_logging()
+    if args.csv_files:
+        return run_cli(args)
+    run_gui()
+    return EXIT_OK
+
+if __name__ == '__main__':
+    sys.exit(main())
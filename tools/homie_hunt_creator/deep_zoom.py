@@ -0,0 +1,134 @@
+import logging
+import os
+import shutil
+
+DEFAULT_TILE_SIZE = 256
+DEFAULT_OVERLAP = 1 # Pixels each tile shares with its neighbours, so viewers can blend the seams
+DEFAULT_TILE_FORMAT = 'webp'
+TILE_QUALITY = 90 # Quality for lossy tile formats
+
+DZI_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" TileSize="{tile_size}" Overlap="{overlap}" Format="{tile_format}">
+  <Size Width="{width}" Height="{height}"/>
+</Image>
+"""
+
+def _stack(top_image, bottom_image):
+    """Returns a new image with `bottom_image` below `top_image`; both must have the same width."""
+    from PIL import Image
+
+    stacked = Image.new(top_image.mode, (top_image.width, top_image.height + bottom_image.height))
+    stacked.paste(top_image, (0, 0))
+    stacked.paste(bottom_image, (0, top_image.height))
+    return stacked
+
+class _PyramidLevel:
+    """The rows of one pyramid level that have been received but not yet cut into tiles."""
+
+    def __init__(self, number, width, height):
+        self.number = number
+        self.width = width
+        self.height = height
+        self.rows = None # Buffered rows, starting at row `top` of the level
+        self.top = 0
+        self.received = 0
+        self.next_tile_row = 0
+        self.odd_row = None # Last received row, waiting for its pair before it is halved into the next level
+
+class DeepZoomWriter:
+    """
+    Writes an image as a Deep Zoom (DZI) tile pyramid: a `.dzi` manifest plus a `<name>_files/`
+    folder with one subfolder per zoom level, from level 0 (1x1 pixel) up to the full resolution.
+    Each level is half the size of the one above it, and each is cut into `tile_size` square tiles
+    named `<column>_<row>.<format>`.
+
+    The image is given as full-width bands of rows from top to bottom with `add_rows`, so it never has
+    to be held in memory whole. Every level only keeps the rows it still needs for its next row of
+    tiles, and pairs of rows are averaged down into the next level as soon as both have arrived.
+    """
+
+    def __init__(self, dzi_path, width, height, tile_size=DEFAULT_TILE_SIZE, overlap=DEFAULT_OVERLAP, tile_format=DEFAULT_TILE_FORMAT):
+        from PIL import features
+
+        if tile_format == 'webp' and not features.check('webp'):
+            logging.warning("This Pillow build cannot write WebP. Writing deep zoom tiles as PNG instead.")
+            tile_format = 'png'
+        self.dzi_path = dzi_path
+        self.tiles_dir = os.path.splitext(dzi_path)[0] + "_files"
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.tile_format = tile_format
+        self.tiles_written = 0
+
+        max_level = (max(width, height) - 1).bit_length()
+        self.levels = []
+        for number in range(max_level, -1, -1):
+            scale = 2 ** (max_level - number)
+            self.levels.append(_PyramidLevel(number, -(-width // scale), -(-height // scale)))
+
+        # Tiles from an earlier pyramid of a different size would be left behind otherwise
+        shutil.rmtree(self.tiles_dir, ignore_errors=True)
+        for level in self.levels:
+            os.makedirs(os.path.join(self.tiles_dir, str(level.number)))
+
+    def add_rows(self, image):
+        """Adds the next full-width band of rows of the full-resolution image."""
+        self._add_rows(0, image.convert('RGB') if image.mode != 'RGB' else image)
+
+    def _add_rows(self, index, image):
+        level = self.levels[index]
+        level.rows = image if level.rows is None else _stack(level.rows, image)
+        level.received += image.height
+        self._write_tile_rows(level)
+
+        if index + 1 < len(self.levels):
+            rows = image if level.odd_row is None else _stack(level.odd_row, image)
+            even_height = rows.height - rows.height % 2
+            level.odd_row = rows.crop((0, even_height, rows.width, rows.height)) if rows.height % 2 else None
+            if even_height:
+                self._add_rows(index + 1, rows.crop((0, 0, rows.width, even_height)).reduce(2))
+
+    def _write_tile_rows(self, level):
+        """Writes every row of tiles whose pixels have all arrived, then drops the rows no longer needed."""
+        tile_size, overlap = self.tile_size, self.overlap
+        while level.next_tile_row * tile_size < level.height:
+            tile_row = level.next_tile_row
+            band_top = max(tile_row * tile_size - overlap, 0)
+            band_bottom = min((tile_row + 1) * tile_size + overlap, level.height)
+            if level.received < band_bottom:
+                break
+
+            band = level.rows.crop((0, band_top - level.top, level.width, band_bottom - level.top))
+            for column in range(-(-level.width // tile_size)):
+                left = max(column * tile_size - overlap, 0)
+                right = min((column + 1) * tile_size + overlap, level.width)
+                tile_path = os.path.join(self.tiles_dir, str(level.number), f"{column}_{tile_row}.{self.tile_format}")
+                band.crop((left, 0, right, band.height)).save(tile_path, quality=TILE_QUALITY)
+                self.tiles_written += 1
+            level.next_tile_row += 1
+
+        keep_from = max(level.next_tile_row * tile_size - overlap, 0)
+        if keep_from >= level.height:
+            level.rows = None
+        elif level.rows is not None and keep_from > level.top:
+            level.rows = level.rows.crop((0, keep_from - level.top, level.width, level.rows.height))
+            level.top = keep_from
+
+    def close(self):
+        """Writes the remaining tiles of every level and the `.dzi` manifest."""
+        for index, level in enumerate(self.levels):
+            if level.received != level.height:
+                raise ValueError(f"Deep zoom level {level.number} received {level.received} of {level.height} rows.")
+            if level.odd_row is not None:
+                self._add_rows(index + 1, level.odd_row.reduce(2))
+                level.odd_row = None
+            level.rows = None
+
+        with open(self.dzi_path, 'w', encoding='utf-8') as f:
+            f.write(DZI_TEMPLATE.format(
+                tile_size=self.tile_size, overlap=self.overlap, tile_format=self.tile_format,
+                width=self.width, height=self.height
+            ))
+        logging.info(f"Deep zoom pyramid saved as {self.dzi_path} ({len(self.levels)} levels, {self.tiles_written} tiles)")
@@ -0,0 +1,111 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_OUTPUT_FORMATS = ['png']
+DEFAULT_QUALITY = 90 # Quality for the lossy formats, from 0 to 100
+DEFAULT_EFFORT = 4 # From 0 (fastest) to 6 (smallest files), like WebP's 'method'
+MAX_EFFORT = 6
+PALETTE_COLORS = 256
+WEBP_MAX_DIMENSION = 16383 # The WebP format cannot store larger images
+
+def _png_options(options):
+    # Only pass a level when one is set, so the default output matches a plain Image.save
+    compress_level = options.get('compress_level')
+    return {} if compress_level is None else {'compress_level': compress_level}
+
+def _save_png(image, path, options):
+    image.save(path, format='PNG', **_png_options(options))
+
+def _save_quantized_png(image, path, options):
+    from PIL import Image
+
+    # Fast octree quantization without dithering keeps flat areas flat, which is most of a board
+    quantized = image.quantize(colors=PALETTE_COLORS, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+    quantized.save(path, format='PNG', **_png_options(options))
+
+def _save_webp_lossless(image, path, options):
+    # For lossless WebP, 'quality' is how hard the encoder tries rather than how much is kept
+    effort = options['effort']
+    image.save(path, format='WEBP', lossless=True, quality=effort * 100 // MAX_EFFORT, method=effort)
+
+def _save_webp_lossy(image, path, options):
+    image.save(path, format='WEBP', quality=options['quality'], method=options['effort'])
+
+def _save_avif(image, path, options):
+    # AVIF's speed runs from 0 (slowest) to 10; the default effort maps to Pillow's default speed of 6
+    image.save(path, format='AVIF', quality=options['quality'], speed=10 - options['effort'])
+
+# Format name -> (file suffix, Pillow feature it needs, save function)
+ENCODERS = {
+    'png': (".png", None, _save_png),
+    'png-quantized': (".quantized.png", None, _save_quantized_png),
+    'webp': (".webp", 'webp', _save_webp_lossless),
+    'webp-lossy': (".lossy.webp", 'webp', _save_webp_lossy),
+    'avif': (".avif", 'avif', _save_avif),
+}
+
+def get_encoder_options(config):
+    """Returns the encoder options set in a board config."""
+    return {
+        'quality': config.get('outputQuality', DEFAULT_QUALITY),
+        'effort': min(max(config.get('outputEffort', DEFAULT_EFFORT), 0), MAX_EFFORT),
+        'compress_level': config.get('pngCompressLevel'),
+    }
+
+def unsupported_format_reason(name, size):
+    """Returns why an image of `size` cannot be written in format `name`, or None if it can."""
+    from PIL import features
+
+    if name not in ENCODERS:
+        return f"unknown format (choose from {', '.join(ENCODERS)})"
+    feature = ENCODERS[name][1]
+    if feature and not features.check(feature):
+        return f"this Pillow build has no {feature.upper()} support"
+    if feature == 'webp' and max(size) > WEBP_MAX_DIMENSION:
+        return f"WebP images cannot be larger than {WEBP_MAX_DIMENSION} pixels on a side"
+    return None
+
+def _encode(image, name, path, options, copy):
+    start = time.perf_counter()
+    # Pillow keeps save options on the image object, so each concurrent save needs its own image
+    ENCODERS[name][2](image.copy() if copy else image, path, options)
+    return os.path.getsize(path), time.perf_counter() - start
+
+def encode_image(image, output_base, formats, options, max_workers=None):
+    """
+    Saves `image` as `output_base` plus each format's suffix, encoding the formats in parallel threads
+    (Pillow releases the GIL while it encodes). Formats that cannot hold the image, or fail to encode
+    it, are skipped with a warning. Returns a list of (format, path, size in bytes, seconds) for the
+    files that were written.
+    """
+    jobs = []
+    for name in formats:
+        reason = unsupported_format_reason(name, image.size)
+        if reason:
+            logging.warning(f"Skipping '{name}' output: {reason}.")
+        else:
+            jobs.append((name, output_base + ENCODERS[name][0]))
+    if not jobs:
+        return []
+
+    image.load() # Decode a lazily opened image once, before the threads share it
+    results = []
+    with ThreadPoolExecutor(max_workers=max_workers or len(jobs)) as executor:
+        futures = [executor.submit(_encode, image, name, path, options, index > 0) for index, (name, path) in enumerate(jobs)]
+        for (name, path), future in zip(jobs, futures):
+            try:
+                results.append((name, path) + future.result())
+            except (OSError, ValueError) as e:
+                if name == 'png':
+                    raise # The PNG is the board itself, so the build cannot go on without it
+                logging.warning(f"Could not write '{name}' output: {e}")
+    return results
+
+def format_encode_report(results):
+    """Returns a table of the size and encode time of each written file, smallest first."""
+    lines = [f"{'Format':<15}{'Bytes':>14}{'Seconds':>10}  File"]
+    for name, path, size, seconds in sorted(results, key=lambda result: result[2]):
+        lines.append(f"{name:<15}{size:>14,}{seconds:>10.2f}  {os.path.basename(path)}")
+    return "\n".join(lines)
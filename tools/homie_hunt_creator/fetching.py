@@ -0,0 +1,338 @@
+import copy
+import email.utils
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+import zipfile
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from image_cache import write_atomic
+
+CONNECT_TIMEOUT = 5 # Seconds to wait for a connection to the wiki
+READ_TIMEOUT = 30 # Seconds to wait between bytes of a response
+MAX_RETRIES = 4 # Retries after the first attempt, for connection errors, timeouts and retryable statuses
+BACKOFF_BASE = 0.5 # Seconds before the first retry; doubled for every further retry
+BACKOFF_CAP = 30 # Longest wait between retries, in seconds
+MAX_RETRY_AFTER = 120 # A server asking to wait longer than this many seconds is not retried
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+ARCHIVE_INDEX_NAME = "responses.json" # Request URL -> recorded response, inside a record/replay archive
+RECORDED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+DEFAULT_RATE_LIMIT = 10 # Requests per second to any one host
+CIRCUIT_FAILURE_THRESHOLD = 5 # Consecutive failures to one host before requests to it fail fast
+CIRCUIT_RESET_SECONDS = 30 # How long a host is skipped before one trial request is let through
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request to a host that has failed too many times in a row."""
+
+class NotRecordedError(requests.exceptions.ConnectionError):
+    """Raised when a replayed build asks for a URL that is not in the archive."""
+
+def parse_retry_after(value, now=None):
+    """Returns the wait in seconds from a Retry-After header (seconds or an HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(retry_at.timestamp() - now, 0.0)
+
+class HostRateLimiter:
+    """Spaces out requests to each host so that no host gets more than `rate` requests per second."""
+
+    def __init__(self, rate=DEFAULT_RATE_LIMIT, clock=time.monotonic, sleep=time.sleep):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.clock = clock
+        self.sleep = sleep
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        """Blocks until the next request to `host` may be sent. Returns the time spent waiting."""
+        with self._lock:
+            now = self.clock()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            self.sleep(delay)
+        return delay
+
+    def hold(self, host, seconds):
+        """Keeps every request to `host` back for `seconds`, e.g. after a Retry-After header."""
+        with self._lock:
+            until = self.clock() + seconds
+            self._next_slot[host] = max(self._next_slot.get(host, until), until)
+
+class CircuitBreaker:
+    """
+    Tracks consecutive failures per host. After `failure_threshold` of them the circuit for that host
+    opens and requests fail fast for `reset_seconds`; then a single trial request is allowed, which
+    closes the circuit again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_seconds=CIRCUIT_RESET_SECONDS, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.clock = clock
+        self._failures = {}
+        self._open_until = {}
+        self._lock = threading.Lock()
+
+    def allow(self, host):
+        """Returns True if a request to `host` may be sent now."""
+        with self._lock:
+            open_until = self._open_until.get(host)
+            if open_until is None:
+                return True
+            if self.clock() < open_until:
+                return False
+            # Half-open: let this request through as the trial, and keep the others back until it finishes
+            self._open_until[host] = self.clock() + self.reset_seconds
+            return True
+
+    def record_success(self, host):
+        with self._lock:
+            self._failures.pop(host, None)
+            self._open_until.pop(host, None)
+
+    def record_failure(self, host):
+        with self._lock:
+            failures = self._failures.get(host, 0) + 1
+            self._failures[host] = failures
+            if failures >= self.failure_threshold:
+                if failures == self.failure_threshold:
+                    logging.error(f"{host} failed {failures} times in a row; skipping it for {self.reset_seconds} seconds.")
+                self._open_until[host] = self.clock() + self.reset_seconds
+
+class Fetcher:
+    """
+    Sends GET requests through a pooled requests session with connect/read timeouts, per-host rate
+    limiting and a per-host circuit breaker. Connection errors, timeouts, truncated bodies and
+    429/5xx responses are retried with capped exponential backoff and full jitter, waiting at least
+    as long as any Retry-After header asks. Safe to share between threads; use as a context manager
+    to close the session.
+    """
+
+    def __init__(self, session, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_retries=MAX_RETRIES,
+                 rate_limiter=None, circuit_breaker=None, sleep=time.sleep):
+        self.session = session
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.rate_limiter = rate_limiter or HostRateLimiter(sleep=sleep)
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.sleep = sleep
+        self.stats = {'requests': 0, 'retries': 0, 'failures': 0, 'rejected': 0, 'throttled': 0, 'timeouts': 0}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def with_own_stats(self):
+        """
+        Returns a view of this fetcher that shares its session, rate limiter, circuit breaker and lock
+        but counts its own `stats` from zero, so concurrent builds can each report what they did. Close
+        the original, not the view.
+        """
+        view = copy.copy(self)
+        view.stats = dict.fromkeys(self.stats, 0)
+        return view
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+    def get(self, url, params=None, headers=None):
+        """
+        Returns the response to a GET request. After the retries run out, the last retryable response
+        is returned as is, or the last error is raised. Raises CircuitOpenError without sending
+        anything while the host's circuit is open.
+        """
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            if not self.circuit_breaker.allow(host):
+                self._count('rejected')
+                raise CircuitOpenError(f"Skipping request to {host}: too many recent failures.")
+            self.rate_limiter.wait(host)
+            self._count('requests')
+
+            retry_after = None
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                if isinstance(e, requests.exceptions.Timeout):
+                    self._count('timeouts')
+                self.circuit_breaker.record_failure(host)
+                if attempt >= self.max_retries:
+                    self._count('failures')
+                    raise
+                logging.warning(f"Request to {host} failed ({e}); retrying.")
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    self.circuit_breaker.record_success(host)
+                    return response
+
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                if response.status_code == 429:
+                    # The server is up but asking us to slow down, so it does not count toward the circuit
+                    self._count('throttled')
+                else:
+                    self.circuit_breaker.record_failure(host)
+                if attempt >= self.max_retries or (retry_after or 0) > MAX_RETRY_AFTER:
+                    self._count('failures')
+                    return response
+                if retry_after is not None:
+                    self.rate_limiter.hold(host, retry_after)
+                logging.warning(f"{host} answered {response.status_code}; retrying.")
+
+            delay = self._backoff(attempt)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            self._count('retries')
+            self.sleep(delay)
+            attempt += 1
+
+    def format_stats(self):
+        """Returns a one-line summary of the request statistics."""
+        return ", ".join(f"{name}={value}" for name, value in self.stats.items())
+
+def create_fetcher(pool_size, rate_limit=DEFAULT_RATE_LIMIT):
+    """
+    Creates a Fetcher whose connection pool is large enough to be shared by `pool_size` workers and
+    which sends at most `rate_limit` requests per second to each host (0 for no limit).
+    """
+    session = requests.Session()
+    session.headers.update({'User-Agent': 'HomieHuntCreator/1.1'})
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return Fetcher(session, rate_limiter=HostRateLimiter(rate_limit))
+
+def request_key(url, params=None):
+    """Returns the full URL a GET request with `params` is sent to, which identifies it in an archive."""
+    return requests.Request('GET', url, params=params).prepare().url
+
+class RecordingFetcher:
+    """
+    Wraps a Fetcher and keeps every final response it returns, so the build can be replayed offline
+    with ReplayFetcher. `close` writes the archive: a zip file with an index of request URLs to
+    status codes and headers, plus each distinct response body stored once by content hash.
+    """
+
+    def __init__(self, fetcher, archive_path):
+        self.fetcher = fetcher
+        self.archive_path = archive_path
+        self.responses = {}
+        self.bodies = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, url, params=None, headers=None):
+        response = self.fetcher.get(url, params=params, headers=headers)
+        body_hash = hashlib.sha256(response.content).hexdigest()
+        with self._lock:
+            self.bodies[body_hash] = response.content
+            self.responses[request_key(url, params)] = {
+                'status': response.status_code,
+                'headers': {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers},
+                'body': body_hash,
+            }
+        return response
+
+    @property
+    def stats(self):
+        return dict(self.fetcher.stats, recorded=len(self.responses))
+
+    def format_stats(self):
+        return ", ".join(f"{name}={value}" for name, value in self.stats.items())
+
+    def close(self):
+        self.fetcher.close()
+
+        def write(f):
+            with zipfile.ZipFile(f, 'w') as archive:
+                archive.writestr(ARCHIVE_INDEX_NAME, json.dumps(self.responses, indent=2, sort_keys=True), zipfile.ZIP_DEFLATED)
+                for body_hash, content in sorted(self.bodies.items()):
+                    # Images are compressed already, so only the API's JSON is worth deflating
+                    compression = zipfile.ZIP_DEFLATED if content[:1] in (b'{', b'[') else zipfile.ZIP_STORED
+                    archive.writestr(f"bodies/{body_hash}", content, compression)
+
+        write_atomic(self.archive_path, write)
+        logging.info(f"Recorded {len(self.responses)} responses ({len(self.bodies)} distinct bodies) to {self.archive_path}")
+
+class ReplayFetcher:
+    """
+    Answers GET requests from an archive written by RecordingFetcher, without touching the network.
+    Requests that were not recorded raise NotRecordedError.
+    """
+
+    def __init__(self, archive_path):
+        self.archive_path = archive_path
+        self.stats = {'replayed': 0, 'not_recorded': 0}
+        try:
+            self._archive = zipfile.ZipFile(archive_path)
+        except zipfile.BadZipFile:
+            raise ValueError(f"{archive_path} is not a zip archive.")
+        try:
+            self._responses = json.loads(self._archive.read(ARCHIVE_INDEX_NAME))
+        except KeyError:
+            self._archive.close()
+            raise ValueError(f"{archive_path} has no {ARCHIVE_INDEX_NAME}; it was not written by --record.")
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, url, params=None, headers=None):
+        key = request_key(url, params)
+        recorded = self._responses.get(key)
+        with self._lock:
+            if recorded is None:
+                self.stats['not_recorded'] += 1
+                raise NotRecordedError(f"{key} is not in {self.archive_path}.")
+            self.stats['replayed'] += 1
+            # ZipFile reads are not safe to interleave between threads
+            content = self._archive.read(f"bodies/{recorded['body']}")
+
+        response = requests.Response()
+        response.status_code = recorded['status']
+        response.headers = CaseInsensitiveDict(recorded['headers'])
+        response.url = key
+        response._content = content
+        return response
+
+    def format_stats(self):
+        return ", ".join(f"{name}={value}" for name, value in self.stats.items())
+
+    def close(self):
+        self._archive.close()
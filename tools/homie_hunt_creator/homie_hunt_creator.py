@@ -1,20 +1,48 @@
+import argparse
 import json
 import logging
 import os
 import csv
+import queue
 import shutil
-import requests
-import tkinter as tk
-from tkinter import filedialog, messagebox
-from PIL import Image, ImageDraw, ImageFont
-from urllib.parse import quote_plus, quote
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from atlas import write_sprite_atlas
+from deep_zoom import DEFAULT_TILE_SIZE, DeepZoomWriter
+from encoders import DEFAULT_OUTPUT_FORMATS, encode_image, format_encode_report, get_encoder_options
+from image_cache import DerivedImageCache, ImageCache, hash_file, write_atomic
+from image_sources import open_image_source
+from incremental import SectionCanvasCache, board_fingerprint
+from instrumentation import NULL_REPORT, RunReport, BuildLogCapture
+from memory_cache import MemoryLRU, image_bytes
+from png_stream import DEFAULT_COMPRESS_LEVEL, PNGStripWriter, open_own_png
+from preflight import MEMORY_WARNING_FRACTION, estimate_peak_memory, format_bytes, resolve_font_path, format_warnings, total_memory_bytes, validate_config
+from prereq_graph import PREREQ_GRAPH_NAME, write_prereq_graph
+from progress import BuildCancelled, BuildProgress, format_progress
+from watch import WATCH_POLL_INTERVAL, FileWatcher, write_preview
+
+# Pillow, requests and tkinter are imported inside the functions that use them, so that `--help` and
+# validation-only runs start instantly and headless machines never need tkinter.
 
 CACHE_DIR = ".cache" # Cache for downloaded images
+CACHE_TTL_SECONDS = 30 * 24 * 60 * 60 # Cached titles and images are revalidated with the wiki after this long
+CACHE_MAX_BYTES = 500 * 1024 * 1024 # Least recently used images are evicted above this size
 OUTPUT_DIR = "output" # Base directory for all generated boards
+FETCH_WORKERS = 8 # Default number of concurrent image fetches (overridable with 'fetchWorkers' in the config)
+EXIT_OK = 0
+EXIT_FAILURE = 1 # At least one board could not be loaded or built
+GUI_POLL_INTERVAL_MS = 100 # How often the window checks for progress from the build thread
+SECTION_MEMO_MAX_BYTES = 256 * 1024 * 1024 # Rendered section canvases a BoardBuilder keeps in memory between builds
+SCALED_MEMO_MAX_BYTES = 128 * 1024 * 1024 # Scaled tile and background images a BoardBuilder keeps in memory between builds
+WATCH_PNG_COMPRESS_LEVEL = 1 # --watch builds favour encoding speed over file size, unless the config sets 'pngCompressLevel'
 
-def setup_logging():
+def setup_logging(level=logging.INFO):
     """Sets up basic logging to the console."""
-    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def clear_cache(cache_dir):
     """Deletes the cache directory if it exists."""
@@ -42,116 +70,71 @@ def load_config(filepath):
     except FileNotFoundError:
         logging.error(f"Configuration file not found at: {filepath}")
         return None
-    except json.JSONDecodeError:
-        logging.error(f"Invalid JSON in configuration file: {filepath}")
+    except json.JSONDecodeError as e:
+        logging.error(f"Invalid JSON in configuration file: {filepath} ({e})")
         return None
     except ValueError as e:
         logging.error(f"Configuration validation failed: {e}")
         return None
 
-def get_wiki_image_url(page_title, api_url, session):
-    """Fetches the main image URL for a given wiki page using a requests session."""
-    logging.info(f"Fetching image URL for wiki page: '{page_title}'")
-    params = {
-        "action": "query",
-        "format": "json",
-        "titles": page_title,
-        "prop": "pageimages",
-        "pithumbsize": 500,  # Request a reasonably sized thumbnail
-        "redirects": 1,      # Follow redirects
-    }
-    try:
-        response = session.get(api_url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        pages = data.get("query", {}).get("pages", {})
-        if not pages:
-            logging.warning(f"No pages found in API response for '{page_title}'.")
-            return None
-
-        # The page ID is unknown, so we get the first (and only) page from the dict
-        page_id = next(iter(pages))
-        if page_id == "-1":
-            logging.warning(f"Wiki page '{page_title}' does not exist.")
-            return None
-
-        page_data = pages[page_id]
-        image_info = page_data.get("thumbnail")
-        if image_info and "source" in image_info:
-            logging.info(f"Found image URL for '{page_title}': {image_info['source']}")
-            return image_info["source"]
-        else:
-            logging.warning(f"No image found on wiki page '{page_title}'.")
-            return None
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Network error fetching image URL for '{page_title}': {e}")
-        return None
-
-def download_image(url, cache_path, session):
-    """Downloads an image from a URL and saves it to the cache."""
-    logging.info(f"Downloading image from {url} to {cache_path}")
-    try:
-        response = session.get(url, stream=True)
-        response.raise_for_status()
-        with open(cache_path, 'wb') as f:
-            shutil.copyfileobj(response.raw, f)
-        logging.info(f"Successfully cached image: {cache_path}")
-        return cache_path
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Failed to download image from {url}: {e}")
-        return None
-
-def get_image(wiki_title, api_url, session):
-    """Fetches an image, using the cache if available."""
-    if not wiki_title:
-        return None
-
-    # Sanitize title to create a valid filename
-    safe_filename = quote_plus(wiki_title) + ".png"
-    cache_path = os.path.join(CACHE_DIR, safe_filename)
-
-    if os.path.exists(cache_path):
-        logging.info(f"Found '{wiki_title}' in cache: {cache_path}")
-        return cache_path
+def collect_wiki_titles(config_data):
+    """Returns every distinct wiki title used by the sections and their tiles, in board order."""
+    titles = []
+    seen = set()
+    for section in config_data['sections']:
+        section_titles = [section.get('wiki')] + [tile_def.get('wiki') for tile_def in section['tiles']]
+        for title in section_titles:
+            if title and title not in seen:
+                seen.add(title)
+                titles.append(title)
+    return titles
 
-    logging.info(f"'{wiki_title}' not in cache, fetching from wiki...")
-    image_url = get_wiki_image_url(wiki_title, api_url, session)
-    if image_url:
-        return download_image(image_url, cache_path, session)
-    return None
-
-def process_sections(config_data, session):
+def process_sections(config_data, image_source, max_workers=None, report=NULL_REPORT):
     """
     Iterates through sections and tiles, fetches images, and prepares data for generation.
+    All images are fetched from `image_source` up front, before the layout data is built.
     """
     logging.info("Processing sections and tiles...")
+    if max_workers is None:
+        max_workers = config_data['config'].get('fetchWorkers', FETCH_WORKERS)
+
+    image_paths = image_source.fetch_images(collect_wiki_titles(config_data), max_workers, report)
+    with report.stage('tile_data'):
+        return build_tile_data(config_data, image_paths)
+
+def build_tile_data(config_data, image_paths=None):
+    """
+    Expands the config's tile definitions into one CSV row per tile instance and the per-section data
+    the layout and rendering use. `image_paths` maps wiki titles to downloaded images; without it every
+    image path is None, which is enough for the layout. Does no network or image work.
+    """
     global_config = config_data['config']
-    api_url = global_config['wikiApiUrl']
     auto_link = global_config.get('autoLinkTileInstances', False)
     auto_generate_ids = global_config.get('autoGenerateTileIDs', False)
+    image_paths = image_paths or {}
 
     all_tile_data_for_csv = []
     image_layout_data = []
 
     for section_index, section in enumerate(config_data['sections']):
-        logging.info(f"--- Processing section: {section['title']} ---")
+        logging.debug(f"--- Processing section: {section['title']} ---")
         section_layout = {
             'title': section['title'],
-            'background_path': get_image(section.get('wiki'), api_url, session),
+            'background_path': image_paths.get(section.get('wiki')),
             'tile_groups': []
         }
 
         for tile_def_index, tile_def in enumerate(section['tiles']):
             tile_group_layout = {
                 'title': tile_def['title'],
-                'image_path': get_image(tile_def.get('wiki'), api_url, session),
+                'image_path': image_paths.get(tile_def.get('wiki')),
                 'tiles': []
             }
 
             base_tile_id = ""
             if auto_generate_ids:
                 base_tile_id = f"s{section_index+1}-t{tile_def_index+1}"
-                logging.info(f"Auto-generating base tile ID: '{base_tile_id}' for tile '{tile_def['title']}'")
+                logging.debug(f"Auto-generating base tile ID: '{base_tile_id}' for tile '{tile_def['title']}'")
             else:
                 base_tile_id = tile_def.get('tileID')
                 if not base_tile_id:
@@ -188,214 +171,591 @@ def process_sections(config_data, session):
 
     return all_tile_data_for_csv, image_layout_data
 
-def generate_board_image(config, image_layout_data, all_tile_data_for_csv, output_path):
-    """Generates the final 'tall' board image."""
-    logging.info("Generating final board image...")
-    
-    # --- Load Fonts ---
-    # Load each font individually to be resilient to one missing font file.
-    try:
-        board_title_font = ImageFont.truetype(config.get('boardTitleFont', 'arial.ttf'), config.get('boardTitleFontSize', 64))
-    except IOError:
-        logging.warning(f"Board title font '{config.get('boardTitleFont')}' not found. Falling back to default.")
-        board_title_font = ImageFont.load_default()
-    try:
-        section_font = ImageFont.truetype(config['sectionTitleFont'], config['sectionTitleFontSize'])
-    except IOError:
-        logging.warning(f"Section title font '{config['sectionTitleFont']}' not found. Falling back to default.")
-        section_font = ImageFont.load_default()
-    try:
-        tile_font = ImageFont.truetype(config['tileTitleFont'], config['tileTitleFontSize'])
-    except IOError:
-        logging.warning(f"Tile title font '{config['tileTitleFont']}' not found. Falling back to default.")
-        tile_font = ImageFont.load_default()
+def layout_section(config, section):
+    """
+    Works out where a section's titles and tiles go, relative to the section's top-left corner.
+    Returns a dict with the section's content height and, for each tile group, the y of its title and
+    the (tile_id, x, y) position of each of its tiles.
+    """
+    tile_columns = config.get('tileColumns', 5)
+    padding = config['sectionPadding']
+    groups = []
+
+    content_y = padding
+    content_y += config['sectionTitleFontSize'] + padding
+    for group in section['tile_groups']:
+        group_layout = {'title_y': content_y, 'tile_positions': []}
+        content_y += config['tileTitleFontSize'] + config['tilePadding']
+
+        for k, tile_instance in enumerate(group['tiles']):
+            col = k % tile_columns
+            row = k // tile_columns
+            x = padding + col * (config['tileWidth'] + config['tilePadding'])
+            y = content_y + row * (config['tileWidth'] + config['tilePadding'])
+            group_layout['tile_positions'].append((tile_instance['id'], x, y))
 
-    # --- Calculate Section Heights & Board Dimensions ---
+        # After all tiles in a group, advance the y-position
+        num_tile_rows = -(-len(group['tiles']) // tile_columns)  # Ceiling division
+        content_y += num_tile_rows * (config['tileWidth'] + config['tilePadding'])
+        groups.append(group_layout)
+
+    return {'height': content_y + padding, 'groups': groups}
+
+def compute_layout(config, image_layout_data):
+    """
+    Computes the geometry of the whole board without drawing anything: the board size, the title box
+    height, and for each section its layout (see layout_section) plus its board 'origin', 'width' and
+    'row_height' (every section in a row is drawn at the row's height). 'rows' lists the (top, bottom,
+    number of sections) of each row of sections, including the padding below it.
+    """
     section_columns = config.get('sectionColumns', 1)
     tile_columns = config.get('tileColumns', 5)
     tile_width = config.get('tileWidth', 64)
     tile_padding = config.get('tilePadding', 5)
     padding = config['sectionPadding']
 
-    # NEW: Calculate section_width based on tile configuration
+    # Calculate section_width based on tile configuration
     section_width = (tile_width * tile_columns) + (tile_padding * (tile_columns - 1)) + (padding * 2)
-
-    section_heights = []
-    for section in image_layout_data:
-        height = padding + config['sectionTitleFontSize'] + padding
-        for group in section['tile_groups']:
-            height += config['tileTitleFontSize'] + config['tilePadding']
-            num_rows = -(-len(group['tiles']) // tile_columns)  # Ceiling division
-            height += num_rows * (config['tileWidth'] + config['tilePadding'])
-        height += padding
-        section_heights.append(height)
-
     board_width = (section_width * section_columns) + (padding * (section_columns + 1))
     title_box_height = config.get('boardTitleFontSize', 64) + (padding * 2)
-    total_board_height = padding + title_box_height + padding
-    num_section_rows = -(-len(image_layout_data) // section_columns)
-    for i in range(num_section_rows):
-        row_start_index = i * section_columns
-        row_end_index = row_start_index + section_columns
-        max_row_height = max(section_heights[row_start_index:row_end_index]) if row_start_index < len(section_heights) else 0
-        total_board_height += max_row_height + padding
-
-    # --- Create Image ---
-    board = Image.new('RGB', (board_width, int(total_board_height)), color=config['themeColors']['background'])
-    draw = ImageDraw.Draw(board, 'RGBA') # Use RGBA for transparent shapes
-
-    # --- Draw Board Title Box and Text ---
-    title_text = config.get('boardTitle', '')
-    if title_text:
-        title_box_y = padding
-        
-        # Draw themed background box for the title
-        title_bg_color = config['themeColors'].get('boardTitleBackgroundColor')
-        if title_bg_color:
-            draw.rectangle(
-                [padding, title_box_y, board_width - padding, title_box_y + title_box_height],
-                fill=title_bg_color
-            )
-        title_border_color = config['themeColors'].get('boardTitleBorderColor')
-        if title_border_color:
-            draw.rectangle(
-                [padding, title_box_y, board_width - padding, title_box_y + title_box_height],
-                outline=title_border_color,
-                width=2
-            )
-        
-        # Calculate centered position for the text
-        text_bbox = draw.textbbox((0, 0), title_text, font=board_title_font)
-        text_x = (board_width - (text_bbox[2] - text_bbox[0])) / 2
-        text_y = title_box_y + (title_box_height - (text_bbox[3] - text_bbox[1])) / 2
-        draw.text((text_x, text_y), title_text, font=board_title_font, fill=config['themeColors'].get('primaryText', '#ffffff'))
-    
-    # --- Draw Sections ---
+
+    section_layouts = [layout_section(config, section) for section in image_layout_data]
+    rows = []
     current_board_y = padding + title_box_height + padding
+    for row_start_index in range(0, len(section_layouts), section_columns):
+        row_layouts = section_layouts[row_start_index:row_start_index + section_columns]
+        max_row_height = max(section_layout['height'] for section_layout in row_layouts)
+        for j, section_layout in enumerate(row_layouts):
+            section_layout['origin'] = (padding + j * (section_width + padding), current_board_y)
+            section_layout['width'] = section_width
+            section_layout['row_height'] = max_row_height
+
+        rows.append((int(current_board_y), int(current_board_y + max_row_height + padding), len(row_layouts)))
+        current_board_y += max_row_height + padding
+
+    return {
+        'board_width': board_width,
+        'board_height': current_board_y,
+        'padding': padding,
+        'title_box_height': title_box_height,
+        'sections': section_layouts,
+        'rows': rows,
+    }
+
+def apply_tile_positions(config, layout, all_tile_data_for_csv):
+    """Fills in the CSV position columns of every tile as percentages of the board size."""
     tile_map = {tile['id']: tile for tile in all_tile_data_for_csv}
+    board_width, board_height = layout['board_width'], layout['board_height']
+    for section_layout in layout['sections']:
+        section_x, section_y = section_layout['origin']
+        for group_layout in section_layout['groups']:
+            for tile_id, tile_x, tile_y in group_layout['tile_positions']:
+                if tile_id in tile_map:
+                    x = section_x + tile_x
+                    y = section_y + tile_y
+                    tile_map[tile_id]['Left (%)'] = (x / board_width) * 100
+                    tile_map[tile_id]['Top (%)'] = (y / board_height) * 100
+                    tile_map[tile_id]['Width (%)'] = (config['tileWidth'] / board_width) * 100
+                    tile_map[tile_id]['Height (%)'] = (config['tileWidth'] / board_height) * 100
 
-    for i in range(num_section_rows):
-        row_start_index = i * section_columns
-        row_end_index = row_start_index + section_columns
-        row_sections = image_layout_data[row_start_index:row_end_index]
-        max_row_height = max(section_heights[row_start_index:row_end_index]) if row_start_index < len(section_heights) else 0
-
-        for j, section in enumerate(row_sections):
-            section_x = padding + j * (section_width + padding)
-            section_y = current_board_y
-
-            # Draw section border
-            draw.rectangle(
-                [section_x, section_y, section_x + section_width, section_y + max_row_height],
-                outline=config['themeColors'].get('sectionBorder', '#333333'),
-                width=2
-            )
-
-            # Draw section background image
-            if section['background_path']:
-                try:
-                    # Open image and immediately convert to RGBA to preserve transparency info
-                    base_img = Image.open(section['background_path']).convert('RGBA')
+def contain_size(width, height, target_w, target_h):
+    """Returns the largest size with the same aspect ratio as (width, height) that fits inside the target box."""
+    scale_ratio = min(target_w / width, target_h / height)
+    return int(width * scale_ratio), int(height * scale_ratio)
 
-                    # --- FINAL: "Contain" and center scaling logic, allowing upscaling ---
-                    target_w, target_h = section_width, int(max_row_height)
-                    
-                    # Calculate the ratio and decide which dimension to scale by to fit inside the target
-                    ratio_w = target_w / base_img.width
-                    ratio_h = target_h / base_img.height
-                    scale_ratio = min(ratio_w, ratio_h)
-
-                    new_w = int(base_img.width * scale_ratio)
-                    new_h = int(base_img.height * scale_ratio)
-                        
-                    # Resize with a high-quality filter. This handles both upscaling and downscaling.
-                    bg_img = base_img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-                    
-                    # Create a new alpha channel with the desired opacity
-                    opacity = int(255 * config.get('sectionBgOpacity', 0.15))
-                    alpha = bg_img.getchannel('A')
-                    new_alpha = alpha.point(lambda p: int(p * (opacity / 255)))
-                    bg_img.putalpha(new_alpha)
+def load_scaled_image(path, target_w, target_h, opacity=None, derived_cache=None):
+    """
+    Returns the image at `path` as RGBA, LANCZOS-scaled to fit inside (target_w, target_h) and, if
+    `opacity` (0-255) is given, with its alpha channel scaled by it.
+    Variants are read from and written to `derived_cache` when one is given.
+    """
+    from PIL import Image
+
+    # Opening an image only reads its header, so the target size is known without decoding it
+    with Image.open(path) as source:
+        new_size = contain_size(source.width, source.height, target_w, target_h)
+
+    def create():
+        with Image.open(path) as source:
+            # Convert to RGBA to preserve transparency info, then resize with a high-quality filter.
+            # This handles both upscaling and downscaling.
+            scaled_img = source.convert('RGBA').resize(new_size, Image.Resampling.LANCZOS)
+        if opacity is not None:
+            # Create a new alpha channel with the desired opacity
+            alpha = scaled_img.getchannel('A')
+            scaled_img.putalpha(alpha.point(lambda p: int(p * (opacity / 255))))
+        return scaled_img
+
+    if derived_cache is None:
+        return create()
+    return derived_cache.get(path, new_size, 'LANCZOS', opacity, create)
+
+class ScaledImageMemo:
+    """
+    Remembers every scaled image produced during a render, so each distinct (path, target size, opacity)
+    is decoded and resized once however many tiles or sections use it. With a `shared` MemoryLRU (kept
+    by a BoardBuilder), scaled images are also reused from earlier builds, keyed by the image content.
+    """
+
+    def __init__(self, derived_cache=None, report=NULL_REPORT, shared=None):
+        self.derived_cache = derived_cache
+        self.report = report
+        self.shared = shared
+        self.images = {}
+        self.decodes = 0
+        self.saved_decodes = 0
+
+    def get(self, path, target_w, target_h, opacity=None):
+        """Returns the scaled RGBA image for `path`, loading it only the first time it is requested."""
+        key = (path, target_w, target_h, opacity)
+        image = self.images.get(key)
+        if image is not None:
+            self.saved_decodes += 1
+            return image
+        shared_key = (hash_file(path), target_w, target_h, opacity) if self.shared is not None else None
+        image = self.shared.get(shared_key) if shared_key else None
+        if image is not None:
+            self.saved_decodes += 1
+        else:
+            with self.report.stage('decode_resize'):
+                image = load_scaled_image(path, target_w, target_h, opacity, self.derived_cache)
+            self.report.count('images_decoded')
+            self.decodes += 1
+            if shared_key:
+                self.shared.put(shared_key, image, image_bytes(image))
+        self.images[key] = image
+        return image
+
+def load_font(path, size, description):
+    """Loads a TrueType font (see resolve_font_path), falling back to Pillow's default font if it cannot be found."""
+    from PIL import ImageFont
+
+    resolved_path = resolve_font_path(path)
+    if resolved_path is None:
+        logging.warning(f"{description} font '{path}' not found. Falling back to default.")
+        return ImageFont.load_default()
+    return ImageFont.truetype(resolved_path, size)
+
+def load_fonts(config):
+    """
+    Loads the board title, section title and tile title fonts.
+    Each font is loaded individually to be resilient to one missing font file.
+    """
+    return {
+        'board_title': load_font(config.get('boardTitleFont', 'arial.ttf'), config.get('boardTitleFontSize', 64), "Board title"),
+        'section': load_font(config['sectionTitleFont'], config['sectionTitleFontSize'], "Section title"),
+        'tile': load_font(config['tileTitleFont'], config['tileTitleFontSize'], "Tile title"),
+    }
+
+def render_section(config, section, section_layout, fonts, image_memo, report=NULL_REPORT):
+    """
+    Renders one section (border, background image, titles and tile grid) at the positions given by
+    its layout (see compute_layout) onto its own canvas, which covers the section's box from (0, 0)
+    to (width, row_height) inclusive. Returns the canvas.
+    """
+    from PIL import Image, ImageDraw
+
+    section_width, section_height = section_layout['width'], section_layout['row_height']
+    canvas = Image.new('RGB', (section_width + 1, int(section_height) + 1), color=config['themeColors']['background'])
+    draw = ImageDraw.Draw(canvas, 'RGBA') # Use RGBA for transparent shapes
+    padding = config['sectionPadding']
+
+    # Draw section border
+    draw.rectangle(
+        [0, 0, section_width, section_height],
+        outline=config['themeColors'].get('sectionBorder', '#333333'),
+        width=2
+    )
+
+    # Draw section background image
+    if section['background_path']:
+        try:
+            # --- FINAL: "Contain" and center scaling logic, allowing upscaling ---
+            target_w, target_h = section_width, int(section_height)
+            opacity = int(255 * config.get('sectionBgOpacity', 0.15))
+            bg_img = image_memo.get(section['background_path'], target_w, target_h, opacity)
+            
+            # Calculate paste position to center the image
+            paste_x = (target_w - bg_img.width) // 2 # Center horizontally
+            paste_y = target_h - bg_img.height # Align to bottom vertically
+            canvas.paste(bg_img, (paste_x, paste_y), bg_img) # Use the image's own alpha channel as the mask
+        except Exception as e:
+            logging.error(f"Could not process background image {section['background_path']}: {e}")
+
+    # --- Draw content within the section ---
+    draw.text((padding, padding), section['title'], font=fonts['section'], fill=config['themeColors']['sectionTitle'])
+
+    for group, group_layout in zip(section['tile_groups'], section_layout['groups']):
+        draw.text((padding, group_layout['title_y']), group['title'], font=fonts['tile'], fill=config['themeColors']['tileTitle'])
+        
+        for _, x, y in group_layout['tile_positions']:
+            # Draw semi-transparent tile background
+            tile_bg_color = tuple(config['themeColors'].get('tileBackgroundColor', [50, 50, 50, 128]))
+            draw.rectangle([x, y, x + config['tileWidth'], y + config['tileWidth']], fill=tile_bg_color)
+
+            # Paste tile image
+            if group['image_path']:
+                try:
+                    # --- Scale image to fit within tile bounds while preserving aspect ratio ---
+                    target_size = config['tileWidth']
+                    tile_img = image_memo.get(group['image_path'], target_size, target_size)
                     
-                    # Calculate paste position to center the image
-                    paste_x = section_x + (target_w - bg_img.width) // 2 # Center horizontally
-                    paste_y = int(section_y) + (target_h - bg_img.height) # Align to bottom vertically
-                    board.paste(bg_img, (paste_x, paste_y), bg_img) # Use the image's own alpha channel as the mask
+                    # Calculate centered paste position
+                    paste_x = x + (target_size - tile_img.width) // 2
+                    paste_y = y + (target_size - tile_img.height) // 2
+                    canvas.paste(tile_img, (paste_x, paste_y), tile_img) # Use RGBA mask for transparency
                 except Exception as e:
-                    logging.error(f"Could not process background image {section['background_path']}: {e}")
+                    logging.error(f"Could not open or paste image {group['image_path']}: {e}")
+                    report.count('placeholders_drawn')
+                    draw.rectangle([x, y, x + config['tileWidth'], y + config['tileWidth']], fill="#555", outline="#888")
+            else:
+                report.count('placeholders_drawn')
+                draw.rectangle([x, y, x + config['tileWidth'], y + config['tileWidth']], fill="#333", outline="#666")
 
-            # --- Draw content within the section ---
-            content_y = section_y + padding
-            draw.text((section_x + padding, content_y), section['title'], font=section_font, fill=config['themeColors']['sectionTitle'])
-            content_y += config['sectionTitleFontSize'] + padding
+    return canvas
 
-            for group in section['tile_groups']:
-                draw.text((section_x + padding, content_y), group['title'], font=tile_font, fill=config['themeColors']['tileTitle'])
-                content_y += config['tileTitleFontSize'] + config['tilePadding']
-                
-                for k, tile_instance in enumerate(group['tiles']):
-                    col = k % tile_columns
-                    row = k // tile_columns
-                    
-                    x = section_x + padding + col * (config['tileWidth'] + config['tilePadding'])
-                    y = content_y + row * (config['tileWidth'] + config['tilePadding'])
-
-                    # Draw semi-transparent tile background
-                    tile_bg_color = tuple(config['themeColors'].get('tileBackgroundColor', [50, 50, 50, 128]))
-                    draw.rectangle([x, y, x + config['tileWidth'], y + config['tileWidth']], fill=tile_bg_color)
-
-                    # Update CSV data with calculated positions
-                    tile_id = tile_instance['id']
-                    if tile_id in tile_map:
-                        tile_map[tile_id]['Left (%)'] = (x / board_width) * 100
-                        tile_map[tile_id]['Top (%)'] = (y / total_board_height) * 100
-                        tile_map[tile_id]['Width (%)'] = (config['tileWidth'] / board_width) * 100
-                        tile_map[tile_id]['Height (%)'] = (config['tileWidth'] / total_board_height) * 100
-
-                    # Paste tile image
-                    if group['image_path']:
-                        try:
-                            base_tile_img = Image.open(group['image_path']).convert("RGBA")
-                            
-                            # --- Scale image to fit within tile bounds while preserving aspect ratio ---
-                            target_size = config['tileWidth']
-                            
-                            # Calculate the ratio to scale the image down to fit
-                            ratio = min(target_size / base_tile_img.width, target_size / base_tile_img.height)
-                            
-                            # New dimensions
-                            new_w = int(base_tile_img.width * ratio)
-                            new_h = int(base_tile_img.height * ratio)
-                            
-                            tile_img = base_tile_img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-                            
-                            # Calculate centered paste position
-                            paste_x = x + (target_size - new_w) // 2
-                            paste_y = y + (target_size - new_h) // 2
-                            board.paste(tile_img, (paste_x, paste_y), tile_img) # Use RGBA mask for transparency
-                        except Exception as e:
-                            logging.error(f"Could not open or paste image {group['image_path']}: {e}")
-                            draw.rectangle([x, y, x + config['tileWidth'], y + config['tileWidth']], fill="#555", outline="#888")
-                    else:
-                        draw.rectangle([x, y, x + config['tileWidth'], y + config['tileWidth']], fill="#333", outline="#666")
-
-                # After processing all tiles in a group, advance the y-position
-                num_tile_rows = -(-len(group['tiles']) // tile_columns)
-                content_y += num_tile_rows * (config['tileWidth'] + config['tilePadding'])
-        
-        current_board_y += max_row_height + padding
+# Per-process state for sections rendered in a process pool, set up once by _init_section_worker
+_section_worker = {}
+
+def _init_section_worker(config, cache_dir):
+    """Loads the fonts and opens the resized image cache once for each render worker process."""
+    setup_logging()
+    _section_worker['config'] = config
+    _section_worker['fonts'] = load_fonts(config)
+    _section_worker['image_memo'] = ScaledImageMemo(DerivedImageCache(cache_dir) if cache_dir else None)
+
+def _render_section_in_worker(job):
+    """Renders one job and returns the canvas with a snapshot of the job's own stage times and counters."""
+    section, section_layout = job
+    report = RunReport()
+    image_memo = _section_worker['image_memo']
+    image_memo.report = report
+    with report.stage('composite'):
+        canvas = render_section(_section_worker['config'], section, section_layout, _section_worker['fonts'], image_memo, report)
+    return canvas, report.snapshot()
+
+def iter_rendered_sections(config, jobs, fonts, derived_cache=None, max_workers=1, report=NULL_REPORT, scaled_images=None):
+    """
+    Renders each (section, section_layout) job onto its own canvas, using a pool of `max_workers`
+    processes when it is greater than 1, and yields the canvases in job order. Only a few finished
+    canvases are waiting to be consumed at any time. The stage times and counters of the worker
+    processes are merged into `report`. Sections rendered in this process share the scaled images
+    in `scaled_images` (a MemoryLRU), if given.
+    """
+    if not jobs:
+        return
+    report.set_total('sections', len(jobs))
+    if max_workers <= 1 or len(jobs) <= 1:
+        image_memo = ScaledImageMemo(derived_cache, report, scaled_images)
+        for section, section_layout in jobs:
+            canvas = render_section(config, section, section_layout, fonts, image_memo, report)
+            report.advance('sections')
+            yield canvas
+        logging.info(f"Loaded {image_memo.decodes} distinct scaled images ({image_memo.saved_decodes} repeat decodes avoided).")
+        return
+
+    logging.info(f"Rendering {len(jobs)} sections with {max_workers} worker processes...")
+    cache_dir = derived_cache.cache_dir if derived_cache else None
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_section_worker, initargs=(config, cache_dir)) as executor:
+        def finished_canvas():
+            canvas, snapshot = pending.popleft().result()
+            report.merge(snapshot)
+            report.advance('sections')
+            return canvas
+
+        try:
+            # Keep every worker busy without letting finished canvases pile up ahead of the consumer
+            pending = deque()
+            for job in jobs:
+                pending.append(executor.submit(_render_section_in_worker, job))
+                if len(pending) >= max_workers * 2:
+                    yield finished_canvas()
+            while pending:
+                yield finished_canvas()
+        except BaseException:
+            # Don't render the queued sections of a cancelled or failed build
+            executor.shutdown(cancel_futures=True)
+            raise
 
-    board.save(output_path)
-    logging.info(f"Board image saved as {output_path}")
+def render_sections_incrementally(config, jobs, fonts, section_cache, derived_cache=None, max_workers=1, keep_canvases=True, report=NULL_REPORT, scaled_images=None):
+    """
+    Like iter_rendered_sections, but reuses the canvases of sections whose fingerprint is unchanged
+    since the last build. Returns (fingerprints, canvases), where the canvas is None for a reused
+    section (load it with `section_cache.load_canvas` when needed). Without `keep_canvases`, freshly
+    rendered canvases are only stored, so every canvas is None.
+    """
+    fingerprints = [section_cache.fingerprint(config, *job) for job in jobs]
+    canvases = [None] * len(jobs)
+    changed_indexes = [index for index, fingerprint in enumerate(fingerprints) if not section_cache.lookup(fingerprint)]
+
+    report.count('sections_reused', len(jobs) - len(changed_indexes))
+    rendered = iter_rendered_sections(config, [jobs[index] for index in changed_indexes], fonts, derived_cache, max_workers, report, scaled_images)
+    for index, canvas in zip(changed_indexes, rendered):
+        section_cache.store(fingerprints[index], jobs[index][0]['title'], canvas)
+        if keep_canvases:
+            canvases[index] = canvas
+    return fingerprints, canvases
+
+def draw_board_title(draw, config, font, board_width, padding, title_box_height):
+    """Draws the board title box and its centered text, if the config has a board title."""
+    title_text = config.get('boardTitle', '')
+    if not title_text:
+        return
+    title_box_y = padding
+
+    # Draw themed background box for the title
+    title_bg_color = config['themeColors'].get('boardTitleBackgroundColor')
+    if title_bg_color:
+        draw.rectangle(
+            [padding, title_box_y, board_width - padding, title_box_y + title_box_height],
+            fill=title_bg_color
+        )
+    title_border_color = config['themeColors'].get('boardTitleBorderColor')
+    if title_border_color:
+        draw.rectangle(
+            [padding, title_box_y, board_width - padding, title_box_y + title_box_height],
+            outline=title_border_color,
+            width=2
+        )
+
+    # Calculate centered position for the text
+    text_bbox = draw.textbbox((0, 0), title_text, font=font)
+    text_x = (board_width - (text_bbox[2] - text_bbox[0])) / 2
+    text_y = title_box_y + (title_box_height - (text_bbox[3] - text_bbox[1])) / 2
+    draw.text((text_x, text_y), title_text, font=font, fill=config['themeColors'].get('primaryText', '#ffffff'))
+
+def write_board_strips(file, board_size, background_color, strips, deep_zoom=None, compress_level=DEFAULT_COMPRESS_LEVEL, report=NULL_REPORT):
+    """
+    Writes the board as a PNG one horizontal strip at a time, so only one strip is held in memory.
+    `strips` yields (top, bottom, pastes) in board order, where `pastes` lists the (image, (x, y))
+    pastes in board coordinates that fall into the rows from `top` up to `bottom`. Any part of a paste
+    that reaches below `bottom` is carried into the next strips, under their own pastes, exactly as
+    it would be overlapped on a whole-board image. Each finished strip is also passed to `deep_zoom`.
+    """
+    from PIL import Image
+
+    board_width, board_height = board_size
+    writer = PNGStripWriter(file, board_width, board_height, compress_level)
+    report.set_total('board_rows', board_height)
+    bytes_written = 0
+    carry = None
+    for top, bottom, pastes in strips:
+        strip_bottom = max([bottom] + [y + image.height for image, (x, y) in pastes])
+        if carry:
+            strip_bottom = max(strip_bottom, top + carry.height)
+        strip = Image.new('RGB', (board_width, min(strip_bottom, board_height) - top), color=background_color)
+        if carry:
+            strip.paste(carry, (0, 0))
+        for image, (x, y) in pastes:
+            strip.paste(image, (x, y - top))
+
+        finished_strip = strip.crop((0, 0, board_width, bottom - top))
+        with report.stage('encode'):
+            writer.write_strip(finished_strip)
+        if deep_zoom:
+            with report.stage('deep_zoom'):
+                deep_zoom.add_rows(finished_strip)
+        carry = strip.crop((0, bottom - top, board_width, strip.height)) if strip.height > bottom - top else None
+        report.add_bytes_written(file.tell() - bytes_written)
+        bytes_written = file.tell()
+        report.advance('board_rows', bottom - top)
+    with report.stage('encode'):
+        writer.close()
+    report.add_bytes_written(file.tell() - bytes_written)
+
+def generate_board_image(config, image_layout_data, all_tile_data_for_csv, output_path, derived_cache=None, render_workers=None, section_cache=None, report=NULL_REPORT, fonts=None, scaled_images=None):
+    """
+    Generates the final 'tall' board image.
+    Each section is rendered onto its own canvas (in a pool of 'renderWorkers' processes when the
+    config sets more than one) and the finished sections are pasted into the board in row order.
+    Resized tile and background images are reused from `derived_cache` when one is given.
+    With a `section_cache`, only sections that changed since the last build are rendered, and the
+    board image is only rewritten if anything on it changed.
+    If the config sets 'streamBoardImage', the board is rendered and written one row of sections at a
+    time, so memory use depends on the tallest row instead of the whole board.
+    If the config sets 'deepZoom', a Deep Zoom tile pyramid (board.dzi and board_files/) is cut from
+    the finished board as it is written.
+    Besides the PNG, the board is also saved in every other format listed in 'outputFormats'.
+    Layout, decoding, encoding and deep zoom times are recorded in `report`.
+    `fonts` (as returned by load_fonts) and `scaled_images` (a MemoryLRU) let a BoardBuilder pass in
+    what it keeps loaded between builds.
+    """
+    from PIL import Image, ImageDraw
+
+    logging.info("Generating final board image...")
+    
+    # --- Load Fonts ---
+    if fonts is None:
+        fonts = load_fonts(config)
+    board_title_font = fonts['board_title']
+    if render_workers is None:
+        render_workers = config.get('renderWorkers', 1)
+    stream_board_image = config.get('streamBoardImage', False)
 
-def generate_tiles_csv(all_tile_data_for_csv, output_path):
-    """Generates the CSV file for importing into the web app."""
+    # --- Lay Out The Board ---
+    # Tile positions come from the layout alone, so the CSV data is complete before anything is drawn
+    with report.stage('layout'):
+        layout = compute_layout(config, image_layout_data)
+        apply_tile_positions(config, layout, all_tile_data_for_csv)
+    board_width, total_board_height = layout['board_width'], layout['board_height']
+    padding, title_box_height = layout['padding'], layout['title_box_height']
+    render_jobs = list(zip(image_layout_data, layout['sections']))
+
+    # --- Render Sections ---
+    if section_cache:
+        section_fingerprints, rendered_sections = render_sections_incrementally(
+            config, render_jobs, fonts, section_cache, derived_cache, render_workers,
+            keep_canvases=not stream_board_image, report=report, scaled_images=scaled_images
+        )
+        current_board_fingerprint = board_fingerprint(config, (board_width, total_board_height), section_fingerprints)
+        if section_cache.board_unchanged(current_board_fingerprint, output_path):
+            section_cache.save(current_board_fingerprint)
+            logging.info(f"Board image is unchanged: {output_path}")
+            return
+    else:
+        # Sections are rendered lazily, as the drawing below asks for them
+        rendered_sections = iter_rendered_sections(config, render_jobs, fonts, derived_cache, render_workers, report, scaled_images)
+
+    def placed_sections():
+        """Yields the canvas and board position of each section in row order."""
+        for index, (section_layout, section_canvas) in enumerate(zip(layout['sections'], rendered_sections)):
+            if section_canvas is None:
+                section_canvas = section_cache.load_canvas(section_fingerprints[index])
+            section_x, section_y = section_layout['origin']
+            yield section_canvas, (section_x, int(section_y))
+
+    deep_zoom = None
+    if config.get('deepZoom', False):
+        deep_zoom = DeepZoomWriter(
+            os.path.splitext(output_path)[0] + ".dzi", board_width, int(total_board_height),
+            tile_size=config.get('deepZoomTileSize', DEFAULT_TILE_SIZE)
+        )
+
+    # board.png is always written, since it is the image the web app imports
+    output_base = os.path.splitext(output_path)[0]
+    output_formats = config.get('outputFormats', DEFAULT_OUTPUT_FORMATS)
+    extra_formats = [name for name in output_formats if name != 'png']
+    encoder_options = get_encoder_options(config)
+
+    background_color = config['themeColors']['background']
+    if stream_board_image:
+        # --- Write Image One Row Of Sections At A Time ---
+        title_strip = Image.new('RGB', (board_width, padding + title_box_height + 1), color=background_color)
+        draw_board_title(ImageDraw.Draw(title_strip, 'RGBA'), config, board_title_font, board_width, padding, title_box_height)
+        sections = placed_sections()
+        strips = chain(
+            [(0, layout['rows'][0][0], [(title_strip, (0, 0))])],
+            ((top, bottom, list(islice(sections, count))) for top, bottom, count in layout['rows'])
+        )
+        compress_level = encoder_options['compress_level']
+        if compress_level is None:
+            compress_level = DEFAULT_COMPRESS_LEVEL
+        write_atomic(output_path, lambda f: write_board_strips(
+            f, (board_width, int(total_board_height)), background_color, strips, deep_zoom, compress_level, report
+        ))
+        logging.info(f"Board image saved as {output_path}")
+
+        encode_results = []
+        if extra_formats:
+            # The other encoders need the whole image, so the streamed PNG is read back for them
+            logging.info("Reading the board back to save it in the other output formats...")
+            with report.stage('encode'), open_own_png(output_path) as board:
+                encode_results = encode_image(board, output_base, extra_formats, encoder_options)
+            report.add_bytes_written(sum(size for _, _, size, _ in encode_results))
+    else:
+        # --- Create Image ---
+        board = Image.new('RGB', (board_width, int(total_board_height)), color=background_color)
+        draw = ImageDraw.Draw(board, 'RGBA') # Use RGBA for transparent shapes
+        draw_board_title(draw, config, board_title_font, board_width, padding, title_box_height)
+
+        # --- Draw Sections ---
+        for section_canvas, position in placed_sections():
+            board.paste(section_canvas, position)
+        report.set_total('board_rows', board.height)
+        with report.stage('encode'):
+            encode_results = encode_image(board, output_base, ['png'] + extra_formats, encoder_options)
+        report.add_bytes_written(sum(size for _, _, size, _ in encode_results))
+        report.advance('board_rows', board.height)
+        logging.info(f"Board image saved as {output_path}")
+        if deep_zoom:
+            with report.stage('deep_zoom'):
+                deep_zoom.add_rows(board)
+
+    if encode_results:
+        logging.info("Output encodings:\n" + format_encode_report(encode_results))
+    if deep_zoom:
+        with report.stage('deep_zoom'):
+            deep_zoom.close()
+    if section_cache:
+        section_cache.save(current_board_fingerprint)
+
+def generate_sprite_atlas(config, image_layout_data, output_folder, derived_cache=None, report=NULL_REPORT, scaled_images=None):
+    """
+    Exports the tile art as atlas.png plus an atlas.json map from tile ID to atlas rectangle (see
+    write_sprite_atlas), using the same scaled images as the board.
+    """
+    logging.info("Generating sprite atlas...")
+    image_memo = ScaledImageMemo(derived_cache, report, scaled_images)
+    tile_width = config['tileWidth']
+    tile_sprites = []
+    for section in image_layout_data:
+        for group in section['tile_groups']:
+            if not group['image_path']:
+                continue
+            try:
+                sprite = image_memo.get(group['image_path'], tile_width, tile_width)
+            except Exception as e:
+                logging.error(f"Could not add image {group['image_path']} to the sprite atlas: {e}")
+                continue
+            tile_sprites.extend((tile['id'], sprite) for tile in group['tiles'])
+
+    write_sprite_atlas(
+        tile_sprites, tile_width,
+        os.path.join(output_folder, "atlas.png"), os.path.join(output_folder, "atlas.json")
+    )
+
+CSV_HEADERS = ['id', 'Name', 'Points', 'Description', 'Prerequisites', 'Left (%)', 'Top (%)', 'Width (%)', 'Height (%)']
+
+def count_changed_csv_rows(all_tile_data_for_csv, output_path):
+    """
+    Compares the tile data with an existing tiles.csv and returns how many rows were added, removed or
+    changed. Returns None if there is no readable existing file.
+    """
+    try:
+        with open(output_path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames != CSV_HEADERS:
+                return None
+            previous_rows = {row['id']: row for row in reader}
+    except (OSError, csv.Error):
+        return None
+
+    changed_rows = 0
+    for tile in all_tile_data_for_csv:
+        row_data = {h: str(tile.get(h, '')) for h in CSV_HEADERS}
+        if previous_rows.pop(row_data['id'], None) != row_data:
+            changed_rows += 1
+    return changed_rows + len(previous_rows)
+
+def generate_tiles_csv(all_tile_data_for_csv, output_path, only_if_changed=False):
+    """
+    Generates the CSV file for importing into the web app.
+    With `only_if_changed`, an existing file whose rows are all unchanged is left untouched.
+    """
     logging.info(f"Generating CSV file: {output_path}")
     if not all_tile_data_for_csv:
         logging.warning("No tile data to generate CSV.")
         return
 
-    headers = ['id', 'Name', 'Points', 'Description', 'Prerequisites', 'Left (%)', 'Top (%)', 'Width (%)', 'Height (%)']
+    if only_if_changed:
+        changed_rows = count_changed_csv_rows(all_tile_data_for_csv, output_path)
+        if changed_rows == 0:
+            logging.info(f"CSV file is unchanged: {output_path}")
+            return
+        if changed_rows is not None:
+            logging.info(f"{changed_rows} tile row(s) changed since the last build.")
+
+    headers = CSV_HEADERS
     try:
         with open(output_path, 'w', newline='', encoding='utf-8') as f:
             writer = csv.DictWriter(f, fieldnames=headers)
@@ -408,13 +768,428 @@ def generate_tiles_csv(all_tile_data_for_csv, output_path):
     except IOError as e:
         logging.error(f"Could not write CSV file: {e}")
 
+def get_project_folder(config_data, output_dir=OUTPUT_DIR):
+    """Returns the output folder path named after the config's project title."""
+    project_title = config_data['config'].get('projectTitle', 'bingo_board')
+    safe_project_title = "".join(c for c in project_title if c.isalnum() or c in (' ', '_', '-')).rstrip().replace(' ', '_')
+    return os.path.join(output_dir, safe_project_title)
+
+def create_output_folder(config_data, output_dir=OUTPUT_DIR):
+    """Creates a new, uniquely numbered output folder for the config's project and returns its path."""
+    output_folder_base = get_project_folder(config_data, output_dir)
+    output_folder = output_folder_base
+    counter = 1
+    while True:
+        try:
+            os.makedirs(output_folder) # Fails if the folder exists, even if another build just created it
+            break
+        except FileExistsError:
+            output_folder = f"{output_folder_base}_{counter}"
+            counter += 1
+
+    logging.info(f"Created output directory: {output_folder}")
+    return output_folder
+
+def build_tiles_csv(config_data, output_dir=OUTPUT_DIR):
+    """
+    Regenerates only tiles.csv and prereq_graph.json for a loaded config, in the project's folder
+    under `output_dir`. The tile positions come from the layout pass, so no images are fetched and
+    nothing is drawn.
+    Returns the CSV path, or None if the config fails preflight.
+    """
+    if preflight_board(config_data, layout_only=True) is None:
+        return None
+    all_tile_data_for_csv, image_layout_data = build_tile_data(config_data)
+
+    layout = compute_layout(config_data['config'], image_layout_data)
+    apply_tile_positions(config_data['config'], layout, all_tile_data_for_csv)
+
+    output_folder = get_project_folder(config_data, output_dir)
+    os.makedirs(output_folder, exist_ok=True)
+    output_csv_path = os.path.join(output_folder, "tiles.csv")
+    generate_tiles_csv(all_tile_data_for_csv, output_csv_path, only_if_changed=True)
+    write_prereq_graph(all_tile_data_for_csv, os.path.join(output_folder, PREREQ_GRAPH_NAME))
+    return output_csv_path
+
+FONT_KEYS = [('boardTitleFont', "Board title"), ('sectionTitleFont', "Section title"), ('tileTitleFont', "Tile title")]
+
+def preflight_board(config_data, image_source='wiki', incremental=False, cache=None, layout_only=False):
+    """
+    Checks a loaded config before any images are fetched or drawn: validates every setting, section
+    and tile against the schema, checks that the fonts can be found (a missing font only warns, since the
+    build falls back to Pillow's default font), and lays the board out to estimate what the build
+    will cost. All problems are logged at once. With `layout_only`, only what tiles.csv needs is checked.
+    `cache` (an ImageCache) is looked into, read-only, to count the wiki titles that are already cached.
+    Returns the estimate as a dict ('tiles', 'sections', 'board_width', 'board_height', 'peak_memory',
+    'wiki_titles' and 'cached_titles', which is None when it was not counted), or None if the config
+    cannot be built.
+    """
+    config = config_data.get('config')
+    errors, warnings = validate_config(config_data, require_wiki=image_source != 'local' and not layout_only)
+    if not layout_only and isinstance(config, dict):
+        for key, description in FONT_KEYS:
+            path = config.get(key)
+            if not isinstance(path, str) or not path or resolve_font_path(path):
+                continue
+            warnings.append(f"{description} font '{path}' was not found (neither the path nor a system font of that name); Pillow's default font is used instead.")
+        if 'boardTitleFont' not in config and not resolve_font_path('arial.ttf'):
+            warnings.append("No 'boardTitleFont' is set and 'arial.ttf' was not found; the board title uses Pillow's default font.")
+
+    for warning in warnings:
+        logging.warning(f"Preflight: {warning}")
+    if errors:
+        for error in errors:
+            logging.error(f"Preflight: {error}")
+        logging.error(f"Preflight failed with {len(errors)} error(s); nothing was fetched or rendered.")
+        return None
+
+    all_tile_data_for_csv, image_layout_data = build_tile_data(config_data)
+    layout = compute_layout(config, image_layout_data)
+    wiki_titles = collect_wiki_titles(config_data)
+    background_titles = {section['wiki'] for section in config_data['sections'] if section.get('wiki')}
+    tile_titles = {tile_def['wiki'] for section in config_data['sections'] for tile_def in section['tiles'] if tile_def.get('wiki')}
+    cached_titles = None
+    if cache is not None and image_source == 'wiki':
+        cached_titles = sum(1 for title in wiki_titles if cache.lookup(title, record=False))
+    estimate = {
+        'tiles': len(all_tile_data_for_csv),
+        'sections': len(image_layout_data),
+        'board_width': layout['board_width'],
+        'board_height': int(layout['board_height']),
+        'peak_memory': estimate_peak_memory(config, layout, len(tile_titles), len(background_titles), incremental),
+        'wiki_titles': len(wiki_titles),
+        'cached_titles': cached_titles,
+    }
+    if not estimate['tiles']:
+        logging.error("Preflight failed: the config has no tiles.")
+        return None
+    if layout_only:
+        return estimate
+
+    for warning in format_warnings(config, layout):
+        logging.warning(f"Preflight: {warning}")
+    to_fetch = "" if cached_titles is None else f", {cached_titles:,} cached ({len(wiki_titles) - cached_titles:,} to fetch)"
+    logging.info(
+        f"Preflight: {estimate['tiles']:,} tiles in {estimate['sections']:,} sections; board {estimate['board_width']:,} x "
+        f"{estimate['board_height']:,} px; about {format_bytes(estimate['peak_memory'])} peak memory; "
+        f"{len(wiki_titles):,} distinct wiki titles{to_fetch}"
+    )
+    total_memory = total_memory_bytes()
+    if total_memory and estimate['peak_memory'] > total_memory:
+        hint = "" if config.get('streamBoardImage', False) else " Set 'streamBoardImage' to write the board in strips."
+        logging.error(
+            f"Preflight failed: the build needs about {format_bytes(estimate['peak_memory'])} of memory, more than "
+            f"this machine's {format_bytes(total_memory)}.{hint}"
+        )
+        return None
+    if total_memory and estimate['peak_memory'] > total_memory * MEMORY_WARNING_FRACTION:
+        logging.warning(
+            f"Preflight: the build needs about {format_bytes(estimate['peak_memory'])} of this machine's "
+            f"{format_bytes(total_memory)} of memory."
+        )
+    return estimate
+
+class BoardBuilder:
+    """
+    Builds boards into `output_dir`, keeping the image caches in `cache_dir`, and keeps what is costly
+    to set up warm from one build to the next: the open image caches, a wiki session for each pool
+    size and rate limit, the loaded fonts and, within `section_memo_bytes` and `scaled_memo_bytes`
+    (0 keeps none), the rendered section canvases and scaled images. A repeat or near-duplicate build
+    only renders the sections that differ. Close the builder (or use it as a context manager) when done.
+
+    Safe to use from several threads at once. Every build writes to its own new folder, apart from
+    incremental builds of the same project, which take turns. The caches are only trimmed to their
+    size caps by a build that finishes while no other build is running.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, output_dir=OUTPUT_DIR, section_memo_bytes=SECTION_MEMO_MAX_BYTES, scaled_memo_bytes=SCALED_MEMO_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.output_dir = output_dir
+        self.cache = ImageCache(cache_dir, CACHE_TTL_SECONDS, CACHE_MAX_BYTES)
+        self.derived_cache = DerivedImageCache(cache_dir)
+        self.section_canvases = MemoryLRU(section_memo_bytes) if section_memo_bytes else None
+        self.scaled_images = MemoryLRU(scaled_memo_bytes) if scaled_memo_bytes else None
+        self.builds = 0
+        self._fonts = {} # (font path, size) of each font -> fonts, as returned by load_fonts
+        self._fetchers = {} # (pool size, rate limit) -> Fetcher
+        self._folder_locks = {}
+        self._active_builds = 0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Closes the wiki sessions and the image cache."""
+        with self._lock:
+            for fetcher in self._fetchers.values():
+                fetcher.close()
+            self._fetchers.clear()
+        self.cache.close()
+
+    def load_fonts(self, config):
+        """Returns the fonts for a config (see load_fonts), loading each combination only once."""
+        key = (
+            config.get('boardTitleFont', 'arial.ttf'), config.get('boardTitleFontSize', 64),
+            config['sectionTitleFont'], config['sectionTitleFontSize'],
+            config['tileTitleFont'], config['tileTitleFontSize'],
+        )
+        with self._lock:
+            fonts = self._fonts.get(key)
+        if fonts is None:
+            fonts = load_fonts(config)
+            with self._lock:
+                fonts = self._fonts.setdefault(key, fonts)
+        return fonts
+
+    def _fetcher(self, config, pool_size):
+        from fetching import DEFAULT_RATE_LIMIT, create_fetcher
+
+        key = (pool_size, config.get('fetchRateLimit', DEFAULT_RATE_LIMIT))
+        with self._lock:
+            if key not in self._fetchers:
+                self._fetchers[key] = create_fetcher(*key)
+            return self._fetchers[key]
+
+    def _folder_lock(self, folder):
+        with self._lock:
+            return self._folder_locks.setdefault(os.path.abspath(folder), threading.Lock())
+
+    def preflight(self, config_data, image_source='wiki', incremental=False):
+        """Checks a config and estimates its build (see preflight_board), counting the titles in this builder's cache."""
+        return preflight_board(config_data, image_source, incremental, self.cache)
+
+    def build(self, config_data, incremental=False, image_source='wiki', image_source_path=None, report=None):
+        """
+        Runs the full pipeline for a loaded config: fetches the images, renders board.png and writes
+        tiles.csv into a new folder under the output directory.
+        With `incremental`, the board is rebuilt in place in the project's folder, re-rendering only the
+        sections that changed since the last incremental build.
+        `image_source` and `image_source_path` choose where the images come from (see open_image_source).
+        Stage times and counters are collected in `report` (a new RunReport if none is given) and
+        written to run_report.json in the output folder. If the report's progress tracker is cancelled,
+        the build stops at the next unit of work and BuildCancelled is raised. When a build is cancelled
+        or fails with an exception, a new output folder is removed again, while an in-place build keeps
+        its previous board.
+        The config is checked first (see preflight_board), so a config that cannot be built fails before
+        anything is fetched.
+        Returns the output folder, or None if the config fails preflight or no tiles were generated.
+        """
+        with self._lock:
+            self._active_builds += 1
+        try:
+            if incremental:
+                with self._folder_lock(get_project_folder(config_data, self.output_dir)):
+                    return self._build(config_data, incremental, image_source, image_source_path, report)
+            return self._build(config_data, incremental, image_source, image_source_path, report)
+        finally:
+            with self._lock:
+                self._active_builds -= 1
+                self.builds += 1
+
+    def _build(self, config_data, incremental, image_source, image_source_path, report):
+        if report is None:
+            report = RunReport()
+        report.start()
+        # The caches and sessions are shared with other builds, so each build counts its own stats
+        cache, derived_cache = self.cache.with_own_stats(), self.derived_cache.with_own_stats()
+
+        with report.stage('preflight'):
+            estimate = self.preflight(config_data, image_source, incremental)
+        if estimate is None:
+            report.finish()
+            return None
+        report.add_counters('preflight', {name: value for name, value in estimate.items() if value is not None})
+        # The source stays open until the board is rendered, since a private cache may hold its images
+        fetch_workers = config_data['config'].get('fetchWorkers', FETCH_WORKERS)
+        try:
+            with report.stage('setup'):
+                fetcher = self._fetcher(config_data['config'], fetch_workers).with_own_stats() if image_source == 'wiki' else None
+                source = open_image_source(image_source, config_data['config'], cache, fetch_workers, image_source_path, fetcher)
+        except (OSError, ValueError) as e:
+            logging.error(f"Could not open the '{image_source}' image source: {e}")
+            report.finish()
+            return None
+
+        output_folder = None
+        try:
+            all_tile_data_for_csv, image_layout_data = process_sections(config_data, source, fetch_workers, report)
+            logging.info(f"Image source ({image_source}): {source.format_stats()}")
+            
+            if not all_tile_data_for_csv:
+                logging.error("Processing failed: No tiles were generated. Aborting.")
+                return None
+
+            if incremental:
+                output_folder = get_project_folder(config_data, self.output_dir)
+                os.makedirs(output_folder, exist_ok=True)
+                section_cache = SectionCanvasCache(output_folder, self.section_canvases)
+            else:
+                output_folder = create_output_folder(config_data, self.output_dir)
+                section_cache = None
+                # A streamed board is written a row at a time to bound memory, so its canvases are not held
+                if self.section_canvases is not None and not config_data['config'].get('streamBoardImage', False):
+                    section_cache = SectionCanvasCache(None, self.section_canvases)
+
+            # Define output file paths
+            output_image_path = os.path.join(output_folder, "board.png")
+            output_csv_path = os.path.join(output_folder, "tiles.csv")
+
+            # Everything in the board build that no more specific stage claims is compositing
+            with report.stage('composite'):
+                generate_board_image(
+                    config_data['config'], image_layout_data, all_tile_data_for_csv, output_image_path,
+                    derived_cache, section_cache=section_cache, report=report,
+                    fonts=self.load_fonts(config_data['config']), scaled_images=self.scaled_images
+                )
+            report.check_cancelled()
+            with report.stage('csv_write'):
+                generate_tiles_csv(all_tile_data_for_csv, output_csv_path, only_if_changed=incremental)
+            with report.stage('prereq_graph'):
+                prereq_graph = write_prereq_graph(all_tile_data_for_csv, os.path.join(output_folder, PREREQ_GRAPH_NAME))
+            prereq_problems = prereq_graph['problems']
+            report.add_counters('prereq_graph', {
+                'dangling': len(prereq_problems['danglingPrerequisites']),
+                'cycles': len(prereq_problems['cycles']),
+                'duplicate_ids': len(prereq_problems['duplicateIds']),
+            })
+            if config_data['config'].get('spriteAtlas', False):
+                with report.stage('sprite_atlas'):
+                    generate_sprite_atlas(config_data['config'], image_layout_data, output_folder, derived_cache, report, self.scaled_images)
+
+            with report.stage('cache_cleanup'), self._lock:
+                # Holding the lock keeps other builds from starting while files are evicted
+                if self._active_builds == 1:
+                    cache.enforce_size_cap()
+                    derived_cache.enforce_size_cap()
+            logging.info(f"Image cache: {cache.format_stats()}")
+            logging.info(f"Resized image cache: {derived_cache.format_stats()}")
+
+            report.add_counters('image_source', source.stats)
+            report.add_counters('image_cache', cache.stats)
+            report.add_counters('resized_cache', derived_cache.stats)
+            report.finish()
+            report_path = report.write(output_folder)
+            logging.info(f"Stage times:\n{report.format_summary()}")
+            logging.info(f"Run report saved as {report_path}")
+            return output_folder
+        except Exception as e:
+            if isinstance(e, BuildCancelled):
+                logging.warning("Build cancelled.")
+            if output_folder and not incremental:
+                shutil.rmtree(output_folder, ignore_errors=True)
+            raise
+        finally:
+            report.finish()
+            source.close()
+
+def build_board(config_data, output_dir=OUTPUT_DIR, incremental=False, image_source='wiki', image_source_path=None, report=None):
+    """
+    Builds one board with a BoardBuilder of its own, which keeps nothing in memory afterwards (see
+    BoardBuilder.build). Returns the output folder, or None if the build failed.
+    """
+    with BoardBuilder(CACHE_DIR, output_dir, section_memo_bytes=0, scaled_memo_bytes=0) as builder:
+        return builder.build(config_data, incremental, image_source, image_source_path, report)
+
+def build_for_watch(config_file_path, builder, version, progress, image_source='wiki', image_source_path=None, preview_folder=None):
+    """
+    Runs one --watch build: loads the config, rebuilds its board in place and updates the preview in
+    the project's folder. Returns the preview folder, or None if the build was cancelled because the
+    config changed again. `preview_folder` is used when the config cannot be read.
+    """
+    start = time.perf_counter()
+    output_folder = None
+    with BuildLogCapture() as capture:
+        config_data = load_config(config_file_path)
+        if config_data and isinstance(config_data['config'], dict):
+            preview_folder = get_project_folder(config_data, builder.output_dir)
+            config_data['config'].setdefault('pngCompressLevel', WATCH_PNG_COMPRESS_LEVEL)
+            try:
+                output_folder = builder.build(config_data, True, image_source, image_source_path, RunReport(progress=progress))
+            except BuildCancelled:
+                return None
+            except Exception as e:
+                logging.exception(f"An unexpected error occurred: {e}")
+    seconds = time.perf_counter() - start
+    os.makedirs(preview_folder, exist_ok=True)
+    page_path = write_preview(preview_folder, version, output_folder is not None, seconds, capture.messages)
+    if output_folder:
+        logging.info(f"Build {version} done in {seconds:.2f}s. Preview: {os.path.abspath(page_path)}")
+    else:
+        logging.error(f"Build {version} failed; the preview shows why. Waiting for the next save...")
+    return preview_folder
+
+def watch_board(config_file_path, builder, image_source='wiki', image_source_path=None, stop_event=None):
+    """
+    Builds a board in place (as with --incremental), then rebuilds it every time the config file is
+    saved, until interrupted or `stop_event` is set. `builder` keeps the fonts, session, scaled images
+    and section canvases warm, so a rebuild only redraws the sections that changed. Rapid saves are
+    debounced, and a save during a build cancels it in favour of a fresh one. Every build updates
+    preview.html in the project's folder, which a browser can keep open to see each new board.
+    """
+    stop_event = stop_event or threading.Event()
+    watcher = FileWatcher(config_file_path)
+    state = {'version': 0, 'preview_folder': builder.output_dir}
+    build_thread = progress = None
+
+    def run(version, progress):
+        preview_folder = build_for_watch(
+            config_file_path, builder, version, progress, image_source, image_source_path, state['preview_folder']
+        )
+        if preview_folder:
+            state['preview_folder'] = preview_folder
+
+    def start_build():
+        nonlocal build_thread, progress
+        if build_thread and build_thread.is_alive():
+            logging.info("Config changed during the build; starting over.")
+            progress.cancel()
+            build_thread.join()
+        state['version'] += 1
+        progress = BuildProgress()
+        build_thread = threading.Thread(target=run, args=(state['version'], progress), daemon=True)
+        build_thread.start()
+
+    logging.info(f"Watching {config_file_path} for changes (Ctrl+C to stop)...")
+    start_build()
+    try:
+        while not stop_event.wait(WATCH_POLL_INTERVAL):
+            if watcher.poll():
+                logging.info(f"{config_file_path} changed; rebuilding...")
+                start_build()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if build_thread and build_thread.is_alive():
+            progress.cancel()
+            build_thread.join()
+        logging.info("Stopped watching.")
+
 class CreatorApp:
+    """
+    The Tk window. Builds run on a background thread, which posts progress and its result to a queue
+    that the window polls, so the window stays responsive and a build can be cancelled part way.
+    """
+
     def __init__(self, root):
+        import tkinter as tk
+        from tkinter import ttk
+
         self.root = root
         self.root.title("Homie Hunt Creator")
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
         self.config_file_var = tk.StringVar()
         self.clear_cache_var = tk.BooleanVar(value=False)
+        self.incremental_var = tk.BooleanVar(value=False)
+        self.status_var = tk.StringVar(value="Ready.")
+        self.events = queue.Queue() # Messages from the build thread
+        self.progress = None # BuildProgress of the running build
+        self.close_when_done = False
+        self.builder = None # BoardBuilder kept between builds, so repeat builds start warm
 
         # --- Widgets ---
         main_frame = tk.Frame(root, padx=10, pady=10)
@@ -431,11 +1206,22 @@ class CreatorApp:
         options_frame = tk.Frame(main_frame)
         options_frame.pack(fill=tk.X, pady=5)
         tk.Checkbutton(options_frame, text="Clear image cache before running", variable=self.clear_cache_var).pack(anchor='w')
+        tk.Checkbutton(options_frame, text="Rebuild in place (only re-render changed sections)", variable=self.incremental_var).pack(anchor='w')
+
+        # Run and cancel buttons
+        self.run_button = tk.Button(main_frame, text="Generate Board", command=self.run_creator, bg="#2ecc71", fg="white", height=2)
+        self.run_button.pack(fill=tk.X, pady=(10, 0))
+        self.cancel_button = tk.Button(main_frame, text="Cancel", command=self.cancel, state=tk.DISABLED)
+        self.cancel_button.pack(fill=tk.X, pady=(5, 0))
 
-        # Run button
-        tk.Button(main_frame, text="Generate Board", command=self.run_creator, bg="#2ecc71", fg="white", height=2).pack(fill=tk.X, pady=(10, 0))
+        # Progress
+        self.progress_bar = ttk.Progressbar(main_frame, mode='determinate', maximum=1.0)
+        self.progress_bar.pack(fill=tk.X, pady=(10, 0))
+        tk.Label(main_frame, textvariable=self.status_var, anchor='w').pack(fill=tk.X)
 
     def browse_file(self):
+        from tkinter import filedialog
+
         file_path = filedialog.askopenfilename(
             title="Select the Homie Hunt Config JSON",
             filetypes=[("JSON files", "*.json")]
@@ -444,67 +1230,230 @@ class CreatorApp:
             self.config_file_var.set(file_path)
 
     def run_creator(self):
-        config_file_path = self.config_file_var.get()
-        should_clear_cache = self.clear_cache_var.get()
+        import tkinter as tk
+        from tkinter import messagebox
 
+        config_file_path = self.config_file_var.get()
         if not config_file_path:
             messagebox.showerror("Error", "Please select a configuration file.")
             return
 
-        if should_clear_cache:
-            clear_cache(CACHE_DIR)
+        self.progress = BuildProgress(on_event=lambda event: self.events.put(('progress', event)))
+        self.run_button.config(state=tk.DISABLED)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.progress_bar['value'] = 0
+        self.status_var.set("Starting...")
+        threading.Thread(
+            target=self._build_in_background,
+            args=(config_file_path, self.clear_cache_var.get(), self.incremental_var.get(), self.progress),
+            daemon=True
+        ).start()
+        self.root.after(GUI_POLL_INTERVAL_MS, self._poll_events)
 
-        config_data = load_config(config_file_path)
-        if not config_data:
-            messagebox.showerror("Error", f"Failed to load or parse the configuration file:\n{config_file_path}")
-            return
+    def _build_in_background(self, config_file_path, should_clear_cache, incremental, progress):
+        """Runs on the build thread. Never touches the widgets; everything goes through `events`."""
+        try:
+            if should_clear_cache:
+                self.close_builder() # It holds the cache open, and remembers images from it
+                clear_cache(CACHE_DIR)
 
-        # --- Create unique output directory ---
-        project_title = config_data['config'].get('projectTitle', 'bingo_board')
-        safe_project_title = "".join(c for c in project_title if c.isalnum() or c in (' ', '_', '-')).rstrip().replace(' ', '_')
-        
-        output_folder_base = os.path.join(OUTPUT_DIR, safe_project_title)
-        output_folder = output_folder_base
-        counter = 1
-        while os.path.exists(output_folder):
-            output_folder = f"{output_folder_base}_{counter}"
-            counter += 1
-        
-        os.makedirs(output_folder, exist_ok=True)
-        logging.info(f"Created output directory: {output_folder}")
+            config_data = load_config(config_file_path)
+            if not config_data:
+                self.events.put(('error', f"Failed to load or parse the configuration file:\n{config_file_path}"))
+                return
 
-        # Define output file paths
-        output_image_path = os.path.join(output_folder, "board.png")
-        output_csv_path = os.path.join(output_folder, "tiles.csv")
+            if self.builder is None:
+                self.builder = BoardBuilder()
+            output_folder = self.builder.build(config_data, incremental=incremental, report=RunReport(progress=progress))
+            if not output_folder:
+                self.events.put(('error', "Processing failed: the config did not pass its checks or no tiles were generated. Check logs for details."))
+                return
+            logging.info("Tool finished execution.")
+            self.events.put(('done', output_folder))
+        except BuildCancelled:
+            self.events.put(('cancelled', None))
+        except Exception as e:
+            logging.exception(f"An unexpected error occurred: {e}")
+            self.events.put(('error', f"An unexpected error occurred:\n{e}"))
 
-        # Create cache directory for images
-        os.makedirs(CACHE_DIR, exist_ok=True)
+    def _poll_events(self):
+        """Shows the build thread's progress, and its result once it has finished."""
+        import tkinter as tk
+        from tkinter import messagebox
 
-        # Use a session for persistent connections and headers
-        with requests.Session() as session:
-            session.headers.update({'User-Agent': 'HomieHuntCreator/1.1'})
-            
-            all_tile_data_for_csv, image_layout_data = process_sections(config_data, session)
-            
-            if not all_tile_data_for_csv:
-                logging.error("Processing failed: No tiles were generated. Aborting.")
-                messagebox.showerror("Error", "Processing failed: No tiles were generated. Check logs for details.")
+        while True:
+            try:
+                kind, value = self.events.get_nowait()
+            except queue.Empty:
+                self.root.after(GUI_POLL_INTERVAL_MS, self._poll_events)
                 return
-            
-            generate_board_image(config_data['config'], image_layout_data, all_tile_data_for_csv, output_image_path)
-            generate_tiles_csv(all_tile_data_for_csv, output_csv_path)
+            if kind == 'progress':
+                if value['total']:
+                    self.progress_bar['value'] = min(value['done'] / value['total'], 1.0)
+                self.status_var.set(format_progress(value))
+                continue
+            break
 
-        logging.info("Tool finished execution.")
-        messagebox.showinfo("Success", f"Board generation complete!\n\nOutput saved to:\n{output_folder}")
+        # The build has finished
+        self.progress = None
+        self.run_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
+        if self.close_when_done:
+            self.close_builder()
+            self.root.destroy()
+            return
+        if kind == 'done':
+            self.progress_bar['value'] = 1.0
+            self.status_var.set(f"Done: {value}")
+            messagebox.showinfo("Success", f"Board generation complete!\n\nOutput saved to:\n{value}")
+        elif kind == 'cancelled':
+            self.progress_bar['value'] = 0
+            self.status_var.set("Cancelled.")
+        else:
+            self.status_var.set("Failed.")
+            messagebox.showerror("Error", value)
+
+    def cancel(self):
+        """Asks the running build to stop; it finishes the piece of work it is on first."""
+        import tkinter as tk
+
+        if self.progress:
+            self.progress.cancel()
+            self.cancel_button.config(state=tk.DISABLED)
+            self.status_var.set("Cancelling...")
+
+    def close_builder(self):
+        if self.builder is not None:
+            self.builder.close()
+            self.builder = None
+
+    def on_close(self):
+        """Closes the window, cancelling a running build and waiting for it to stop first."""
+        if self.progress:
+            self.close_when_done = True
+            self.cancel()
+        else:
+            self.close_builder()
+            self.root.destroy()
+
+def run_gui():
+    """Opens the Tk window."""
+    import tkinter as tk
 
-def main():
-    """Main execution function."""
-    setup_logging()
     logging.info("Starting Homie Hunt Creator GUI...")
     root = tk.Tk()
     app = CreatorApp(root)
     root.mainloop()
     logging.info("Application closed.")
 
+def parse_args(argv=None):
+    """Parses the command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Generates Homie Hunt board images and tile CSVs from config JSON files. "
+                    "Run without any config files to open the GUI."
+    )
+    parser.add_argument('configs', nargs='*', help="Config JSON file(s) to build.")
+    parser.add_argument('-o', '--output-dir', default=OUTPUT_DIR, help=f"Directory the board folders are created in (default: {OUTPUT_DIR}).")
+    parser.add_argument('--clear-cache', action='store_true', help="Delete all cached images before running.")
+    parser.add_argument('--validate-only', action='store_true', help="Only validate the configs and estimate the build (size, memory, images to fetch); do not fetch images or render.")
+    parser.add_argument('--incremental', action='store_true', help="Rebuild each board in place, re-rendering only the sections that changed.")
+    parser.add_argument('--layout-only', action='store_true', help="Only regenerate tiles.csv in each project's folder; do not fetch images or render.")
+    parser.add_argument('--watch', action='store_true', help="Rebuild the board in place every time the config file is saved, and keep preview.html next to it up to date.")
+    source_group = parser.add_mutually_exclusive_group()
+    source_group.add_argument('--local-images', metavar='DIR', help="Take the images from a local directory instead of the wiki.")
+    source_group.add_argument('--record', metavar='ARCHIVE', help="Fetch from the wiki and save every response to a zip archive for --replay.")
+    source_group.add_argument('--replay', metavar='ARCHIVE', help="Build offline from the responses saved by --record.")
+    log_group = parser.add_mutually_exclusive_group()
+    log_group.add_argument('--quiet', action='store_true', help="Only log warnings and errors.")
+    log_group.add_argument('--verbose', action='store_true', help="Also log every tile, cache lookup and download.")
+    parser.add_argument('--profile', action='store_true', help="Profile each build with cProfile and save profile.pstats next to board.png.")
+    parser.add_argument('--trace-memory', action='store_true', help="Trace memory use with tracemalloc and add the largest allocations to run_report.json.")
+    args = parser.parse_args(argv)
+    if args.record and len(args.configs) > 1:
+        parser.error("--record takes a single config file.")
+    if args.watch and (len(args.configs) != 1 or args.validate_only or args.layout_only or args.record):
+        parser.error("--watch takes a single config file, and cannot be combined with --validate-only, --layout-only or --record.")
+    return args
+
+def get_image_source_arg(args):
+    """Returns the (image source, path) chosen on the command line."""
+    if args.local_images:
+        return 'local', args.local_images
+    if args.record:
+        return 'record', args.record
+    if args.replay:
+        return 'replay', args.replay
+    return 'wiki', None
+
+def run_config(args, config_file_path):
+    """Builds, validates or lays out one config given on the command line. Returns True if it succeeded."""
+    report = RunReport(args.profile, args.trace_memory)
+    if not (args.validate_only or args.layout_only):
+        report.start() # The config load counts toward the build
+    with report.stage('config_load'):
+        config_data = load_config(config_file_path)
+    if not config_data:
+        report.finish()
+        return False
+    if args.validate_only:
+        image_source, _ = get_image_source_arg(args)
+        cache = ImageCache(CACHE_DIR, CACHE_TTL_SECONDS, CACHE_MAX_BYTES) if os.path.isdir(CACHE_DIR) else None
+        try:
+            estimate = preflight_board(config_data, image_source, args.incremental, cache)
+        finally:
+            if cache:
+                cache.close()
+        if estimate:
+            logging.info(f"Configuration is valid: {config_file_path}")
+        return bool(estimate)
+    if args.layout_only:
+        output_csv_path = build_tiles_csv(config_data, args.output_dir)
+        if output_csv_path:
+            logging.info(f"Tile CSV for {config_file_path} saved to: {output_csv_path}")
+        return bool(output_csv_path)
+
+    image_source, image_source_path = get_image_source_arg(args)
+    output_folder = build_board(config_data, args.output_dir, args.incremental, image_source, image_source_path, report)
+    if output_folder:
+        logging.info(f"Board for {config_file_path} saved to: {output_folder}")
+    return bool(output_folder)
+
+def run_cli(args):
+    """Builds (or only validates) every config given on the command line. Returns the exit code."""
+    if args.watch:
+        image_source, image_source_path = get_image_source_arg(args)
+        with BoardBuilder(CACHE_DIR, args.output_dir) as builder:
+            watch_board(args.configs[0], builder, image_source, image_source_path)
+        return EXIT_OK
+    failures = 0
+    for config_file_path in args.configs:
+        try:
+            succeeded = run_config(args, config_file_path)
+        except Exception as e:
+            # One broken config must not stop the rest of the batch
+            logging.exception(f"An unexpected error occurred while processing {config_file_path}: {e}")
+            succeeded = False
+        if not succeeded:
+            failures += 1
+
+    if failures:
+        logging.error(f"{failures} of {len(args.configs)} config(s) failed.")
+        return EXIT_FAILURE
+    logging.info("Tool finished execution.")
+    return EXIT_OK
+
+def main(argv=None):
+    """Main execution function. Returns the process exit code."""
+    args = parse_args(argv)
+    setup_logging(logging.WARNING if args.quiet else logging.DEBUG if args.verbose else logging.INFO)
+
+    if args.clear_cache:
+        clear_cache(CACHE_DIR)
+    if args.configs:
+        return run_cli(args)
+    if not args.clear_cache:
+        run_gui()
+    return EXIT_OK
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,335 @@
+import copy
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60 # Re-check wiki titles and images after 30 days
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024 # Evict least recently used images above 500 MB
+DEFAULT_DERIVED_MAX_BYTES = 200 * 1024 * 1024 # Evict least recently used resized variants above 200 MB
+MAX_FILE_HASHES = 10000 # Files whose content hash hash_file remembers
+
+# Leading bytes used to pick a file extension for a downloaded image
+IMAGE_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS aliases (
+    title TEXT PRIMARY KEY,      -- Title as written in a config
+    canonical TEXT NOT NULL      -- Title after wiki normalization and redirects
+);
+CREATE TABLE IF NOT EXISTS pages (
+    canonical TEXT PRIMARY KEY,
+    url TEXT NOT NULL,           -- Thumbnail URL the page resolved to
+    resolved_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS images (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,          -- SHA-256 of the downloaded content
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL     -- When the content was last downloaded or revalidated
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+"""
+
+def guess_extension(content):
+    """Returns a file extension matching the image format of `content`."""
+    for signature, extension in IMAGE_SIGNATURES:
+        if content.startswith(signature):
+            return extension
+    if content[:4] == b'RIFF' and content[8:12] == b'WEBP':
+        return '.webp'
+    return '.img'
+
+_file_hashes = OrderedDict() # Absolute path -> (size, mtime_ns, SHA-256), least recently used first
+_file_hashes_lock = threading.Lock()
+
+def hash_file(path):
+    """
+    Returns the SHA-256 of a file's content, remembering it until the file changes. Only the latest
+    hash of each path is kept, and only for the MAX_FILE_HASHES most recently hashed paths, so a
+    long-running process does not collect the hashes of files that were rewritten or deleted.
+    """
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    with _file_hashes_lock:
+        entry = _file_hashes.get(key)
+        if entry is not None and entry[:2] == (stat.st_size, stat.st_mtime_ns):
+            _file_hashes.move_to_end(key)
+            return entry[2]
+    with open(path, 'rb') as f:
+        content_hash = hashlib.sha256(f.read()).hexdigest()
+    with _file_hashes_lock:
+        _file_hashes[key] = (stat.st_size, stat.st_mtime_ns, content_hash)
+        _file_hashes.move_to_end(key)
+        while len(_file_hashes) > MAX_FILE_HASHES:
+            _file_hashes.popitem(last=False)
+    return content_hash
+
+def write_atomic(path, write):
+    """Calls `write(file)` on a temporary file next to `path`, then moves it into place."""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+class ImageCache:
+    """
+    On-disk cache of wiki images backed by a SQLite index.
+
+    The index maps each title to its canonical title, the canonical title to its image URL, and the URL
+    to the SHA-256 hash of the downloaded content. Image files are stored once per hash, so titles that
+    differ only by case or redirect share a single file. Entries older than `ttl_seconds` are
+    revalidated with the stored ETag/Last-Modified headers, and `enforce_size_cap` evicts the least
+    recently used files once the cache grows past `max_bytes`. Safe to use from several threads.
+    """
+
+    def __init__(self, cache_dir, ttl_seconds=DEFAULT_TTL_SECONDS, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'downloads': 0, 'revalidated': 0, 'evictions': 0, 'evicted_bytes': 0}
+
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        with self._db:
+            self._db.executescript(SCHEMA)
+
+    def close(self):
+        """Closes the index database."""
+        with self._lock:
+            self._db.close()
+
+    def with_own_stats(self):
+        """
+        Returns a view of this cache that shares its files, index and lock but counts its own `stats`
+        from zero, so concurrent builds can each report what they did. Close the original, not the view.
+        """
+        view = copy.copy(self)
+        view.stats = dict.fromkeys(self.stats, 0)
+        return view
+
+    def _blob_path(self, filename):
+        return os.path.join(self.blob_dir, filename[:2], filename)
+
+    def _is_fresh(self, timestamp, now):
+        return self.ttl_seconds is None or now - timestamp < self.ttl_seconds
+
+    def _touch(self, content_hash, now):
+        self._db.execute("UPDATE blobs SET last_access = ? WHERE hash = ?", (now, content_hash))
+
+    def lookup(self, title, record=True):
+        """
+        Returns the cached image path for a title if the title, its URL and the image are all still
+        within the TTL. Returns None (a miss) if the title needs to be resolved or revalidated.
+        With `record` False the lookup only looks: it neither counts toward the stats nor marks the
+        image as recently used.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                """SELECT blobs.hash, blobs.filename, pages.resolved_at, images.fetched_at
+                   FROM aliases
+                   JOIN pages ON pages.canonical = aliases.canonical
+                   JOIN images ON images.url = pages.url
+                   JOIN blobs ON blobs.hash = images.hash
+                   WHERE aliases.title = ?""",
+                (title,)
+            ).fetchone()
+            if row:
+                content_hash, filename, resolved_at, fetched_at = row
+                path = self._blob_path(filename)
+                if self._is_fresh(resolved_at, now) and self._is_fresh(fetched_at, now) and os.path.exists(path):
+                    if record:
+                        self._touch(content_hash, now)
+                        self.stats['hits'] += 1
+                    return path
+            if record:
+                self.stats['misses'] += 1
+            return None
+
+    def record_resolution(self, title, canonical, url):
+        """Records that `title` resolves to the page `canonical`, whose image is at `url`."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO aliases (title, canonical) VALUES (?, ?)", (title, canonical))
+            self._db.execute("INSERT OR REPLACE INTO pages (canonical, url, resolved_at) VALUES (?, ?, ?)", (canonical, url, now))
+
+    def lookup_url(self, url):
+        """
+        Returns (path, etag, last_modified, is_fresh) for a previously downloaded URL, or None if the
+        URL's content is not cached. Stale entries can be revalidated with the returned headers.
+        """
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                """SELECT blobs.hash, blobs.filename, images.etag, images.last_modified, images.fetched_at
+                   FROM images JOIN blobs ON blobs.hash = images.hash
+                   WHERE images.url = ?""",
+                (url,)
+            ).fetchone()
+            if not row:
+                return None
+            content_hash, filename, etag, last_modified, fetched_at = row
+            path = self._blob_path(filename)
+            if not os.path.exists(path):
+                return None
+            self._touch(content_hash, now)
+            return path, etag, last_modified, self._is_fresh(fetched_at, now)
+
+    def mark_revalidated(self, url, etag=None, last_modified=None):
+        """Marks a cached URL as fresh again after the server answered 304 Not Modified."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                """UPDATE images SET fetched_at = ?, etag = COALESCE(?, etag),
+                   last_modified = COALESCE(?, last_modified) WHERE url = ?""",
+                (now, etag, last_modified, url)
+            )
+            self.stats['revalidated'] += 1
+
+    def store(self, url, content, etag=None, last_modified=None):
+        """Stores downloaded image content for a URL and returns the path of its blob file."""
+        content_hash = hashlib.sha256(content).hexdigest()
+        filename = content_hash + guess_extension(content)
+        path = self._blob_path(filename)
+        if not os.path.exists(path):
+            # Write to a temporary file first so an interrupted write never leaves a truncated blob
+            write_atomic(path, lambda f: f.write(content))
+
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO blobs (hash, filename, size, last_access) VALUES (?, ?, ?, ?)",
+                (content_hash, filename, len(content), now)
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO images (url, hash, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, content_hash, etag, last_modified, now)
+            )
+            self.stats['downloads'] += 1
+        return path
+
+    def enforce_size_cap(self):
+        """Deletes the least recently used image files until the cache fits within `max_bytes`."""
+        if self.max_bytes is None:
+            return
+        evicted = 0
+        with self._lock, self._db:
+            total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total_bytes <= self.max_bytes:
+                return
+            rows = self._db.execute("SELECT hash, filename, size FROM blobs ORDER BY last_access").fetchall()
+            for content_hash, filename, size in rows:
+                if total_bytes <= self.max_bytes:
+                    break
+                try:
+                    os.remove(self._blob_path(filename))
+                except FileNotFoundError:
+                    pass
+                self._db.execute("DELETE FROM blobs WHERE hash = ?", (content_hash,))
+                self._db.execute("DELETE FROM images WHERE hash = ?", (content_hash,))
+                total_bytes -= size
+                evicted += 1
+                self.stats['evictions'] += 1
+                self.stats['evicted_bytes'] += size
+        logging.info(f"Evicted {evicted} cached image(s) to stay under {self.max_bytes} bytes.")
+
+    def format_stats(self):
+        """Returns a one-line summary of the cache statistics."""
+        return ", ".join(f"{name}={value}" for name, value in self.stats.items())
+
+class DerivedImageCache:
+    """
+    On-disk cache of resized RGBA variants of source images.
+
+    Variants are keyed by the SHA-256 of the source file plus the target size, resample filter and
+    opacity, so they stay valid however the source was named and are shared between boards.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_DERIVED_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.derived_dir = os.path.join(cache_dir, "derived")
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+
+    def with_own_stats(self):
+        """
+        Returns a view of this cache that shares its files and lock but counts its own `stats` from
+        zero, so concurrent builds can each report what they did.
+        """
+        view = copy.copy(self)
+        view.stats = dict.fromkeys(self.stats, 0)
+        return view
+
+    def get(self, source_path, size, resample_name, opacity, create):
+        """
+        Returns the cached variant of `source_path` for (size, resample_name, opacity), calling
+        `create()` to build and store it on a miss.
+        """
+        from PIL import Image
+
+        key = f"{hash_file(source_path)}:{size[0]}x{size[1]}:{resample_name}:{opacity}"
+        filename = hashlib.sha256(key.encode('utf-8')).hexdigest() + ".png"
+        path = os.path.join(self.derived_dir, filename[:2], filename)
+        if os.path.exists(path):
+            try:
+                with Image.open(path) as cached:
+                    image = cached.convert('RGBA')
+                os.utime(path) # Record the access for LRU eviction
+                with self._lock:
+                    self.stats['hits'] += 1
+                return image
+            except (OSError, ValueError) as e:
+                logging.warning(f"Discarding unreadable derived image {path}: {e}")
+
+        image = create()
+        # A low compression level keeps writes cheap; the files only need to be fast to read back
+        write_atomic(path, lambda f: image.save(f, format='PNG', compress_level=1))
+        with self._lock:
+            self.stats['misses'] += 1
+        return image
+
+    def enforce_size_cap(self):
+        """Deletes the least recently used variants until the derived cache fits within `max_bytes`."""
+        if self.max_bytes is None or not os.path.isdir(self.derived_dir):
+            return
+        entries = []
+        for dirpath, _, filenames in os.walk(self.derived_dir):
+            for filename in filenames:
+                stat = os.stat(os.path.join(dirpath, filename))
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(dirpath, filename)))
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            os.remove(path)
+            total_bytes -= size
+            self.stats['evictions'] += 1
+
+    def format_stats(self):
+        """Returns a one-line summary of the cache statistics."""
+        return ", ".join(f"{name}={value}" for name, value in self.stats.items())
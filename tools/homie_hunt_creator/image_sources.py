@@ -0,0 +1,294 @@
+import json
+import logging
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from image_cache import ImageCache
+from instrumentation import NULL_REPORT, propagate_context
+
+IMAGE_SOURCES = ['wiki', 'local', 'record', 'replay']
+LOCAL_MANIFEST_NAME = "manifest.json" # Optional title -> file map in a local image directory
+LOCAL_IMAGE_EXTENSIONS = ('.png', '.gif', '.jpg', '.jpeg', '.webp')
+WIKI_BATCH_SIZE = 50 # Maximum number of titles the MediaWiki API accepts in a single query
+
+def get_wiki_image_urls(page_titles, api_url, fetcher, report=NULL_REPORT):
+    """
+    Fetches the main image URL for many wiki pages, sending up to WIKI_BATCH_SIZE titles per API request.
+    Each original title is mapped back through the API's normalization and redirect tables.
+    Returns a dict of title -> (canonical title, image URL), where the URL is None if the page or its
+    image could not be found.
+    """
+    import requests
+
+    titles = list(dict.fromkeys(title for title in page_titles if title))
+    image_urls = {}
+    report.set_total('titles', len(titles))
+    for batch_start in range(0, len(titles), WIKI_BATCH_SIZE):
+        report.check_cancelled()
+        batch = titles[batch_start:batch_start + WIKI_BATCH_SIZE]
+        logging.debug(f"Fetching image URLs for {len(batch)} wiki page(s) ({batch_start + len(batch)}/{len(titles)})")
+        params = {
+            "action": "query",
+            "format": "json",
+            "titles": "|".join(batch),
+            "prop": "pageimages",
+            "pithumbsize": 500,  # Request a reasonably sized thumbnail
+            "pilimit": WIKI_BATCH_SIZE,  # Return a thumbnail for every page in the batch
+            "redirects": 1,      # Follow redirects
+        }
+        try:
+            response = fetcher.get(api_url, params=params)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logging.error(f"Network error fetching image URLs for {len(batch)} wiki page(s): {e}")
+            image_urls.update((title, (title, None)) for title in batch)
+            report.advance('titles', len(batch))
+            continue
+
+        query = data.get("query", {})
+        normalized = {entry['from']: entry['to'] for entry in query.get("normalized", [])}
+        redirects = {entry['from']: entry['to'] for entry in query.get("redirects", [])}
+        # Pages are keyed by (unknown) page ID, so index them by their resolved title instead
+        pages = {page['title']: page for page in query.get("pages", {}).values() if 'title' in page}
+
+        for title in batch:
+            resolved_title = normalized.get(title, title)
+            resolved_title = redirects.get(resolved_title, resolved_title)
+            page_data = pages.get(resolved_title)
+            if page_data is None or 'missing' in page_data or 'invalid' in page_data:
+                logging.warning(f"Wiki page '{title}' does not exist.")
+                image_urls[title] = (resolved_title, None)
+                continue
+
+            image_info = page_data.get("thumbnail")
+            if image_info and "source" in image_info:
+                logging.debug(f"Found image URL for '{title}': {image_info['source']}")
+                image_urls[title] = (resolved_title, image_info["source"])
+            else:
+                logging.warning(f"No image found on wiki page '{title}'.")
+                image_urls[title] = (resolved_title, None)
+        report.advance('titles', len(batch))
+    return image_urls
+
+def download_image(url, fetcher, cache, report=NULL_REPORT):
+    """
+    Downloads an image from a URL into the cache and returns its cached path.
+    A stale cached copy is revalidated with its ETag/Last-Modified headers rather than downloaded again.
+    """
+    import requests
+
+    cached = cache.lookup_url(url)
+    headers = {}
+    if cached:
+        cached_path, etag, last_modified, is_fresh = cached
+        if is_fresh:
+            logging.debug(f"Found {url} in cache: {cached_path}")
+            return cached_path
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+    logging.debug(f"Downloading image from {url}")
+    try:
+        response = fetcher.get(url, headers=headers)
+        if cached and response.status_code == 304:
+            cache.mark_revalidated(url, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            report.count('images_revalidated')
+            logging.debug(f"Cached image is still current: {cached_path}")
+            return cached_path
+        response.raise_for_status()
+        cache_path = cache.store(url, response.content, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        report.count('images_downloaded')
+        report.count('bytes_fetched', len(response.content))
+        logging.debug(f"Successfully cached image: {cache_path}")
+        return cache_path
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Failed to download image from {url}: {e}")
+        report.count('download_failures')
+        return None
+
+def prefetch_images(titles, api_url, fetcher, cache, max_workers, report=NULL_REPORT):
+    """
+    Resolves every title missing from the cache in batched API queries, then downloads each distinct
+    image URL once, running up to `max_workers` downloads at once.
+    Returns a dict mapping each title to its cached image path (or None if it could not be fetched).
+    """
+    image_paths = {}
+    uncached_titles = []
+    for title in titles:
+        cache_path = cache.lookup(title)
+        if cache_path:
+            logging.debug(f"Found '{title}' in cache: {cache_path}")
+            image_paths[title] = cache_path
+        else:
+            image_paths[title] = None
+            uncached_titles.append(title)
+
+    if not uncached_titles:
+        return image_paths
+
+    logging.info(f"{len(uncached_titles)} of {len(titles)} wiki images not in cache, fetching from wiki...")
+    with report.stage('title_resolution'):
+        resolutions = get_wiki_image_urls(uncached_titles, api_url, fetcher, report)
+
+    # Titles that differ only by case or redirect resolve to the same URL and are downloaded once
+    titles_by_url = {}
+    for title in uncached_titles:
+        canonical_title, image_url = resolutions[title]
+        if image_url:
+            cache.record_resolution(title, canonical_title, image_url)
+            titles_by_url.setdefault(image_url, []).append(title)
+
+    def fetch(image_url):
+        # A cancelled build skips the downloads that have not started yet
+        report.check_cancelled()
+        cache_path = download_image(image_url, fetcher, cache, report)
+        report.advance('images')
+        return image_url, cache_path
+
+    logging.info(f"Downloading {len(titles_by_url)} wiki images with {max_workers} worker(s)...")
+    report.set_total('images', len(titles_by_url))
+    with report.stage('download'):
+        if max_workers <= 1:
+            results = map(fetch, titles_by_url)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # The workers log in the build's context, so its log capture sees their errors
+                results = list(executor.map(propagate_context(fetch), titles_by_url))
+        for image_url, cache_path in results:
+            for title in titles_by_url[image_url]:
+                image_paths[title] = cache_path
+    return image_paths
+
+class WikiImageSource:
+    """
+    Resolves titles with the MediaWiki API and downloads their images into an image cache.
+    `fetcher` may be a Fetcher, or a RecordingFetcher/ReplayFetcher for offline builds. With
+    `private_cache_dir`, the cache is a throwaway one that is deleted on `close`. A `shared_fetcher`
+    is left open on `close`.
+    """
+
+    def __init__(self, api_url, fetcher, cache, private_cache_dir=None, shared_fetcher=False):
+        self.api_url = api_url
+        self.fetcher = fetcher
+        self.cache = cache
+        self.private_cache_dir = private_cache_dir
+        self.shared_fetcher = shared_fetcher
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def fetch_images(self, titles, max_workers, report=NULL_REPORT):
+        """Returns a dict mapping each title to a local image path (or None if it could not be fetched)."""
+        return prefetch_images(titles, self.api_url, self.fetcher, self.cache, max_workers, report)
+
+    @property
+    def stats(self):
+        return self.fetcher.stats
+
+    def format_stats(self):
+        return self.fetcher.format_stats()
+
+    def close(self):
+        if not self.shared_fetcher:
+            self.fetcher.close()
+        if self.private_cache_dir:
+            self.cache.close()
+            shutil.rmtree(self.private_cache_dir, ignore_errors=True)
+
+def _local_image_key(name):
+    """Folds a title or file name the way the wiki does, so 'Armadyl_chestplate.png' matches 'Armadyl Chestplate'."""
+    return name.replace('_', ' ').strip().lower()
+
+class LocalImageSource:
+    """
+    Serves images from a local directory instead of the wiki. If the directory has a manifest.json
+    mapping titles to file paths (relative to the directory), it is used; any other title is matched
+    to a file named after it, ignoring case and treating underscores as spaces.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.stats = {'found': 0, 'missing': 0}
+        self.files = {}
+        for filename in sorted(os.listdir(directory)):
+            stem, extension = os.path.splitext(filename)
+            if extension.lower() in LOCAL_IMAGE_EXTENSIONS:
+                self.files.setdefault(_local_image_key(stem), os.path.join(directory, filename))
+
+        self.manifest = {}
+        manifest_path = os.path.join(directory, LOCAL_MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest = {title: os.path.join(directory, path) for title, path in json.load(f).items()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def fetch_images(self, titles, max_workers=None, report=NULL_REPORT):
+        """Returns a dict mapping each title to its image file (or None if there is none)."""
+        with report.stage('local_images'):
+            return self._find_images(titles)
+
+    def _find_images(self, titles):
+        image_paths = {}
+        for title in titles:
+            path = self.manifest.get(title) or self.files.get(_local_image_key(title))
+            if path and os.path.isfile(path):
+                self.stats['found'] += 1
+                image_paths[title] = path
+            else:
+                logging.warning(f"No local image for '{title}' in {self.directory}.")
+                self.stats['missing'] += 1
+                image_paths[title] = None
+        return image_paths
+
+    def format_stats(self):
+        return ", ".join(f"{name}={value}" for name, value in self.stats.items())
+
+    def close(self):
+        pass
+
+def open_image_source(kind, config, cache, pool_size, path=None, fetcher=None):
+    """
+    Opens the image source a build fetches its images from:
+    - 'wiki': the MediaWiki API at the config's 'wikiApiUrl', through the shared image `cache`.
+    - 'local': the image files in directory `path`.
+    - 'record': the wiki, saving every response to the archive `path` when the source is closed.
+    - 'replay': the responses saved in the archive `path`, without any network access.
+    Recording and replaying use a fresh private cache, so every request is made (or replayed) and
+    nothing from the shared cache leaks into the build.
+    A wiki source uses `fetcher` (whose session stays open afterwards) if one is given.
+    """
+    if kind not in IMAGE_SOURCES:
+        raise ValueError(f"Unknown image source '{kind}' (choose from {', '.join(IMAGE_SOURCES)}).")
+    if kind != 'wiki' and not path:
+        raise ValueError(f"The '{kind}' image source needs a path.")
+    if kind == 'local':
+        return LocalImageSource(path)
+
+    from fetching import DEFAULT_RATE_LIMIT, RecordingFetcher, ReplayFetcher, create_fetcher
+
+    api_url = config['wikiApiUrl']
+    if kind == 'wiki':
+        if fetcher is not None:
+            return WikiImageSource(api_url, fetcher, cache, shared_fetcher=True)
+        return WikiImageSource(api_url, create_fetcher(pool_size, config.get('fetchRateLimit', DEFAULT_RATE_LIMIT)), cache)
+
+    if kind == 'replay':
+        fetcher = ReplayFetcher(path)
+    else:
+        fetcher = RecordingFetcher(create_fetcher(pool_size, config.get('fetchRateLimit', DEFAULT_RATE_LIMIT)), path)
+    private_cache_dir = tempfile.mkdtemp(prefix=f"hhc-{kind}-")
+    private_cache = ImageCache(private_cache_dir, ttl_seconds=None, max_bytes=None)
+    return WikiImageSource(api_url, fetcher, private_cache, private_cache_dir)
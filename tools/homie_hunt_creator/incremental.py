@@ -0,0 +1,201 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+from image_cache import hash_file, write_atomic
+from memory_cache import image_bytes
+
+MANIFEST_FILENAME = "build_manifest.json"
+MANIFEST_VERSION = 1
+SECTIONS_DIRNAME = ".sections" # Rendered section canvases kept next to the output for the next build
+
+# Config keys that never change the board image
+BUILD_ONLY_KEYS = {
+    'projectTitle', 'wikiApiUrl', 'autoLinkTileInstances', 'autoGenerateTileIDs',
+    'fetchWorkers', 'fetchRateLimit', 'renderWorkers', 'streamBoardImage', 'spriteAtlas',
+}
+# Config keys that never change how a section is drawn
+NON_RENDER_KEYS = BUILD_ONLY_KEYS | {
+    'boardTitle', 'boardTitleFont', 'boardTitleFontSize', 'deepZoom', 'deepZoomTileSize',
+    'outputFormats', 'outputQuality', 'outputEffort', 'pngCompressLevel',
+}
+
+def _digest(value):
+    """Returns the SHA-256 of a JSON-serializable value."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+class SectionCanvasCache:
+    """
+    Keeps the rendered canvas of every section of one board in its output folder, keyed by a
+    fingerprint of everything that affects how the section is drawn: its titles, tile IDs and tile
+    counts, the content hashes of its images, its width and row height, and the render-related keys
+    of the config. Sections whose fingerprint is unchanged since the last build are reused instead of
+    rendered again, and the board image is only re-encoded when any part of it changed.
+
+    With a `memo` (a MemoryLRU kept between builds), canvases are also kept in memory, so reused
+    sections need not be read back from disk, and a section rendered by any earlier build of the same
+    process (such as one from before an edit was undone) is reused too. With no `output_folder` the
+    cache lives in the memo alone: no canvases are written to disk, every canvas of the board is held
+    in memory until the build finishes, and a board identical to one an earlier build encoded is
+    copied from that build's folder instead of being encoded again.
+    """
+
+    def __init__(self, output_folder, memo=None):
+        self.output_folder = output_folder
+        self.memo = memo
+        self.held = {} # Fingerprint -> canvas of memo hits (and, with no output folder, of fresh renders), so the memo cannot evict them mid-build
+        self.board_path = None
+        self.reused = 0
+        self.rendered = 0
+        self.current = {}
+        if output_folder is None:
+            self.sections_dir = self.manifest_path = None
+            self.previous = {'sections': {}}
+            return
+        self.sections_dir = os.path.join(output_folder, SECTIONS_DIRNAME)
+        self.manifest_path = os.path.join(output_folder, MANIFEST_FILENAME)
+        self.previous = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                return manifest
+            logging.info("Build manifest is from an older version; rebuilding every section.")
+        except FileNotFoundError:
+            logging.info("No build manifest found; rebuilding every section.")
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not read build manifest {self.manifest_path}: {e}")
+        return {'sections': {}}
+
+    def _canvas_path(self, fingerprint):
+        return os.path.join(self.sections_dir, f"{fingerprint}.png")
+
+    def fingerprint(self, config, section, section_layout):
+        """Returns the fingerprint of a section as it would be rendered with the given layout."""
+        def image_hash(path):
+            try:
+                return hash_file(path) if path else None
+            except OSError:
+                return None
+
+        render_config = {key: value for key, value in config.items() if key not in NON_RENDER_KEYS}
+        return _digest({
+            'config': render_config,
+            'size': [section_layout['width'], section_layout['row_height']],
+            'title': section['title'],
+            'background': image_hash(section['background_path']),
+            'tile_groups': [
+                {
+                    'title': group['title'],
+                    'image': image_hash(group['image_path']),
+                    'tiles': [tile['id'] for tile in group['tiles']],
+                }
+                for group in section['tile_groups']
+            ],
+        })
+
+    def lookup(self, fingerprint):
+        """Returns True, and keeps the stored canvas, if an earlier build rendered the same section."""
+        entry = self.previous['sections'].get(fingerprint)
+        if entry is not None and os.path.exists(self._canvas_path(fingerprint)):
+            self.current[fingerprint] = entry
+            self.reused += 1
+            return True
+        memo_entry = self.memo.get(fingerprint) if self.memo is not None else None
+        if memo_entry is None:
+            return False
+        title, canvas = memo_entry
+        self.held[fingerprint] = canvas
+        if self.output_folder is not None:
+            self._write_canvas(fingerprint, canvas)
+        self.current[fingerprint] = {'title': title}
+        self.reused += 1
+        return True
+
+    def load_canvas(self, fingerprint):
+        """Loads a stored section canvas."""
+        from PIL import Image
+
+        canvas = self.held.get(fingerprint)
+        if canvas is None and self.memo is not None:
+            memo_entry = self.memo.get(fingerprint)
+            canvas = memo_entry and memo_entry[1]
+        if canvas is not None:
+            return canvas
+        with Image.open(self._canvas_path(fingerprint)) as canvas:
+            canvas = canvas.convert('RGB')
+        if self.memo is not None:
+            self.memo.put(fingerprint, (self.current[fingerprint]['title'], canvas), image_bytes(canvas))
+        return canvas
+
+    def _write_canvas(self, fingerprint, canvas):
+        write_atomic(self._canvas_path(fingerprint), lambda f: canvas.save(f, format='PNG', compress_level=1))
+
+    def store(self, fingerprint, title, canvas):
+        """Saves a freshly rendered section canvas for the next build."""
+        if self.output_folder is not None:
+            self._write_canvas(fingerprint, canvas)
+        else:
+            # Without a folder the memo is the only other copy, and it may drop the canvas at any time
+            self.held[fingerprint] = canvas
+        if self.memo is not None:
+            self.memo.put(fingerprint, (title, canvas), image_bytes(canvas))
+        self.current[fingerprint] = {'title': title}
+        self.rendered += 1
+
+    def board_unchanged(self, board_fingerprint, board_path):
+        """
+        Returns True if the board image on disk was built from exactly the same sections and settings.
+        Without an output folder, a board that an earlier build in the memo encoded is copied to
+        `board_path` instead, together with its other formats and deep zoom tiles.
+        """
+        self.board_path = board_path
+        if self.output_folder is not None:
+            return self.previous.get('board_fingerprint') == board_fingerprint and os.path.exists(board_path)
+        source_path = self.memo.get(('board', board_fingerprint)) if self.memo is not None else None
+        return source_path is not None and self._copy_board(source_path, board_path)
+
+    def _copy_board(self, source_path, board_path):
+        """Copies board.png and everything cut from it (board.webp, board.dzi, board_files/, ...) next to `board_path`."""
+        source_folder, source_name = os.path.split(source_path)
+        target_folder = os.path.dirname(board_path)
+        stem = os.path.splitext(source_name)[0]
+        try:
+            names = [name for name in os.listdir(source_folder) if name.startswith(stem + '.') or name == stem + '_files']
+            if source_name not in names:
+                return False
+            for name in names:
+                source = os.path.join(source_folder, name)
+                if os.path.isdir(source):
+                    shutil.copytree(source, os.path.join(target_folder, name), dirs_exist_ok=True)
+                else:
+                    shutil.copyfile(source, os.path.join(target_folder, name))
+        except OSError as e:
+            logging.warning(f"Could not copy the unchanged board from {source_folder}, encoding it again: {e}")
+            return False
+        logging.info(f"Board is unchanged since an earlier build; copied it from {source_folder}.")
+        return True
+
+    def save(self, board_fingerprint):
+        """Writes the build manifest and deletes the canvases of sections that are no longer on the board."""
+        if self.output_folder is None:
+            if self.memo is not None:
+                self.memo.put(('board', board_fingerprint), self.board_path, 0)
+            logging.info(f"Section memo: {self.rendered} section(s) rendered, {self.reused} reused.")
+            return
+        manifest = {'version': MANIFEST_VERSION, 'board_fingerprint': board_fingerprint, 'sections': self.current}
+        write_atomic(self.manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode('utf-8')))
+
+        if os.path.isdir(self.sections_dir):
+            for filename in os.listdir(self.sections_dir):
+                if filename.endswith(".png") and filename[:-len(".png")] not in self.current:
+                    os.remove(os.path.join(self.sections_dir, filename))
+        logging.info(f"Incremental build: {self.rendered} section(s) rendered, {self.reused} reused.")
+
+def board_fingerprint(config, board_size, section_fingerprints):
+    """Returns the fingerprint of the whole board image."""
+    board_config = {key: value for key, value in config.items() if key not in BUILD_ONLY_KEYS}
+    return _digest({'config': board_config, 'size': list(board_size), 'sections': section_fingerprints})
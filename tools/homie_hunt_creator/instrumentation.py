@@ -0,0 +1,258 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from image_cache import write_atomic
+
+RUN_REPORT_NAME = "run_report.json"
+PROFILE_NAME = "profile.pstats"
+PROFILE_TOP_FUNCTIONS = 30 # Functions listed in the report, by cumulative time
+TRACE_MEMORY_TOP_LINES = 15 # Allocation sites listed in the report, by size
+
+class RunReport:
+    """
+    Collects stage timings and counters for one build, and writes them as run_report.json.
+
+    Stage times are exclusive: time spent in a stage nested inside another (on the same thread) only
+    counts toward the inner one, so the stages of a single-threaded build add up to its total time.
+    Stages timed on several threads or worker processes at once are summed, so they can add up to
+    more than the wall time. Safe to use from several threads.
+
+    With `profile`, the build is run under cProfile (which only sees the thread that started it), and
+    with `trace_memory`, tracemalloc records the peak Python memory use and the largest allocation sites.
+    A BuildProgress passed as `progress` receives the pipeline's progress and can cancel the build.
+    """
+
+    def __init__(self, profile=False, trace_memory=False, progress=None):
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.progress = progress
+        self.stages = {} # Name -> {'seconds', 'calls'}
+        self.counters = {}
+        self.profile_top = None
+        self.memory = None
+        self._profiler = None
+        self._started_at = None
+        self._start = None
+        self._total_seconds = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def start(self):
+        """Starts the clock and any profiling hooks. Does nothing if the report was already started."""
+        if self._start is not None:
+            return
+        self._started_at = time.time()
+        self._start = time.perf_counter()
+        if self.trace_memory:
+            import tracemalloc
+            tracemalloc.start()
+        if self.profile:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def finish(self):
+        """Stops the clock and the profiling hooks, and keeps their results for the report."""
+        if self._start is None or self._total_seconds is not None:
+            return
+        self._total_seconds = time.perf_counter() - self._start
+        if self._profiler:
+            import pstats
+            self._profiler.disable()
+            stats = pstats.Stats(self._profiler).stats
+            top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP_FUNCTIONS]
+            self.profile_top = [
+                {'function': f"{os.path.basename(filename)}:{line}({name})", 'calls': calls, 'own_s': round(own, 4), 'cumulative_s': round(cumulative, 4)}
+                for (filename, line, name), (_, calls, own, cumulative, _) in top
+            ]
+        if self.trace_memory:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.memory = {
+                'current_bytes': current,
+                'peak_bytes': peak,
+                'top_allocations': [
+                    {'location': f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}", 'bytes': stat.size, 'blocks': stat.count}
+                    for stat in snapshot.statistics('lineno')[:TRACE_MEMORY_TOP_LINES]
+                ],
+            }
+
+    def _add_time(self, name, seconds, calls=1):
+        with self._lock:
+            stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            stage['seconds'] += seconds
+            stage['calls'] += calls
+
+    @contextmanager
+    def stage(self, name):
+        """Times the enclosed block as part of stage `name`."""
+        stack = self._local.__dict__.setdefault('stack', [])
+        stack.append(0.0) # Time taken by stages nested inside this one
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self._add_time(name, elapsed - nested)
+
+    def count(self, name, amount=1):
+        """Adds `amount` to counter `name`."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_counters(self, prefix, counters):
+        """Adds every counter in a dict (such as a cache's stats) under `prefix`."""
+        for name, amount in counters.items():
+            self.count(f"{prefix}.{name}", amount)
+
+    def set_total(self, phase, total):
+        """Passes the amount of work in a phase to the progress tracker, if there is one."""
+        if self.progress:
+            self.progress.set_total(phase, total)
+
+    def advance(self, phase, amount=1):
+        """Reports progress in a phase; raises BuildCancelled if the build has been cancelled."""
+        if self.progress:
+            self.progress.advance(phase, amount)
+
+    def add_bytes_written(self, amount):
+        if self.progress:
+            self.progress.add_bytes_written(amount)
+
+    def check_cancelled(self):
+        """Raises BuildCancelled if the build has been cancelled."""
+        if self.progress:
+            self.progress.check_cancelled()
+
+    def snapshot(self):
+        """Returns the stages and counters as plain data, to be merged into another report."""
+        with self._lock:
+            return {'stages': {name: dict(stage) for name, stage in self.stages.items()}, 'counters': dict(self.counters)}
+
+    def merge(self, snapshot):
+        """Adds the stages and counters of a snapshot, e.g. one taken in a render worker process."""
+        for name, stage in snapshot['stages'].items():
+            self._add_time(name, stage['seconds'], stage['calls'])
+        for name, amount in snapshot['counters'].items():
+            self.count(name, amount)
+
+    def to_dict(self):
+        """Returns the whole report as JSON-serializable data, with the slowest stages first."""
+        total_seconds = self._total_seconds
+        if total_seconds is None and self._start is not None:
+            total_seconds = time.perf_counter() - self._start
+        snapshot = self.snapshot()
+        report = {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self._started_at)) if self._started_at else None,
+            'total_seconds': None if total_seconds is None else round(total_seconds, 4),
+            'stages': {
+                name: {'seconds': round(stage['seconds'], 4), 'calls': stage['calls']}
+                for name, stage in sorted(snapshot['stages'].items(), key=lambda item: item[1]['seconds'], reverse=True)
+            },
+            'counters': dict(sorted(snapshot['counters'].items())),
+        }
+        if self.profile_top is not None:
+            report['profile'] = self.profile_top
+        if self.memory is not None:
+            report['memory'] = self.memory
+        return report
+
+    def format_summary(self):
+        """Returns a table of the stage times, slowest first."""
+        report = self.to_dict()
+        lines = [f"{'Stage':<18}{'Seconds':>10}{'Calls':>9}"]
+        for name, stage in report['stages'].items():
+            lines.append(f"{name:<18}{stage['seconds']:>10.3f}{stage['calls']:>9}")
+        if report['total_seconds'] is not None:
+            lines.append(f"{'total':<18}{report['total_seconds']:>10.3f}")
+        return "\n".join(lines)
+
+    def write(self, output_folder):
+        """Writes run_report.json (and profile.pstats when profiling) into `output_folder`. Returns the report path."""
+        report_path = os.path.join(output_folder, RUN_REPORT_NAME)
+        data = json.dumps(self.to_dict(), indent=2).encode('utf-8')
+        write_atomic(report_path, lambda f: f.write(data))
+        if self._profiler:
+            self._profiler.dump_stats(os.path.join(output_folder, PROFILE_NAME))
+        return report_path
+
+# The BuildLogCapture collecting the messages of the work running in this context, if any
+_active_capture = contextvars.ContextVar('active_log_capture', default=None)
+
+def propagate_context(function):
+    """
+    Returns `function` wrapped to run in a copy of the calling thread's context, for work handed to a
+    thread pool, so that a BuildLogCapture active in the caller also collects what the workers log.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(function, *args, **kwargs)
+    return run
+
+class BuildLogCapture(logging.Handler):
+    """
+    Collects the error messages one build logs while the capture is active (use it as a context
+    manager), so that a build run for someone else can hand them back, e.g. in an HTTP response.
+    Messages are matched by context rather than by thread: they are collected from the thread that
+    entered the capture and from pool threads running work wrapped with propagate_context, but not
+    from other builds running at the same time. Worker processes ('renderWorkers') are not covered.
+    """
+
+    def __init__(self, level=logging.ERROR):
+        super().__init__(level)
+        self.messages = []
+        self._token = None
+
+    def __enter__(self):
+        self._token = _active_capture.set(self)
+        logging.getLogger().addHandler(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        logging.getLogger().removeHandler(self)
+        _active_capture.reset(self._token)
+
+    def emit(self, record):
+        # Handlers run on the thread that logs, so this sees that thread's context
+        if _active_capture.get() is self:
+            self.messages.append(record.getMessage())
+
+class NullReport:
+    """A report that records nothing, used when a caller does not want instrumentation."""
+
+    def stage(self, name):
+        return nullcontext()
+
+    def count(self, name, amount=1):
+        pass
+
+    def add_counters(self, prefix, counters):
+        pass
+
+    def merge(self, snapshot):
+        pass
+
+    def set_total(self, phase, total):
+        pass
+
+    def advance(self, phase, amount=1):
+        pass
+
+    def add_bytes_written(self, amount):
+        pass
+
+    def check_cancelled(self):
+        pass
+
+NULL_REPORT = NullReport()
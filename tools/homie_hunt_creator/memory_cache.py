@@ -0,0 +1,62 @@
+import threading
+from collections import OrderedDict
+
+from preflight import BYTES_PER_PIXEL
+
+def image_bytes(image):
+    """Returns the memory a Pillow image's pixels take up, in bytes."""
+    return image.width * image.height * BYTES_PER_PIXEL
+
+class MemoryLRU:
+    """
+    In-memory cache of values such as scaled images or rendered section canvases, kept between builds
+    by a BoardBuilder. The least recently used values are dropped once their total size passes
+    `max_bytes`; a single value larger than that is not kept at all. Cached values are shared, so
+    callers must not modify them. Safe to use from several threads.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._entries = OrderedDict() # Key -> (value, size), least recently used first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Returns the value cached under `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        """Caches `value`, which takes up `size` bytes, evicting older values to make room."""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        """Drops every cached value."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def format_stats(self):
+        """Returns a one-line summary of the cache statistics."""
+        return ", ".join(f"{name}={value}" for name, value in self.stats.items()) + f", entries={len(self._entries)}, bytes={self.bytes}"
@@ -0,0 +1,65 @@
+import struct
+import zlib
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+DEFAULT_COMPRESS_LEVEL = 6 # Same default as Pillow's PNG encoder
+
+class PNGStripWriter:
+    """
+    Writes an 8-bit RGB PNG to an open binary file one horizontal strip at a time, so the whole image
+    never has to be held in memory. Rows are stored unfiltered and compressed as a single zlib stream
+    that is split across IDAT chunks as it is produced. Call `close` after the last strip.
+    """
+
+    def __init__(self, file, width, height, compress_level=DEFAULT_COMPRESS_LEVEL):
+        self.file = file
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level)
+
+        self.file.write(PNG_SIGNATURE)
+        # Bit depth 8, color type 2 (RGB), default compression and filter methods, no interlacing
+        self._write_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+
+    def _write_chunk(self, chunk_type, data):
+        self.file.write(struct.pack('>I', len(data)))
+        self.file.write(chunk_type)
+        self.file.write(data)
+        self.file.write(struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+    def _write_idat(self, data):
+        if data:
+            self._write_chunk(b'IDAT', data)
+
+    def write_strip(self, image):
+        """Appends the rows of an RGB image that is exactly as wide as the PNG."""
+        if image.mode != 'RGB' or image.width != self.width:
+            raise ValueError(f"Strip must be an RGB image {self.width} pixels wide, got {image.mode} {image.width}x{image.height}.")
+        if self.rows_written + image.height > self.height:
+            raise ValueError(f"Strip would write past the last row of a {self.height} pixel tall image.")
+
+        data = image.tobytes()
+        stride = self.width * 3
+        # Each row starts with its filter type; 0 means the row is stored as is
+        rows = b''.join(b'\x00' + data[offset:offset + stride] for offset in range(0, len(data), stride))
+        self._write_idat(self._compressor.compress(rows))
+        self.rows_written += image.height
+
+    def close(self):
+        """Finishes the image data and writes the end of the PNG."""
+        if self.rows_written != self.height:
+            raise ValueError(f"Only {self.rows_written} of {self.height} rows were written.")
+        self._write_idat(self._compressor.flush())
+        self._write_chunk(b'IEND', b'')
+
+def open_own_png(path):
+    """
+    Opens a PNG this tool wrote itself, such as a streamed board, without Pillow's decompression bomb
+    check. The board can be far larger than Image.MAX_IMAGE_PIXELS allows, but that limit is a
+    process-wide setting that guards the downloaded images other threads may be opening, so it must
+    not be lifted. Only Image.open applies the check, so the PNG reader is used directly.
+    """
+    from PIL import PngImagePlugin
+
+    return PngImagePlugin.PngImageFile(path)
@@ -0,0 +1,350 @@
+import math
+import os
+import sys
+
+from encoders import DEFAULT_OUTPUT_FORMATS, ENCODERS, unsupported_format_reason
+
+BYTES_PER_PIXEL = 4 # Pillow keeps RGB as well as RGBA images at four bytes per pixel
+BASE_MEMORY_BYTES = 64 * 1024 * 1024 # Python, Pillow and the build's own data, on top of the images
+MEMORY_WARNING_FRACTION = 0.5 # Warn when a build is expected to need more than this share of the machine's memory
+MAX_TILE_ID_LENGTH = 1500 # Longest ID the web app's importer accepts
+REQUIRED = True
+OPTIONAL = False
+
+# --- Schema ---
+# Each check takes a value and returns what is wrong with it, or None. They are built once, here.
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _range_error(value, minimum, maximum):
+    if minimum is not None and value < minimum:
+        return f"must be at least {minimum}"
+    if maximum is not None and value > maximum:
+        return f"must be at most {maximum}"
+    return None
+
+def integer(minimum=None, maximum=None):
+    def check(value):
+        if not isinstance(value, int) or isinstance(value, bool):
+            return "must be a whole number"
+        return _range_error(value, minimum, maximum)
+    return check
+
+def number(minimum=None, maximum=None):
+    def check(value):
+        if not _is_number(value):
+            return "must be a number"
+        return _range_error(value, minimum, maximum)
+    return check
+
+def boolean():
+    def check(value):
+        return None if isinstance(value, bool) else "must be true or false"
+    return check
+
+def text(non_empty=False):
+    def check(value):
+        if not isinstance(value, str):
+            return "must be a string"
+        if non_empty and not value.strip():
+            return "must not be empty"
+        return None
+    return check
+
+def one_of(choices):
+    def check(value):
+        return None if value in choices else f"must be one of {', '.join(map(str, choices))}"
+    return check
+
+def list_of(item_check):
+    def check(value):
+        if not isinstance(value, list):
+            return "must be a list"
+        for index, item in enumerate(value):
+            error = item_check(item)
+            if error:
+                return f"item {index + 1} {error}"
+        return None
+    return check
+
+def color(allow_empty=False):
+    def check(value):
+        from PIL import ImageColor
+
+        if allow_empty and not value:
+            return None
+        if not isinstance(value, str):
+            return "must be a color string such as '#1a1a1a'"
+        try:
+            ImageColor.getrgb(value)
+        except ValueError:
+            return f"is not a color Pillow understands ('{value}')"
+        return None
+    return check
+
+def rgba():
+    def check(value):
+        if not isinstance(value, list) or len(value) not in (3, 4) or not all(isinstance(part, int) and 0 <= part <= 255 for part in value):
+            return "must be an [R, G, B] or [R, G, B, A] list of whole numbers from 0 to 255"
+        return None
+    return check
+
+THEME_COLORS_SCHEMA = {
+    'background': (color(), REQUIRED),
+    'primaryText': (color(), OPTIONAL),
+    'boardTitleBackgroundColor': (color(allow_empty=True), OPTIONAL), # Empty or null draws no box
+    'boardTitleBorderColor': (color(allow_empty=True), OPTIONAL),
+    'sectionBorder': (color(), OPTIONAL),
+    'sectionTitle': (color(), REQUIRED),
+    'tileBackgroundColor': (rgba(), OPTIONAL),
+    'tileTitle': (color(), REQUIRED),
+}
+
+CONFIG_SCHEMA = {
+    'projectTitle': (text(non_empty=True), OPTIONAL),
+    'boardTitle': (text(), OPTIONAL),
+    'wikiApiUrl': (text(non_empty=True), OPTIONAL), # Required for wiki builds, see validate_config
+    'autoLinkTileInstances': (boolean(), OPTIONAL),
+    'autoGenerateTileIDs': (boolean(), OPTIONAL),
+    'fetchWorkers': (integer(minimum=1), OPTIONAL),
+    'fetchRateLimit': (number(minimum=0), OPTIONAL),
+    'renderWorkers': (integer(minimum=1), OPTIONAL),
+    'streamBoardImage': (boolean(), OPTIONAL),
+    'deepZoom': (boolean(), OPTIONAL),
+    'deepZoomTileSize': (integer(minimum=1), OPTIONAL),
+    'spriteAtlas': (boolean(), OPTIONAL),
+    'outputFormats': (list_of(one_of(list(ENCODERS))), OPTIONAL),
+    'outputQuality': (integer(0, 100), OPTIONAL),
+    'outputEffort': (integer(0, 6), OPTIONAL),
+    'pngCompressLevel': (integer(0, 9), OPTIONAL),
+    'sectionColumns': (integer(minimum=1), OPTIONAL),
+    'sectionWidth': (integer(minimum=1), OPTIONAL), # Unused: the width follows from the tile settings
+    'sectionPadding': (integer(minimum=0), REQUIRED),
+    'sectionBgOpacity': (number(0, 1), OPTIONAL),
+    'tileColumns': (integer(minimum=1), OPTIONAL),
+    'tileWidth': (integer(minimum=1), REQUIRED),
+    'tilePadding': (integer(minimum=0), REQUIRED),
+    'boardTitleFont': (text(non_empty=True), OPTIONAL),
+    'boardTitleFontSize': (integer(minimum=1), OPTIONAL),
+    'sectionTitleFont': (text(non_empty=True), REQUIRED),
+    'sectionTitleFontSize': (integer(minimum=1), REQUIRED),
+    'tileTitleFont': (text(non_empty=True), REQUIRED),
+    'tileTitleFontSize': (integer(minimum=1), REQUIRED),
+    'themeColors': (None, REQUIRED), # Checked against THEME_COLORS_SCHEMA
+}
+
+FILE_SCHEMA = {
+    'config': (None, REQUIRED), # Checked against CONFIG_SCHEMA
+    'sections': (None, REQUIRED),
+    'uiState': (None, OPTIONAL), # Saved by HHC_config_editor.html; not used by the creator
+}
+
+SECTION_SCHEMA = {
+    'title': (text(), REQUIRED),
+    'wiki': (text(), OPTIONAL),
+    'tiles': (None, REQUIRED), # Each one checked against TILE_SCHEMA
+}
+
+TILE_SCHEMA = {
+    'title': (text(), REQUIRED),
+    'description': (text(), REQUIRED),
+    'tileID': (text(), OPTIONAL), # Required unless 'autoGenerateTileIDs' is set, see validate_config
+    'wiki': (text(), OPTIONAL),
+    'points': (list_of(number()), REQUIRED),
+}
+
+def validate_object(data, schema, path, errors, warnings):
+    """
+    Checks a dict against a schema of key -> (check, required), adding a message for every problem
+    to `errors`, and for every key the schema does not know (usually a typo) to `warnings`.
+    Returns False if `data` is not a dict at all.
+    """
+    if not isinstance(data, dict):
+        errors.append(f"{path} must be an object")
+        return False
+    for key, (check, required) in schema.items():
+        if key not in data:
+            if required:
+                errors.append(f"{path}: '{key}' is missing")
+            continue
+        error = check(data[key]) if check else None
+        if error:
+            errors.append(f"{path}.{key} {error}")
+    for key in data:
+        if key not in schema:
+            warnings.append(f"{path}: unknown key '{key}' is ignored")
+    return True
+
+def tile_id_error(tile_id):
+    """Returns why a tile ID cannot be used, or None."""
+    if not tile_id.strip():
+        return "must not be empty"
+    if tile_id != tile_id.strip():
+        return "must not start or end with spaces"
+    if '/' in tile_id:
+        return "must not contain '/' (the web app stores tiles by ID)"
+    if ',' in tile_id:
+        return "must not contain ',' (it separates IDs in prerequisites)"
+    if len(tile_id) > MAX_TILE_ID_LENGTH:
+        return f"must be at most {MAX_TILE_ID_LENGTH} characters long"
+    return None
+
+def validate_config(config_data, require_wiki=True):
+    """
+    Checks a whole board config: the settings, the theme colors, every section and every tile,
+    including that tile IDs are usable and unique. Returns (errors, warnings), two lists of messages.
+    """
+    errors, warnings = [], []
+    if not validate_object(config_data, FILE_SCHEMA, "file", errors, warnings):
+        return errors, warnings
+    config = config_data.get('config')
+    if validate_object(config, CONFIG_SCHEMA, "config", errors, warnings):
+        if 'themeColors' in config:
+            validate_object(config['themeColors'], THEME_COLORS_SCHEMA, "config.themeColors", errors, warnings)
+        if require_wiki and 'wikiApiUrl' not in config:
+            errors.append("config: 'wikiApiUrl' is missing (it is needed to fetch images from the wiki)")
+    auto_generate_ids = isinstance(config, dict) and config.get('autoGenerateTileIDs', False)
+
+    sections = config_data.get('sections')
+    if not isinstance(sections, list):
+        errors.append("sections must be a list")
+        return errors, warnings
+
+    tile_id_owners = {}
+    for section_index, section in enumerate(sections):
+        section_path = f"sections[{section_index}]"
+        if not validate_object(section, SECTION_SCHEMA, section_path, errors, warnings):
+            continue
+        tiles = section.get('tiles', [])
+        if not isinstance(tiles, list):
+            errors.append(f"{section_path}.tiles must be a list")
+            continue
+        for tile_index, tile_def in enumerate(tiles):
+            tile_path = f"{section_path}.tiles[{tile_index}]"
+            if not validate_object(tile_def, TILE_SCHEMA, tile_path, errors, warnings):
+                continue
+            if tile_def.get('points') == []:
+                warnings.append(f"{tile_path}: 'points' is empty, so the tile is left off the board")
+            if auto_generate_ids:
+                continue
+            base_tile_id = tile_def.get('tileID')
+            if not base_tile_id:
+                errors.append(f"{tile_path}: 'tileID' is missing (or set 'autoGenerateTileIDs')")
+                continue
+            if not isinstance(base_tile_id, str):
+                continue
+            error = tile_id_error(base_tile_id)
+            if error:
+                errors.append(f"{tile_path}.tileID '{base_tile_id}' {error}")
+                continue
+            points = tile_def.get('points')
+            for instance in range(1, len(points) + 1 if isinstance(points, list) else 1):
+                tile_id = f"{base_tile_id}-{instance}"
+                if tile_id in tile_id_owners:
+                    errors.append(f"{tile_path}: tile ID '{tile_id}' is also used by {tile_id_owners[tile_id]}")
+                    break
+                tile_id_owners[tile_id] = tile_path
+    return errors, warnings
+
+# --- Fonts ---
+
+def resolve_font_path(path):
+    """
+    Returns the font path that loads for `path`, or None if no font can be found. A path that does not
+    exist (such as a Windows font path on Linux) falls back to the same file name in the system's font
+    folders, which Pillow searches for bare file names.
+    """
+    from PIL import ImageFont
+
+    if os.path.isfile(path):
+        return path
+    for candidate in dict.fromkeys([path, os.path.basename(path)]):
+        try:
+            ImageFont.truetype(candidate, 10)
+        except OSError:
+            continue
+        return candidate
+    return None
+
+# --- Estimates ---
+
+def total_memory_bytes():
+    """Returns the machine's physical memory in bytes, or None if it cannot be found out."""
+    if sys.platform == 'win32':
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [('length', ctypes.c_ulong), ('memory_load', ctypes.c_ulong), ('total_physical', ctypes.c_ulonglong),
+                        ('available_physical', ctypes.c_ulonglong), ('total_page_file', ctypes.c_ulonglong),
+                        ('available_page_file', ctypes.c_ulonglong), ('total_virtual', ctypes.c_ulonglong),
+                        ('available_virtual', ctypes.c_ulonglong), ('available_extended_virtual', ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.length = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.total_physical
+        return None
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def estimate_peak_memory(config, layout, tile_images, background_images, incremental=False):
+    """
+    Estimates the most memory a build of the laid-out board holds at once, in bytes: the board (or,
+    with 'streamBoardImage', the tallest strip), the copies made while encoding and cutting deep zoom
+    tiles, the section canvases in flight, and the scaled images kept for reuse (`tile_images` and
+    `background_images` are the numbers of distinct tile and section images). It is a rough upper
+    bound from the image sizes alone, so only its order of magnitude should be relied on.
+    """
+    board_width, board_height = layout['board_width'], int(math.ceil(layout['board_height']))
+    board_bytes = board_width * board_height * BYTES_PER_PIXEL
+    sections = layout['sections']
+    section_bytes = [(section['width'] + 1) * (int(section['row_height']) + 1) * BYTES_PER_PIXEL for section in sections]
+    largest_section = max(section_bytes, default=0)
+
+    render_workers = config.get('renderWorkers', 1)
+    if render_workers > 1:
+        # Finished canvases queued in the pool, plus one being drawn in every worker
+        sections_in_flight = render_workers * 3
+    else:
+        sections_in_flight = 1
+    formats = [name for name in config.get('outputFormats', DEFAULT_OUTPUT_FORMATS) if not unsupported_format_reason(name, (board_width, board_height))]
+    extra_formats = [name for name in formats if name != 'png']
+    tile_width = config['tileWidth']
+    scaled_images = tile_images * tile_width * tile_width * BYTES_PER_PIXEL + background_images * largest_section
+
+    if config.get('streamBoardImage', False):
+        tallest_row = max((bottom - top for top, bottom, _ in layout['rows']), default=0)
+        strip_bytes = board_width * tallest_row * BYTES_PER_PIXEL
+        # The strip, its finished part and the part carried into the next strip
+        peak = strip_bytes * 3 + largest_section * (sections_in_flight + config.get('sectionColumns', 1))
+        if config.get('deepZoom', False):
+            peak += strip_bytes * 2
+        if extra_formats:
+            # The other formats are encoded from the streamed PNG, read back whole
+            peak = max(peak, board_bytes * len(extra_formats))
+    else:
+        sections_held = len(sections) if incremental else sections_in_flight
+        # Every format but the first is encoded from its own copy of the board
+        peak = board_bytes * (1 + len(extra_formats)) + sum(sorted(section_bytes)[-sections_held:])
+        if config.get('deepZoom', False):
+            peak += board_bytes + board_bytes // 3
+    return BASE_MEMORY_BYTES + peak + scaled_images
+
+def format_warnings(config, layout):
+    """Returns warnings about output formats that will be skipped, e.g. WebP for a board too large for it."""
+    size = (layout['board_width'], int(math.ceil(layout['board_height'])))
+    warnings = []
+    for name in config.get('outputFormats', DEFAULT_OUTPUT_FORMATS):
+        reason = unsupported_format_reason(name, size)
+        if reason:
+            warnings.append(f"'{name}' output will be skipped: {reason}")
+    return warnings
+
+def format_bytes(size):
+    """Formats a byte count as e.g. '420 MB' or '3.1 GB'."""
+    if size >= 1024 ** 3:
+        return f"{size / 1024 ** 3:.1f} GB"
+    return f"{size / 1024 ** 2:,.0f} MB"
@@ -0,0 +1,169 @@
+import heapq
+import json
+import logging
+
+from image_cache import write_atomic
+
+PREREQ_GRAPH_NAME = "prereq_graph.json"
+MAX_LOGGED_PROBLEMS = 10 # Problems of each kind logged one by one; the rest are only counted
+
+def parse_prerequisites(value):
+    """
+    Parses a tile's Prerequisites field the way the web app does: a JSON array of AND groups, any one
+    of which unlocks the tile (e.g. [["a", "b"], ["c"]] means "a and b, or c"), or else a plain
+    comma-separated list of IDs that are all required. Returns the list of AND groups, which is empty
+    for a tile that starts unlocked.
+    """
+    if not value or not value.strip():
+        return []
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        and_group = [prereq_id.strip() for prereq_id in value.split(',') if prereq_id.strip()]
+        return [and_group] if and_group else []
+    if isinstance(parsed, list) and (not parsed or isinstance(parsed[0], list)):
+        return [[str(prereq_id) for prereq_id in and_group] for and_group in parsed if isinstance(and_group, list)]
+    return []
+
+def _find_cycles(nodes, edges):
+    """
+    Returns the cycles among `nodes` as lists of tile IDs: every strongly connected component with
+    more than one tile, or a single tile that requires itself. `edges` maps a tile to the tiles that
+    depend on it. Iterative Tarjan, so long prerequisite chains cannot hit the recursion limit.
+    """
+    node_set = set(nodes)
+    index_of, low, on_stack, stack, cycles = {}, {}, set(), [], []
+    counter = 0
+    for start in nodes:
+        if start in index_of:
+            continue
+        work = [(start, iter(edges.get(start, ())))]
+        index_of[start] = low[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack.add(start)
+        while work:
+            node, successors = work[-1]
+            for successor in successors:
+                if successor not in node_set:
+                    continue
+                if successor not in index_of:
+                    index_of[successor] = low[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(edges.get(successor, ()))))
+                    break
+                if successor in on_stack:
+                    low[node] = min(low[node], index_of[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or node in edges.get(node, ()):
+                        cycles.append(component[::-1])
+    return cycles
+
+def build_prereq_graph(tile_rows):
+    """
+    Compiles the Prerequisites of every tile row (as written to tiles.csv) into a graph a client can
+    use to update unlock states incrementally:
+    - 'prerequisites': the parsed AND groups of every tile that has any.
+    - 'dependents': for each tile, the tiles whose prerequisites mention it, i.e. the only tiles that
+      need to be checked again when it is completed.
+    - 'order': every tile, with each one after all the tiles it may require (in board order where
+      the prerequisites leave a choice). Tiles in or behind a cycle are left out.
+    - 'problems': prerequisite IDs that are not tiles on the board, cycles, and duplicate tile IDs.
+    """
+    tile_ids = []
+    positions = {}
+    duplicates = []
+    for row in tile_rows:
+        tile_id = row['id']
+        if tile_id in positions:
+            duplicates.append(tile_id)
+            continue
+        positions[tile_id] = len(tile_ids)
+        tile_ids.append(tile_id)
+
+    prerequisites = {}
+    dependents = {}
+    dangling = []
+    for row in tile_rows:
+        tile_id = row['id']
+        and_groups = parse_prerequisites(row.get('Prerequisites', ''))
+        if not and_groups or tile_id in prerequisites:
+            continue
+        prerequisites[tile_id] = and_groups
+        for prereq_id in dict.fromkeys(prereq_id for and_group in and_groups for prereq_id in and_group):
+            if prereq_id not in positions:
+                dangling.append({'tile': tile_id, 'prerequisite': prereq_id})
+                continue
+            dependents.setdefault(prereq_id, []).append(tile_id)
+
+    # Kahn's algorithm, always taking the earliest tile on the board that is ready
+    waiting_on = {tile_id: 0 for tile_id in tile_ids}
+    for tile_id, tile_dependents in dependents.items():
+        for dependent in tile_dependents:
+            waiting_on[dependent] += 1
+    ready = [positions[tile_id] for tile_id in tile_ids if waiting_on[tile_id] == 0]
+    heapq.heapify(ready)
+    order = []
+    while ready:
+        tile_id = tile_ids[heapq.heappop(ready)]
+        order.append(tile_id)
+        for dependent in dependents.get(tile_id, ()):
+            waiting_on[dependent] -= 1
+            if waiting_on[dependent] == 0:
+                heapq.heappush(ready, positions[dependent])
+
+    unordered = [tile_id for tile_id in tile_ids if waiting_on[tile_id] > 0]
+    cycles = _find_cycles(unordered, dependents) if unordered else []
+
+    return {
+        'tiles': len(tile_ids),
+        'prerequisites': prerequisites,
+        'dependents': dependents,
+        'order': order,
+        'problems': {
+            'danglingPrerequisites': dangling,
+            'cycles': cycles,
+            'unorderedTiles': len(unordered),
+            'duplicateIds': duplicates,
+        },
+    }
+
+def log_prereq_problems(graph):
+    """Logs the problems found in a prerequisite graph. Returns the number of problems."""
+    problems = graph['problems']
+    for problem in problems['danglingPrerequisites'][:MAX_LOGGED_PROBLEMS]:
+        logging.error(f"Tile '{problem['tile']}' requires '{problem['prerequisite']}', which is not a tile on the board.")
+    for cycle in problems['cycles'][:MAX_LOGGED_PROBLEMS]:
+        logging.error(f"Prerequisite cycle; these tiles can never unlock through each other: {' -> '.join(cycle)}")
+    for tile_id in problems['duplicateIds'][:MAX_LOGGED_PROBLEMS]:
+        logging.error(f"Tile ID '{tile_id}' is used more than once.")
+    count = len(problems['danglingPrerequisites']) + len(problems['cycles']) + len(problems['duplicateIds'])
+    if count > MAX_LOGGED_PROBLEMS:
+        logging.error(f"{count} prerequisite problem(s) in total; see {PREREQ_GRAPH_NAME} for the full list.")
+    return count
+
+def write_prereq_graph(tile_rows, output_path):
+    """Builds the prerequisite graph of the tile rows, logs its problems and writes it as JSON. Returns the graph."""
+    graph = build_prereq_graph(tile_rows)
+    log_prereq_problems(graph)
+    data = json.dumps(graph, indent=2).encode('utf-8')
+    write_atomic(output_path, lambda f: f.write(data))
+    logging.info(
+        f"Prerequisite graph saved as {output_path} ({len(graph['prerequisites'])} of {graph['tiles']} tiles locked "
+        f"behind prerequisites, {len(graph['order'])} in unlock order)"
+    )
+    return graph
@@ -0,0 +1,110 @@
+import threading
+import time
+
+PROGRESS_INTERVAL = 0.1 # Shortest time between two progress events for the same phase, in seconds
+PHASE_LABELS = {
+    'titles': "Resolving wiki titles",
+    'images': "Downloading images",
+    'sections': "Rendering sections",
+    'board_rows': "Writing the board image",
+    'csv_bytes': "Reading the CSV",
+}
+
+class BuildCancelled(Exception):
+    """Raised inside a build or conversion that has been asked to stop."""
+
+class BuildProgress:
+    """
+    Tracks how far each phase of a build has got and passes progress events to `on_event`, on
+    whichever thread made the progress. An event is a dict with the 'phase', the amount 'done', the
+    'total' (None if unknown), the 'eta' in seconds (None until it can be estimated) and the
+    'bytes_written' so far. Events for a phase are sent at most every PROGRESS_INTERVAL seconds,
+    apart from the first one and the one that completes it.
+
+    Setting `cancel_event` (a threading.Event) asks the build to stop: the next `advance` or
+    `check_cancelled` raises BuildCancelled. The pipeline only checks between units of work, so
+    whatever it was writing is finished first and the caches stay consistent. Safe to use from
+    several threads.
+    """
+
+    def __init__(self, on_event=None, cancel_event=None, clock=time.monotonic):
+        self.on_event = on_event
+        self.cancel_event = cancel_event or threading.Event()
+        self.clock = clock
+        self.phases = {} # Name -> {'done', 'total', 'started', 'last_event'}
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        """Raises BuildCancelled if the build has been asked to stop."""
+        if self.cancel_event.is_set():
+            raise BuildCancelled("The build was cancelled.")
+
+    def _phase(self, phase, now):
+        return self.phases.setdefault(phase, {'done': 0, 'total': None, 'started': now, 'last_event': None})
+
+    def set_total(self, phase, total):
+        """Starts `phase` (again), with `total` units of work to do."""
+        with self._lock:
+            now = self.clock()
+            self.phases[phase] = {'done': 0, 'total': total, 'started': now, 'last_event': None}
+            event = self._event(phase, now, force=True)
+        self._send(event)
+
+    def advance(self, phase, amount=1):
+        """Records `amount` more units of work done in `phase`, then checks for cancellation."""
+        with self._lock:
+            now = self.clock()
+            state = self._phase(phase, now)
+            state['done'] += amount
+            event = self._event(phase, now, force=state['total'] is not None and state['done'] >= state['total'])
+        self._send(event)
+        self.check_cancelled()
+
+    def add_bytes_written(self, amount):
+        """Adds to the count of output bytes written, which is reported with every event."""
+        with self._lock:
+            self.bytes_written += amount
+
+    def _event(self, phase, now, force=False):
+        state = self.phases[phase]
+        if not force and state['last_event'] is not None and now - state['last_event'] < PROGRESS_INTERVAL:
+            return None
+        state['last_event'] = now
+        done, total = state['done'], state['total']
+        eta = None
+        if total is not None and 0 < done:
+            eta = max((now - state['started']) / done * (total - done), 0.0)
+        return {'phase': phase, 'done': done, 'total': total, 'eta': eta, 'bytes_written': self.bytes_written}
+
+    def _send(self, event):
+        if event is not None and self.on_event:
+            self.on_event(event)
+
+def format_progress(event):
+    """Returns a one-line status for a progress event, e.g. 'Downloading images: 40/120 (about 12s left)'."""
+    label = PHASE_LABELS.get(event['phase'], event['phase'])
+    done, total = event['done'], event['total']
+    if event['phase'] == 'csv_bytes':
+        text = f"{label}: {done / 1024:,.1f} KB" + (f" of {total / 1024:,.1f} KB" if total else "")
+    else:
+        text = f"{label}: {done:,}" + (f"/{total:,}" if total is not None else "")
+    if event['eta'] is not None and done < (total or 0):
+        text += f" (about {format_duration(event['eta'])} left)"
+    if event['bytes_written']:
+        text += f", {event['bytes_written'] / (1024 * 1024):.1f} MB written"
+    return text
+
+def format_duration(seconds):
+    """Formats a duration as '45s' or '3m 20s'."""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    return f"{seconds // 60}m {seconds % 60:02d}s"
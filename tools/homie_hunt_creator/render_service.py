@@ -0,0 +1,170 @@
+import argparse
+import json
+import logging
+import mimetypes
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+from homie_hunt_creator import CACHE_DIR, OUTPUT_DIR, BoardBuilder, setup_logging
+from instrumentation import RunReport, BuildLogCapture
+
+DEFAULT_HOST = "127.0.0.1" # Only this machine can reach the service unless another host is given
+DEFAULT_PORT = 8765
+MAX_CONCURRENT_BUILDS = 2 # Builds run at once; further requests wait for a free slot
+MAX_CONFIG_BYTES = 50 * 1024 * 1024 # Largest config body accepted
+
+class RenderService(ThreadingHTTPServer):
+    """
+    A local HTTP service that builds boards with one long-lived BoardBuilder, so every build after the
+    first starts with warm caches, fonts, sessions, scaled images and section canvases:
+    - POST /build with a config JSON as the body builds the board (add ?incremental=1 to rebuild the
+      project's folder in place) and answers with the output folder, the URL of every file in it and
+      the build's counters. A config that fails preflight gets a 422 with the list of errors.
+    - GET /files/<folder>/<file> returns a file from a board's output folder.
+    - GET /status reports the builds run so far and the state of the in-memory caches.
+    Requests are handled on their own threads, with at most `max_builds` builds running at once.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, builder, max_builds=MAX_CONCURRENT_BUILDS):
+        super().__init__(address, RenderRequestHandler)
+        self.builder = builder
+        self.build_slots = threading.BoundedSemaphore(max_builds)
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    server_version = "HomieHuntRenderService/1.0"
+
+    def log_message(self, format, *args):
+        logging.debug(f"{self.address_string()} {format % args}")
+
+    def send_json(self, status, data):
+        body = json.dumps(data, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/status':
+            self.send_status()
+        elif path.startswith('/files/'):
+            self.send_output_file(unquote(path[len('/files/'):]))
+        else:
+            self.send_json(404, {'error': f"Unknown path '{path}'."})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/build':
+            self.send_json(404, {'error': f"Unknown path '{url.path}'."})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_CONFIG_BYTES:
+            self.send_json(413, {'error': f"The config is larger than {MAX_CONFIG_BYTES // (1024 * 1024)} MB."})
+            return
+        try:
+            config_data = json.loads(self.rfile.read(length))
+        except ValueError as e:
+            self.send_json(400, {'error': f"The body is not valid JSON: {e}"})
+            return
+        if not isinstance(config_data, dict) or 'config' not in config_data or 'sections' not in config_data:
+            self.send_json(400, {'error': "The config must contain 'config' and 'sections' keys."})
+            return
+        incremental = parse_qs(url.query).get('incremental', ['0'])[0] in ('1', 'true')
+        self.send_build(config_data, incremental)
+
+    def send_build(self, config_data, incremental):
+        """Builds a board and answers with its files, or with the errors that stopped it."""
+        builder = self.server.builder
+        start = time.perf_counter()
+        with BuildLogCapture() as capture:
+            try:
+                with self.server.build_slots:
+                    report = RunReport()
+                    output_folder = builder.build(config_data, incremental, report=report)
+            except Exception as e:
+                logging.exception(f"Build failed: {e}")
+                self.send_json(500, {'error': f"The build failed: {e}", 'errors': capture.messages})
+                return
+
+        if output_folder is None:
+            self.send_json(422, {'error': "The board could not be built.", 'errors': capture.messages})
+            return
+        folder_name = os.path.relpath(output_folder, builder.output_dir)
+        files = {
+            filename: f"/files/{quote(folder_name)}/{quote(filename)}"
+            for filename in sorted(os.listdir(output_folder))
+            if os.path.isfile(os.path.join(output_folder, filename)) and not filename.startswith('.')
+        }
+        self.send_json(200, {
+            'outputFolder': os.path.abspath(output_folder),
+            'files': files,
+            'seconds': round(time.perf_counter() - start, 3),
+            'counters': report.counters,
+            'errors': capture.messages,
+        })
+
+    def send_output_file(self, relative_path):
+        """Sends a file from under the output directory, refusing paths that lead out of it."""
+        output_root = os.path.realpath(self.server.builder.output_dir)
+        path = os.path.realpath(os.path.join(output_root, relative_path))
+        if os.path.commonpath([output_root, path]) != output_root or not os.path.isfile(path):
+            self.send_json(404, {'error': f"No such file '{relative_path}'."})
+            return
+        with open(path, 'rb') as f:
+            body = f.read()
+        self.send_response(200)
+        self.send_header('Content-Type', mimetypes.guess_type(path)[0] or 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_status(self):
+        builder = self.server.builder
+        self.send_json(200, {
+            'builds': builder.builds,
+            'sectionMemo': memo_status(builder.section_canvases),
+            'scaledImageMemo': memo_status(builder.scaled_images),
+        })
+
+def memo_status(memo):
+    """Returns the size and statistics of a MemoryLRU for /status, or None if there is none."""
+    if memo is None:
+        return None
+    return {'entries': len(memo), 'bytes': memo.bytes, **memo.stats}
+
+def serve(builder, host=DEFAULT_HOST, port=DEFAULT_PORT, max_builds=MAX_CONCURRENT_BUILDS):
+    """Runs the render service until it is interrupted."""
+    with RenderService((host, port), builder, max_builds) as server:
+        logging.info(f"Render service listening on http://{host}:{server.server_port}/ (POST /build with a config JSON)")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logging.info("Render service stopped.")
+
+def parse_args(argv=None):
+    """Parses the command-line arguments."""
+    parser = argparse.ArgumentParser(description="Serves Homie Hunt board builds over HTTP, keeping caches and rendered sections warm between builds.")
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f"Address to listen on (default: {DEFAULT_HOST}).")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT}).")
+    parser.add_argument('-o', '--output-dir', default=OUTPUT_DIR, help=f"Directory the board folders are created in (default: {OUTPUT_DIR}).")
+    parser.add_argument('--cache-dir', default=CACHE_DIR, help=f"Directory of the image caches (default: {CACHE_DIR}).")
+    parser.add_argument('--max-builds', type=int, default=MAX_CONCURRENT_BUILDS, help=f"Builds run at once (default: {MAX_CONCURRENT_BUILDS}).")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main execution function. Returns the process exit code."""
+    args = parse_args(argv)
+    setup_logging()
+    with BoardBuilder(args.cache_dir, args.output_dir) as builder:
+        serve(builder, args.host, args.port, max(args.max_builds, 1))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
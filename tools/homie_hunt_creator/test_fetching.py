@@ -0,0 +1,246 @@
+"""
+Tests for fetching.py against a scripted HTTP server on localhost. Run from this directory with
+`python -m unittest test_fetching` (or `python -m pytest test_fetching.py`).
+"""
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from fetching import CircuitBreaker, CircuitOpenError, Fetcher, HostRateLimiter, MAX_RETRY_AFTER
+from image_cache import ImageCache
+from image_sources import download_image
+
+IMAGE = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 4
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    """
+    Answers each path with the next step queued for it in `server.script`, repeating the last one.
+    A step is a status code, ('retry-after', status, seconds), ('stall', seconds) or 'truncated'.
+    """
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+            steps = self.server.script.get(self.path, [404])
+            step = steps.pop(0) if len(steps) > 1 else steps[0]
+
+        if step == 'truncated':
+            # Promise more bytes than are sent, then close the connection
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(IMAGE)))
+            self.end_headers()
+            self.wfile.write(IMAGE[:len(IMAGE) // 2])
+            return
+        if isinstance(step, tuple) and step[0] == 'stall':
+            time.sleep(step[1])
+            step = 200
+        headers = {}
+        if isinstance(step, tuple) and step[0] == 'retry-after':
+            _, step, headers['Retry-After'] = step
+        body = IMAGE if step == 200 else b''
+        self.send_response(step)
+        for name, value in headers.items():
+            self.send_header(name, str(value))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def setUpModule():
+    logging.disable(logging.CRITICAL)
+
+def tearDownModule():
+    logging.disable(logging.NOTSET)
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up on the stalled handlers; that is expected here
+        pass
+
+class ServerTestCase(unittest.TestCase):
+    """Starts a scripted server for each test and makes fetchers that do not really wait."""
+
+    def setUp(self):
+        self.server = QuietServer(('127.0.0.1', 0), ScriptedHandler)
+        self.server.lock = threading.Lock()
+        self.server.script = {}
+        self.server.hits = {}
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.sleeps = []
+        self.now = 0.0
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def make_fetcher(self, timeout=(1, 1), max_retries=2, failure_threshold=5):
+        # No real waiting: sleeps are recorded, and the circuit breaker runs on a clock the test moves
+        breaker = CircuitBreaker(failure_threshold, reset_seconds=30, clock=lambda: self.now)
+        fetcher = Fetcher(requests.Session(), timeout=timeout, max_retries=max_retries,
+                          rate_limiter=HostRateLimiter(0, sleep=lambda seconds: None),
+                          circuit_breaker=breaker, sleep=self.sleeps.append)
+        self.addCleanup(fetcher.close)
+        return fetcher
+
+    def script(self, path, *steps):
+        self.server.script[path] = list(steps)
+        return self.base_url + path
+
+class FetcherTestCase(ServerTestCase):
+
+    def test_retries_server_errors(self):
+        fetcher = self.make_fetcher()
+        url = self.script('/flaky', 503, 500, 200)
+        response = fetcher.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, IMAGE)
+        self.assertEqual(self.server.hits['/flaky'], 3)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertEqual(fetcher.stats['requests'], 3)
+        self.assertEqual(fetcher.stats['retries'], 2)
+        self.assertEqual(fetcher.stats['failures'], 0)
+
+    def test_returns_last_response_when_retries_run_out(self):
+        fetcher = self.make_fetcher(max_retries=2)
+        url = self.script('/down', 502)
+        response = fetcher.get(url)
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(self.server.hits['/down'], 3)
+        self.assertEqual(fetcher.stats['retries'], 2)
+        self.assertEqual(fetcher.stats['failures'], 1)
+
+    def test_does_not_retry_client_errors(self):
+        fetcher = self.make_fetcher()
+        url = self.script('/gone', 404)
+        self.assertEqual(fetcher.get(url).status_code, 404)
+        self.assertEqual(self.server.hits['/gone'], 1)
+        self.assertEqual(fetcher.stats['retries'], 0)
+
+    def test_waits_as_long_as_retry_after_asks(self):
+        fetcher = self.make_fetcher()
+        url = self.script('/busy', ('retry-after', 429, 7), 200)
+        self.assertEqual(fetcher.get(url).status_code, 200)
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertGreaterEqual(self.sleeps[0], 7)
+        self.assertEqual(fetcher.stats['throttled'], 1)
+        self.assertEqual(fetcher.stats['retries'], 1)
+
+    def test_gives_up_when_retry_after_is_too_long(self):
+        fetcher = self.make_fetcher()
+        url = self.script('/later', ('retry-after', 429, MAX_RETRY_AFTER + 1), 200)
+        self.assertEqual(fetcher.get(url).status_code, 429)
+        self.assertEqual(self.sleeps, [])
+        self.assertEqual(fetcher.stats['failures'], 1)
+
+    def test_throttling_does_not_open_the_circuit(self):
+        fetcher = self.make_fetcher(max_retries=0, failure_threshold=1)
+        url = self.script('/busy', ('retry-after', 429, 0))
+        fetcher.get(url)
+        fetcher.get(url)
+        self.assertEqual(fetcher.stats['rejected'], 0)
+
+    def test_read_timeout(self):
+        fetcher = self.make_fetcher(timeout=(1, 0.2), max_retries=1)
+        url = self.script('/slow', ('stall', 1))
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            fetcher.get(url)
+        self.assertEqual(fetcher.stats['timeouts'], 2)
+        self.assertEqual(fetcher.stats['retries'], 1)
+        self.assertEqual(fetcher.stats['failures'], 1)
+
+    def test_connect_timeout(self):
+        # A listener that never accepts: once its backlog is full, new connections hang in the handshake
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(0)
+        self.addCleanup(listener.close)
+        address = listener.getsockname()
+        for _ in range(4):
+            filler = socket.socket()
+            filler.setblocking(False)
+            filler.connect_ex(address)
+            self.addCleanup(filler.close)
+
+        fetcher = self.make_fetcher(timeout=(0.2, 1), max_retries=0)
+        started = time.monotonic()
+        with self.assertRaises(requests.exceptions.ConnectTimeout):
+            fetcher.get(f"http://{address[0]}:{address[1]}/image.png")
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(fetcher.stats['timeouts'], 1)
+        self.assertEqual(fetcher.stats['failures'], 1)
+
+    def test_circuit_opens_and_half_opens(self):
+        fetcher = self.make_fetcher(max_retries=0, failure_threshold=2)
+        url = self.script('/outage', 500, 500, 500, 200)
+        fetcher.get(url)
+        fetcher.get(url)
+
+        # Open: fails fast without sending anything
+        with self.assertRaises(CircuitOpenError):
+            fetcher.get(url)
+        self.assertEqual(self.server.hits['/outage'], 2)
+        self.assertEqual(fetcher.stats['rejected'], 1)
+
+        # Half-open: one trial request, which fails and opens the circuit again
+        self.now += 31
+        self.assertEqual(fetcher.get(url).status_code, 500)
+        with self.assertRaises(CircuitOpenError):
+            fetcher.get(url)
+
+        # The next trial succeeds and closes the circuit
+        self.now += 31
+        self.assertEqual(fetcher.get(url).status_code, 200)
+        self.assertEqual(fetcher.get(url).status_code, 200)
+        self.assertEqual(self.server.hits['/outage'], 5)
+        self.assertEqual(fetcher.stats['rejected'], 2)
+
+    def test_half_open_circuit_lets_one_request_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30, clock=lambda: self.now)
+        breaker.record_failure('wiki')
+        self.assertFalse(breaker.allow('wiki'))
+        self.now += 30
+        self.assertTrue(breaker.allow('wiki'))
+        self.assertFalse(breaker.allow('wiki'))
+        breaker.record_success('wiki')
+        self.assertTrue(breaker.allow('wiki'))
+
+class DownloadImageTestCase(ServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache = ImageCache(cache_dir.name)
+        self.addCleanup(self.cache.close)
+
+    def test_truncated_download_is_retried(self):
+        fetcher = self.make_fetcher()
+        url = self.script('/image.png', 'truncated', 200)
+        path = download_image(url, fetcher, self.cache)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), IMAGE)
+        self.assertEqual(fetcher.stats['retries'], 1)
+
+    def test_truncated_download_is_not_cached(self):
+        fetcher = self.make_fetcher(max_retries=1)
+        url = self.script('/image.png', 'truncated')
+        self.assertIsNone(download_image(url, fetcher, self.cache))
+        self.assertEqual(self.server.hits['/image.png'], 2)
+        self.assertEqual(fetcher.stats['failures'], 1)
+        self.assertIsNone(self.cache.lookup_url(url))
+        self.assertEqual(os.listdir(self.cache.blob_dir), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import json
+import os
+import time
+
+from image_cache import write_atomic
+
+WATCH_POLL_INTERVAL = 0.2 # How often the watched file is checked for changes, in seconds
+WATCH_DEBOUNCE_SECONDS = 0.3 # A change only counts once the file has stayed the same this long
+PREVIEW_PAGE_NAME = "preview.html"
+PREVIEW_STATE_NAME = "preview_state.js"
+PREVIEW_REFRESH_MS = 500 # How often the preview page checks for a new build
+
+class FileWatcher:
+    """
+    Polls a file's modification time and size and reports a change once the file has settled, so a
+    burst of saves (or an editor writing the file in several steps) counts as a single change. A file
+    that is briefly missing, as during an editor's save-by-rename, is waited out rather than reported.
+    """
+
+    def __init__(self, path, debounce=WATCH_DEBOUNCE_SECONDS, clock=time.monotonic):
+        self.path = path
+        self.debounce = debounce
+        self.clock = clock
+        self.seen = self.signature() # The latest signature observed
+        self.reported = self.seen # The signature of the last change reported
+        self.changed_at = None
+
+    def signature(self):
+        """Returns (modification time, size) of the file, or None if it does not exist."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self):
+        """Checks the file once. Returns True when a change has settled since the last one reported."""
+        signature = self.signature()
+        now = self.clock()
+        if signature != self.seen:
+            self.seen = signature
+            self.changed_at = now
+            return False
+        if signature is None or signature == self.reported or now - self.changed_at < self.debounce:
+            return False
+        self.reported = signature
+        return True
+
+PREVIEW_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Board preview</title>
+<style>
+  body { margin: 0; background: #111; color: #ddd; font: 14px sans-serif; }
+  #status { position: sticky; top: 0; padding: 6px 10px; background: #222; border-bottom: 1px solid #444; }
+  #status.failed { background: #5a1d1d; }
+  #errors { margin: 4px 0 0; padding-left: 20px; color: #f7b2b2; }
+  #board { display: block; max-width: 100%%; }
+</style>
+</head>
+<body>
+<div id="status">Waiting for the first build...</div>
+<img id="board" alt="">
+<script>
+  // preview_state.js is loaded as a script rather than fetched, so the page also works when opened as a file
+  var shownVersion = null;
+  function previewUpdate(state) {
+    if (state.version === shownVersion) return;
+    shownVersion = state.version;
+    var status = document.getElementById('status');
+    status.className = state.ok ? '' : 'failed';
+    status.textContent = 'Build ' + state.version + (state.ok ? ' done' : ' failed') + ' at ' + state.finishedAt + ' (' + state.seconds + 's)';
+    if (state.errors.length) {
+      var list = document.createElement('ul');
+      list.id = 'errors';
+      state.errors.forEach(function (error) {
+        var item = document.createElement('li');
+        item.textContent = error;
+        list.appendChild(item);
+      });
+      status.appendChild(list);
+    }
+    if (state.ok) {
+      // Swap the image only once the new one has loaded, so the page does not flicker
+      var next = new Image();
+      next.onload = function () { document.getElementById('board').src = next.src; };
+      next.src = state.board + '?v=' + state.version;
+    }
+  }
+  function checkForBuild() {
+    var script = document.createElement('script');
+    script.src = '%(state_name)s?t=' + Date.now();
+    script.onload = script.onerror = function () { script.remove(); };
+    document.head.appendChild(script);
+  }
+  checkForBuild();
+  setInterval(checkForBuild, %(refresh_ms)d);
+</script>
+</body>
+</html>
+"""
+
+def write_preview(folder, version, ok, seconds, errors, board_name="board.png"):
+    """
+    Writes preview.html (once) and preview_state.js (after every build) into `folder`. Opened in a
+    browser, the page shows the board and reloads it, without flicker, whenever a new build finishes;
+    a failed build shows its errors above the last good board. Returns the page's path.
+    """
+    page_path = os.path.join(folder, PREVIEW_PAGE_NAME)
+    page = (PREVIEW_PAGE % {'state_name': PREVIEW_STATE_NAME, 'refresh_ms': PREVIEW_REFRESH_MS}).encode('utf-8')
+    if not os.path.exists(page_path):
+        write_atomic(page_path, lambda f: f.write(page))
+    state = {
+        'version': version,
+        'ok': ok,
+        'finishedAt': time.strftime('%H:%M:%S'),
+        'seconds': round(seconds, 2),
+        'errors': errors,
+        'board': board_name,
+    }
+    script = f"previewUpdate({json.dumps(state)});\n".encode('utf-8')
+    write_atomic(os.path.join(folder, PREVIEW_STATE_NAME), lambda f: f.write(script))
+    return page_path